@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures the memory used by a Family as it grows.
+
+Each family is made of independent households: a couple with a son and a
+daughter, so half of the people are unmarried and childless.  The memory
+held by the family after construction is measured with tracemalloc.
+
+Usage:
+  benchmark/memory_benchmark.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+def MakeFamily(size: int) -> ft.Family:
+  """Returns a family of about `size` people."""
+
+  family = ft.Family()
+  for i in range(size // 4):
+    family.Person(f'Father{i}', wife=f'Mother{i}', birth='1900', death='1980')
+    family.Person(f'Son{i}', father=f'Father{i}', mother=f'Mother{i}',
+                  birth='1930')
+    family.Person(f'Daughter{i}', father=f'Father{i}', mother=f'Mother{i}',
+                  birth='1932')
+  return family
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='10000,100000,1000000',
+                      help='comma-separated numbers of people to try')
+  args = parser.parse_args()
+
+  print(f'{"people":>8} {"MiB":>8} {"bytes/person":>13} {"build (s)":>10}')
+  for size in (int(s) for s in args.sizes.split(',')):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    family = MakeFamily(size)
+    elapsed = time.perf_counter() - start
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    people = family.Size()
+    print(f'{people:>8} {used / 2**20:>8.1f} {used / people:>13.0f} '
+          f'{elapsed:>10.2f}')
+    del family
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times Family.Merge() of two overlapping synthetic families.
+
+The first family is a synthetic family (see synthetic.py) with made-up
+names.  The second is the same family with a typo in some of the names and
+some birth years off by one, plus as many people again from another seed.
+The merge should recognize the shared people despite the differences and add
+the rest; the precision and recall of the matches are printed with the time.
+
+Usage:
+  benchmark/merge_benchmark.py [--sizes 10000,100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Text
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+from synthetic import MakeRecords
+
+_CONSONANTS = 'bcdfghjklmnprstvwz'
+_VOWELS = 'aeiou'
+
+def _MakeName(rng: random.Random) -> Text:
+  def Word(syllables: int) -> Text:
+    return ''.join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS)
+                   for _ in range(syllables)).capitalize()
+  return f'{Word(rng.randint(2, 3))} {Word(rng.randint(2, 4))}'
+
+def Rename(records: List[Dict[Text, object]], prefix: Text,
+           rng: random.Random) -> List[Dict[Text, object]]:
+  """Gives the people of `records` unique made-up names, and notes the old
+  name (prefixed) in the annotation to check the matches against."""
+
+  names = {}
+  used = set()
+  def NewName(name: Text) -> Text:
+    new = names.get(name)
+    if new is None:
+      new = _MakeName(rng)
+      while new in used:
+        new = _MakeName(rng)
+      used.add(new)
+      names[name] = new
+    return new
+
+  renamed = []
+  for record in records:
+    record = dict(record)
+    if 'gender' in record:  # The record that adds the person.
+      record['annotation'] = prefix + record['name']
+    for key in ('name', 'father', 'mother', 'husband', 'wife'):
+      if key in record:
+        record[key] = NewName(record[key])
+    renamed.append(record)
+  return renamed
+
+def Perturb(records: List[Dict[Text, object]], rate: float,
+            rng: random.Random) -> List[Dict[Text, object]]:
+  """Changes a letter in the names and the birth years of `rate` of the
+  people."""
+
+  typos = {}
+  for record in records:
+    if 'gender' in record and rng.random() < rate:
+      name = record['name']
+      i = rng.randrange(1, len(name))
+      if name[i] != ' ':
+        typos[name] = name[:i] + rng.choice(_VOWELS) + name[i + 1:]
+  perturbed = []
+  for record in records:
+    record = dict(record)
+    if 'gender' in record and rng.random() < rate:
+      record['birth'] = str(int(record['birth']) + 1)
+    for key in ('name', 'father', 'mother', 'husband', 'wife'):
+      if key in record:
+        record[key] = typos.get(record[key], record[key])
+    perturbed.append(record)
+  return perturbed
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='10000,100000',
+                      help='comma-separated numbers of people per family')
+  parser.add_argument('--typo-rate', type=float, default=0.1)
+  args = parser.parse_args()
+
+  print(f'{"people":>8} {"merge (s)":>10} {"matched":>8} {"added":>8} '
+        f'{"precision":>10} {"recall":>8}')
+  for size in (int(s) for s in args.sizes.split(',')):
+    rng = random.Random(size)
+    records = Rename(MakeRecords(size, seed=0), '', rng)
+    family = ft.Family()
+    family.AddMany(records)
+    extra = Rename(MakeRecords(size, seed=1), 'extra ', rng)
+    other = ft.Family()
+    other.AddMany(Perturb(records, args.typo_rate, rng) + extra)
+
+    start = time.perf_counter()
+    result = family.Merge(other)
+    seconds = time.perf_counter() - start
+
+    correct = sum(p.annotation == q.annotation for p, q, _ in result.matches)
+    print(f'{size:>8} {seconds:>10.3f} {len(result.matches):>8} '
+          f'{len(result.added):>8} '
+          f'{correct / max(len(result.matches), 1):>10.4f} '
+          f'{correct / size:>8.4f}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times construction, Sort() and ToDot() on synthetic families.
+
+For each size, the records of a synthetic family (see synthetic.py) are
+generated first and not timed.  Then the family is built with Family.Person()
+and with Family.AddMany(), sorted, and rendered twice (the second ToDot()
+reuses the cached generations).  The peak memory of building, sorting and
+rendering is measured with tracemalloc in a separate run, as tracing slows
+everything down.
+
+The results are written as JSON, and a previous results file can be given
+with --compare to print how much each measurement changed.
+
+Usage:
+  benchmark/run_benchmarks.py [--sizes 1000,10000,100000,1000000]
+      [-o results.json] [--compare baseline.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Text
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+from synthetic import MakeRecords
+
+# The measurements that are compared between runs; lower is better.
+_METRICS = ('construct_seconds', 'add_many_seconds', 'sort_seconds',
+            'todot_seconds', 'todot_cached_seconds', 'peak_megabytes')
+
+def Build(records: List[Dict[Text, object]]) -> ft.Family:
+  family = ft.Family()
+  for record in records:
+    attribs = dict(record)
+    family.Person(attribs.pop('name'), **attribs)
+  return family
+
+def Best(function, repeat: int) -> float:
+  """Returns the best wall time of `repeat` calls of `function`."""
+
+  best = None
+  for _ in range(repeat):
+    gc.collect()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+def Measure(size: int, args: argparse.Namespace) -> Dict[Text, object]:
+  records = MakeRecords(size, args.generations, args.branching,
+                        args.marriage_rate, args.remarriage_rate,
+                        args.cross_branch_rate, args.seed)
+  result = {'size': size, 'records': len(records)}
+  result['construct_seconds'] = Best(lambda: Build(records), args.repeat)
+  result['add_many_seconds'] = Best(lambda: ft.Family().AddMany(records),
+                                    args.repeat)
+
+  # Sort() and ToDot() cache their results, so each run needs a new family.
+  sort_seconds = []
+  todot_seconds = []
+  todot_cached_seconds = []
+  for _ in range(args.repeat):
+    family = Build(records)
+    gc.collect()
+    start = time.perf_counter()
+    generations = family.Sort()
+    sort_seconds.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    family.ToDot()
+    todot_seconds.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    family.ToDot()
+    todot_cached_seconds.append(time.perf_counter() - start)
+  result['people'] = family.Size()
+  result['generations'] = len(generations)
+  result['sort_seconds'] = min(sort_seconds)
+  result['todot_seconds'] = min(todot_seconds)
+  result['todot_cached_seconds'] = min(todot_cached_seconds)
+  del family, generations
+
+  if args.memory:
+    gc.collect()
+    tracemalloc.start()
+    family = Build(records)
+    family.ToDot()
+    result['peak_megabytes'] = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+  return result
+
+def GetCommit() -> Optional[Text]:
+  """Returns the git commit of the source tree, if known."""
+
+  try:
+    return subprocess.run(
+        ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__) or '.',
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+        universal_newlines=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def Compare(results: Dict[Text, object], baseline: Dict[Text, object]) -> None:
+  """Prints each measurement relative to the baseline run."""
+
+  old_by_size = {r['size']: r for r in baseline['results']}
+  print(f'\nCompared with {baseline.get("commit") or "baseline"} '
+        '(new / old; below 1 is better):')
+  names = (m[:-len('_seconds')] if m.endswith('_seconds') else m
+           for m in _METRICS)
+  print(f'{"size":>8} ' + ' '.join(f'{name:>14}' for name in names))
+  for result in results['results']:
+    old = old_by_size.get(result['size'])
+    if old is None:
+      continue
+    ratios = []
+    for metric in _METRICS:
+      if old.get(metric) and metric in result:
+        ratios.append(f'{result[metric] / old[metric]:>14.2f}')
+      else:
+        ratios.append(f'{"-":>14}')
+    print(f'{result["size"]:>8} ' + ' '.join(ratios))
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                      help='comma-separated numbers of people to try')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='number of runs per measurement; the best is '
+                      'reported')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--generations', type=int, default=8)
+  parser.add_argument('--branching', type=float, default=2.5,
+                      help='the average number of children per couple')
+  parser.add_argument('--marriage-rate', type=float, default=0.8)
+  parser.add_argument('--remarriage-rate', type=float, default=0.1)
+  parser.add_argument('--cross-branch-rate', type=float, default=0.05)
+  parser.add_argument('--no-memory', dest='memory', action='store_false',
+                      help="don't measure the peak memory")
+  parser.add_argument('-o', '--output',
+                      help='where to write the JSON results (default: stdout)')
+  parser.add_argument('--compare',
+                      help='a JSON results file to compare with')
+  args = parser.parse_args()
+
+  results = {
+      'commit': GetCommit(),
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+      'config': {name: getattr(args, name)
+                 for name in ('repeat', 'seed', 'generations', 'branching',
+                              'marriage_rate', 'remarriage_rate',
+                              'cross_branch_rate')},
+      'results': [],
+  }
+  for size in (int(s) for s in args.sizes.split(',')):
+    result = Measure(size, args)
+    results['results'].append(result)
+    print(', '.join(f'{key}={value:.4g}' if isinstance(value, float) else
+                    f'{key}={value}' for key, value in result.items()),
+          file=sys.stderr)
+
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(results, fp, indent=2)
+  else:
+    json.dump(results, sys.stdout, indent=2)
+    print()
+  if args.compare:
+    with open(args.compare) as fp:
+      Compare(results, json.load(fp))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times Family.Search() on a synthetic family with made-up names.
+
+The family is a synthetic family (see synthetic.py) renamed as in
+merge_benchmark.py.  The name index is built by the first Search(), which is
+timed separately.  Then the names of random people are searched for as they
+would be typed (every prefix of the name), in full, and with a typo, and the
+median and 99th percentile latency of each kind of query are printed.
+
+Usage:
+  benchmark/search_benchmark.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+from merge_benchmark import Rename
+from synthetic import MakeRecords
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='10000,100000,1000000',
+                      help='comma-separated numbers of people to try')
+  parser.add_argument('--queries', type=int, default=200,
+                      help='number of people to search for')
+  args = parser.parse_args()
+
+  print(f'{"people":>8} {"index (s)":>10} {"kind":>8} {"median (ms)":>12} '
+        f'{"p99 (ms)":>9} {"found":>6}')
+  for size in (int(s) for s in args.sizes.split(',')):
+    rng = random.Random(size)
+    family = ft.Family()
+    family.AddMany(Rename(MakeRecords(size), '', rng))
+
+    start = time.perf_counter()
+    family.Search('')
+    index_seconds = time.perf_counter() - start
+
+    # Maps a kind of query to the (query, person searched for) pairs.
+    queries = {'typing': [], 'full': [], 'typo': []}
+    for p in rng.sample(family.people, min(args.queries, family.Size())):
+      name = p.Name()
+      queries['typing'].extend((name[:i], p) for i in range(1, len(name) + 1))
+      queries['full'].append((name, p))
+      i = rng.randrange(1, len(name) - 1)
+      if name[i] != ' ' and name[i + 1] != ' ':
+        queries['typo'].append((name[:i] + name[i + 1] + name[i] +
+                                name[i + 2:], p))
+
+    for kind, pairs in queries.items():
+      latencies = []
+      found = 0
+      for query, person in pairs:
+        start = time.perf_counter()
+        results = family.Search(query)
+        latencies.append(time.perf_counter() - start)
+        found += person in results
+      latencies.sort()
+      print(f'{size:>8} {index_seconds:>10.3f} {kind:>8} '
+            f'{statistics.median(latencies) * 1000:>12.3f} '
+            f'{latencies[len(latencies) * 99 // 100] * 1000:>9.3f} '
+            f'{found / len(pairs):>6.0%}')
+
+if __name__ == '__main__':
+  main()
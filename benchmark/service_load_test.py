@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Load tests RenderService on a synthetic family.
+
+Concurrent clients ask for the descendants of random people (a few popular
+people much more often than the rest, as on a real site), a few generations
+deep or all of them, top to bottom or left to right.  Optionally, another
+thread edits the family now and then, which invalidates the cache.  Prints
+the service's metrics and the throughput.
+
+Usage:
+  benchmark/service_load_test.py [--size 10000] [--clients 50] \
+      [--requests 5000] [--edit-interval 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import service
+
+from synthetic import MakeRecords
+
+async def _Client(render_service: service.RenderService, roots, weights,
+                  requests: int, rng: random.Random) -> None:
+  for _ in range(requests):
+    root, = rng.choices(roots, weights)
+    await render_service.Render(root=root, depth=rng.choice([2, 3, None]),
+                                rankdir=rng.choice([None, 'LR']))
+
+def _Edit(family: ft.Family, rng: random.Random, number: int) -> None:
+  with family.Writing():
+    parent = rng.choice(family.people)
+    family.Person(f'Edit {number}', father=parent.id)
+
+async def _Editor(family: ft.Family, interval: float, rng: random.Random,
+                  done: asyncio.Event) -> int:
+  loop = asyncio.get_event_loop()
+  edits = 0
+  while not done.is_set():
+    try:
+      await asyncio.wait_for(done.wait(), interval)
+    except asyncio.TimeoutError:
+      edits += 1
+      await loop.run_in_executor(None, _Edit, family, rng, edits)
+  return edits
+
+async def _LoadTest(args: argparse.Namespace) -> None:
+  rng = random.Random(args.size)
+  family = ft.Family()
+  family.AddMany(MakeRecords(args.size))
+  # Popularity falls off as 1/rank, so that most requests are for a few
+  # people.
+  roots = [p.id for p in rng.sample(family.people, min(1000, family.Size()))]
+  weights = [1 / (rank + 1) for rank in range(len(roots))]
+
+  render_service = service.RenderService(family, workers=args.workers)
+  done = asyncio.Event()
+  editor = None
+  if args.edit_interval:
+    editor = asyncio.ensure_future(
+        _Editor(family, args.edit_interval, random.Random(0), done))
+  start = time.perf_counter()
+  per_client = args.requests // args.clients
+  await asyncio.gather(*(
+      _Client(render_service, roots, weights, per_client,
+              random.Random(i)) for i in range(args.clients)))
+  seconds = time.perf_counter() - start
+  done.set()
+  edits = await editor if editor else 0
+  render_service.Close()
+
+  print(render_service.Metrics())
+  print(f'{per_client * args.clients} requests by {args.clients} clients in '
+        f'{seconds:.2f}s ({per_client * args.clients / seconds:.0f}/s), '
+        f'{edits} edits')
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--size', type=int, default=10000,
+                      help='number of people in the family')
+  parser.add_argument('--clients', type=int, default=50,
+                      help='number of concurrent clients')
+  parser.add_argument('--requests', type=int, default=5000,
+                      help='total number of requests')
+  parser.add_argument('--workers', type=int, default=None,
+                      help='number of threads rendering DOT')
+  parser.add_argument('--edit-interval', type=float, default=0,
+                      help='seconds between edits to the family (none if 0)')
+  args = parser.parse_args()
+  loop = asyncio.new_event_loop()  # asyncio.run() needs Python 3.7.
+  asyncio.set_event_loop(loop)
+  loop.run_until_complete(_LoadTest(args))
+  loop.close()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Compares loading a Family snapshot with building the family again.
+
+Each family is made of independent households as in memory_benchmark.py.
+Building means calling Family.Person() for everyone and sorting; loading
+means Family.Load() of the snapshot written by Family.Save(), which already
+has the generations sorted.
+
+Usage:
+  benchmark/snapshot_benchmark.py [--sizes 10000,100000,1000000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+from memory_benchmark import MakeFamily
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--sizes', default='10000,100000,1000000',
+                      help='comma-separated numbers of people to try')
+  args = parser.parse_args()
+
+  print(f'{"people":>8} {"build (s)":>10} {"save (s)":>10} {"load (s)":>10} '
+        f'{"MB":>8} {"speedup":>8}')
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'family.bin')
+    for size in (int(s) for s in args.sizes.split(',')):
+      start = time.perf_counter()
+      family = MakeFamily(size)
+      family.Sort()
+      build = time.perf_counter() - start
+
+      start = time.perf_counter()
+      family.Save(path)
+      save = time.perf_counter() - start
+      del family
+
+      start = time.perf_counter()
+      ft.Family.Load(path).Sort()
+      load = time.perf_counter() - start
+      megabytes = os.path.getsize(path) / 2**20
+      print(f'{size:>8} {build:>10.3f} {save:>10.3f} {load:>10.3f} '
+            f'{megabytes:>8.1f} {build / load:>7.1f}x')
+
+if __name__ == '__main__':
+  main()
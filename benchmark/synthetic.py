@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""Generates synthetic families for benchmarks.
+
+The families grow generation by generation from founding couples.  Children
+marry outsiders (who have no recorded parents) or, at the cross-branch rate,
+unmarried people of the same generation from another family, which ties the
+branches together like real genealogies.  Some men remarry, and their later
+children are by the later wife.
+
+The output is a list of records as accepted by Family.AddMany(); feeding them
+to Family.Person() one by one builds the same family.  The same arguments and
+seed always give the same records.
+"""
+
+import random
+from typing import Dict, List, Optional, Text
+
+def MakeRecords(size: int, generations: int=8, branching: float=2.5,
+                marriage_rate: float=0.8, remarriage_rate: float=0.1,
+                cross_branch_rate: float=0.05,
+                seed: int=0) -> List[Dict[Text, object]]:
+  """Returns the records of a family of about `size` people.
+
+  `generations` is the depth of the tree and `branching` the average number
+  of children per couple.  Of the children, `marriage_rate` marry;
+  `remarriage_rate` of the married men marry again, and `cross_branch_rate`
+  of the marriages are between two people who are already in the family.
+  """
+
+  rng = random.Random(seed)
+  records = []
+  people = 0
+
+  def New(gender: Text, birth: int,
+          **relatives: Text) -> Optional[Text]:
+    """Adds a new person and returns their name, or None if the family is
+    big enough already."""
+
+    nonlocal people
+    if people >= size:
+      return None
+    people += 1
+    name = f'Person {people}'
+    records.append(dict(name=name, gender=gender, birth=str(birth),
+                        **relatives))
+    return name
+
+  # Estimate the number of people in the family of one founding couple.  Each
+  # couple has `branching` children, of whom `marriage_rate` bring in a spouse
+  # and form a couple of the next generation.
+  people_per_couple = 2.0
+  couples = 1.0
+  for _ in range(1, generations):
+    people_per_couple += couples * branching * (1 + marriage_rate)
+    couples *= branching * marriage_rate
+
+  # The estimate is rough, so keep adding independent clans until the family
+  # is big enough.
+  while people < size:
+    founders = max(1, round((size - people) / people_per_couple))
+    year = 1600
+    couples = []  # (husband, wife) pairs of the current generation.
+    for _ in range(founders):
+      husband = New('M', year)
+      wife = New('F', year, husband=husband) if husband else None
+      if wife:
+        couples.append((husband, wife))
+
+    for _ in range(1, generations):
+      year += 25
+      children = []  # (name, gender, father) of the next generation.
+      for husband, wife in couples:
+        for _ in range(round(rng.expovariate(1 / branching))
+                       if branching else 0):
+          gender = rng.choice('MF')
+          child = New(gender, year, father=husband, mother=wife)
+          if child:
+            children.append((child, gender, husband))
+
+      marrying = [c for c in children if rng.random() < marriage_rate]
+      # Maps a gender to the marrying children of that gender.
+      by_gender = {'M': [], 'F': []}
+      for c in marrying:
+        by_gender[c[1]].append(c)
+      spouses = {}  # Maps a child to their spouse, if it's another child.
+      for child, gender, father in marrying:
+        if child in spouses or rng.random() >= cross_branch_rate:
+          continue
+        candidates = by_gender['F' if gender == 'M' else 'M']
+        for _ in range(3):  # Look for someone from another branch.
+          other, _, other_father = rng.choice(candidates or [(None,) * 3])
+          if other and other not in spouses and other_father != father:
+            spouses[child] = other
+            spouses[other] = child
+            break
+
+      couples = []
+      for child, gender, _ in marrying:
+        spouse = spouses.get(child)
+        if spouse is None:
+          spouse = New('F' if gender == 'M' else 'M', year,
+                       **{'husband' if gender == 'M' else 'wife': child})
+          if spouse is None:
+            break
+        elif gender == 'F':
+          continue  # The couple is added with the husband.
+        else:
+          records.append({'name': child, 'wife': spouse})
+        husband, wife = (child, spouse) if gender == 'M' else (spouse, child)
+        couples.append((husband, wife))
+        if rng.random() < remarriage_rate:
+          second_wife = New('F', year, husband=husband)
+          if second_wife:
+            couples.append((husband, second_wife))
+      if not couples:
+        break
+  return records
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures how the cost of Family.ToDot grows with the width of a generation.
+
+Each family has a single pair of grandparents with N sons; every son has a
+wife and two children.  The grandchildren therefore form one generation of 2N
+cousins, grouped into N marriages.  If the per-generation work is linear, the
+time per person stays flat as N grows.
+
+Usage:
+  benchmark/todot_benchmark.py [--widths 1000,2000,4000,8000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+def MakeWideFamily(width: int) -> ft.Family:
+  """Returns a family whose third generation has 2 * `width` cousins."""
+
+  family = ft.Family()
+  family.Person('Grandfather', wife='Grandmother')
+  for i in range(width):
+    son = f'Son{i}'
+    family.Person(son, father='Grandfather', mother='Grandmother',
+                  wife=f'Wife{i}')
+    family.Person(f'Grandson{i}', father=son, mother=f'Wife{i}')
+    family.Person(f'Granddaughter{i}', father=son, mother=f'Wife{i}')
+  return family
+
+def TimeToDot(width: int, repeat: int) -> float:
+  """Returns the best wall time of `repeat` ToDot() runs, in seconds.
+
+  Each run uses a new family, as ToDot() caches generations that haven't
+  changed.
+  """
+
+  best = None
+  for _ in range(repeat):
+    family = MakeWideFamily(width)
+    start = time.perf_counter()
+    family.ToDot()
+    elapsed = time.perf_counter() - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--widths', default='1000,2000,4000,8000',
+                      help='comma-separated numbers of sons to try')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='number of runs per width; the best is reported')
+  args = parser.parse_args()
+
+  print(f'{"width":>8} {"people":>8} {"ToDot (s)":>10} {"us/person":>10}')
+  for width in (int(w) for w in args.widths.split(',')):
+    seconds = TimeToDot(width, args.repeat)
+    people = 4 * width + 2
+    per_person = seconds / people * 1e6
+    print(f'{width:>8} {people:>8} {seconds:>10.4f} {per_person:>10.2f}')
+
+if __name__ == '__main__':
+  main()
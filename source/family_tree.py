@@ -6,61 +6,354 @@ graphviz (dot).
 
 __author__ = 'Zhanyong Wan'
 
-from typing import List, Optional, Sequence, Text, Tuple
+import abc
+import array
+import contextlib
+import cProfile
+import gc
+import io
+import itertools
+import os
+import pstats
+import re
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+import unicodedata
+from typing import (AbstractSet, Callable, ContextManager, Iterable, Iterator,
+                    List, Mapping, NamedTuple, Optional, Sequence, Text,
+                    TextIO, Tuple)
 
 def _GetDefaultIdFromName(name: Text) -> Text:
   """Gets a person's default ID from their name."""
 
   return name.replace(' ', '')
 
+_WORD_RE = re.compile(r'\w+')
+
+# The first three- or four-digit number in a date is taken as its year, e.g.
+# '1900', '12 MAR 1930', '1930-03-12', 'ABT 1850' or 'BET 1850 AND 1860'.
+_YEAR_RE = re.compile(r'(?<!\d)(\d{3,4})(?!\d)')
+
+def _GetYear(date: Optional[Text]) -> Optional[int]:
+  """Returns the year of a date, or None if it has none (e.g. '?')."""
+
+  match = date and _YEAR_RE.search(date)
+  return int(match.group(1)) if match else None
+
+def _IsAscii(text: Text) -> bool:
+  """Returns True iff `text` is all ASCII, like str.isascii() in 3.7+."""
+
+  try:
+    text.encode('ascii')
+  except UnicodeEncodeError:
+    return False
+  return True
+
+def _NormalizeName(name: Text) -> Text:
+  """Returns `name` in lower case, without accents and punctuation, for
+  comparing names loosely."""
+
+  if not _IsAscii(name):
+    decomposed = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in decomposed if not unicodedata.combining(c))
+  return ' '.join(_WORD_RE.findall(name.lower()))
+
+class GenerationConflict(NamedTuple):
+  """Describes a relationship edge that disagrees with the generations
+  already assigned.
+
+  `relative` is `person`'s `relation` (one of 'father', 'mother', 'husband',
+  'wife' or 'child'), so the edge implies that `relative` belongs to
+  generation `expected`, while another path has already placed them in
+  generation `actual`.
+  """
+
+  person: 'Person'
+  relation: Text
+  relative: 'Person'
+  expected: int
+  actual: int
+
+  def __str__(self) -> Text:
+    return (f'{self.relative.ID()} is the {self.relation} of '
+            f'{self.person.ID()} and should be in generation {self.expected}, '
+            f'but is in generation {self.actual}')
+
+class GenerationConflictError(ValueError):
+  """Raised when the relationships in a family imply inconsistent
+  generations."""
+
+  def __init__(self, conflicts: Sequence[GenerationConflict]):
+    self.conflicts = list(conflicts)
+    super().__init__('Inconsistent generations:\n' +
+                     '\n'.join(f'  {c}' for c in self.conflicts))
+
+class _PersonList(list):
+  """A list of distinct people in the order they are added.
+
+  People are identified by their IDs.  Membership tests and index() take
+  constant time; always add people with Add() to keep the index in sync.
+  """
+
+  __slots__ = ('_positions',)
+
+  def __init__(self, people: Iterable['Person']=()):
+    super().__init__(people)
+    # Maps ID to position in the list.
+    self._positions = {p.ID(): i for i, p in enumerate(self)}
+
+  def Add(self, person: 'Person') -> bool:
+    """Appends `person` unless they are already in the list.
+
+    Returns True iff the person was added.
+    """
+
+    id = person.ID()
+    if id in self._positions:
+      return False
+    self._positions[id] = len(self)
+    self.append(person)
+    return True
+
+  def __contains__(self, person) -> bool:
+    return isinstance(person, Person) and person.ID() in self._positions
+
+  def index(self, person, *args) -> int:
+    if args or not isinstance(person, Person):
+      return super().index(person, *args)
+    position = self._positions.get(person.ID())
+    if position is None:
+      raise ValueError(f'{person.ID()} is not in list')
+    return position
+
+def _AsNames(value) -> Sequence[Text]:
+  """The 'wife' and 'husband' attributes can be either a string or a tuple of
+  strings; returns them as a tuple."""
+
+  if not isinstance(value, tuple):
+    return (value,)
+  return value
+
+@contextlib.contextmanager
+def _PauseGc() -> Iterator[None]:
+  """Suspends the cyclic garbage collector.
+
+  Bulk loaders allocate millions of long-lived objects, which would otherwise
+  trigger many collections that find nothing to free.
+  """
+
+  enabled = gc.isenabled()
+  gc.disable()
+  try:
+    yield
+  finally:
+    if enabled:
+      gc.enable()
+
+class _ReadWriteLock:
+  """Lets any number of threads read at once, or one thread write.
+
+  Writers take priority: once one is waiting, new readers wait until it's
+  done, so a steady stream of readers can't hold off edits forever.  Both
+  kinds of access may be nested, and the writing thread may also read, but a
+  reading thread can't start writing (that would wait for itself).
+  """
+
+  def __init__(self):
+    self._condition = threading.Condition(threading.Lock())
+    self._readers = {}  # Maps a reading thread to how many times it entered.
+    self._writer = None  # The writing thread, if any.
+    self._writes = 0  # How many times the writer entered.
+    self._waiting_writers = 0
+
+  @contextlib.contextmanager
+  def Reading(self) -> Iterator[None]:
+    thread = threading.get_ident()
+    with self._condition:
+      # A thread that is already reading or writing goes ahead, as waiting for
+      # a writer would deadlock.
+      if thread not in self._readers and thread != self._writer:
+        while self._writer is not None or self._waiting_writers:
+          self._condition.wait()
+      self._readers[thread] = self._readers.get(thread, 0) + 1
+    try:
+      yield
+    finally:
+      with self._condition:
+        self._readers[thread] -= 1
+        if not self._readers[thread]:
+          del self._readers[thread]
+          self._condition.notify_all()
+
+  @contextlib.contextmanager
+  def Writing(self) -> Iterator[None]:
+    thread = threading.get_ident()
+    with self._condition:
+      if thread != self._writer:
+        if thread in self._readers:
+          raise RuntimeError("A thread that's reading can't start writing.")
+        self._waiting_writers += 1
+        try:
+          while self._writer is not None or self._readers:
+            self._condition.wait()
+        finally:
+          self._waiting_writers -= 1
+        self._writer = thread
+      self._writes += 1
+    try:
+      yield
+    finally:
+      with self._condition:
+        self._writes -= 1
+        if not self._writes:
+          self._writer = None
+          self._condition.notify_all()
+
+# Plain person attributes that Update() stores as is.
+_FIELD_ATTRIBUTES = frozenset(('name', 'annotation', 'gender', 'birth', 'death'))
+
+# Person attributes that the lifespan index depends on.
+_DATE_ATTRIBUTES = frozenset(('birth', 'death'))
+
+# Person attributes that name other people.
+_RELATION_ATTRIBUTES = frozenset(('wife', 'husband', 'father', 'mother'))
+
+# Maps a relation to the generation of the relative, relative to the person's.
+_RELATION_DELTAS = {'father': -1, 'mother': -1, 'husband': 0, 'wife': 0,
+                    'child': 1}
+
+# Shared by everyone who has no wives, husbands or children yet, so that they
+# don't each carry empty lists.  Children(), Wives() and Husbands() return
+# copies, so callers always get a list they can change.
+_NO_PEOPLE = ()
+
+# Snapshot files start with this, followed by _SNAPSHOT_HEADER's counts.
+_SNAPSHOT_MAGIC = b'FAMTREE1'
+# Magic, then the number of people, strings and bytes of strings; the number
+# of people with children, wives and husbands, and of each of those links;
+# the number of conflicts, and the string index of rankdir.
+_SNAPSHOT_HEADER = struct.Struct('<8s11q')
+# The per-person columns, in file order.  The first ones are indices into the
+# string table (-1 for None); 'father', 'mother' and 'first' (the first member
+# of the person's component) are indices of people (-1 for None).
+_SNAPSHOT_STRING_COLUMNS = ('name', 'id', 'annotation', 'gender', 'birth',
+                            'death', 'spouse_death')
+_SNAPSHOT_INT_COLUMNS = ('father', 'mother', 'level', 'first')
+
+def _ToLittleEndian(values: array.array) -> array.array:
+  if sys.byteorder == 'big':
+    values = array.array(values.typecode, values)
+    values.byteswap()
+  return values
+
+class _Component:
+  """A group of two or more people connected by relationships."""
+
+  __slots__ = ('first', 'members', 'offset')
+
+  def __init__(self, first: 'Person', members: List['Person']):
+    self.first = first  # The member added to the family first.
+    self.members = members
+    # Generations to add to the level of every member; see Family._Shift().
+    self.offset = 0
+
+def _GetLevel(person: 'Person') -> int:
+  """Returns the level of `person`, including their component's offset."""
+
+  component = person.component
+  return person.level + component.offset if component else person.level
+
+# The DOT of the elbow points that edges to and from a person bend at.
+_ELBOW_ATTRIBUTES = '[shape=circle label="" height=0.01 width=0.01]'
+
+class _DotFragments:
+  """The pieces of a person's DOT that don't depend on their relatives.
+
+  They are computed the first time the person is rendered and reused until
+  one of their fields changes.
+  """
+
+  __slots__ = ('node', 'elbow', 'elbow_node', 'union', 'union_node',
+               'marriages')
+
+  def __init__(self, person: 'Person'):
+    self.node = person._NodeToDot()
+    self.elbow = f'p_{person.id}'  # Where the edge to the parents bends.
+    self.elbow_node = f'{self.elbow} {_ELBOW_ATTRIBUTES};'
+    self.union = f'u_{person.id}'  # Where multiple marriages fan out.
+    self.union_node = f'{self.union} {_ELBOW_ATTRIBUTES};'
+    self.marriages = {}  # Maps a wife to the ID of the marriage node.
+
 class Person:
   """Represents a person."""
 
-  def __init__(self, family: 'Family', name: Text):
+  # A family can have millions of people, so avoid a per-instance __dict__.
+  __slots__ = ('family', 'level', 'component', 'order_added', 'name', 'id',
+               'annotation', 'gender', 'wives', 'husbands', 'father', 'mother',
+               'children', 'birth', 'death', 'spouse_death', 'dot', 'rank')
+
+  def __init__(self, family: 'Family', name: Text, id: Optional[Text]=None):
     self.family = family
-    self.generation = None
+    # The person's generation relative to the first person added in their
+    # component, who is at level 0, less the component's offset until the
+    # family applies it.  Maintained by the family.
+    self.level = 0
+    self.component = None  # None if the person has no relatives.
     self.order_added = None
     self.name = name
-    self.id = _GetDefaultIdFromName(name)
+    self.id = id if id is not None else _GetDefaultIdFromName(name)
     self.annotation = None
     self.gender = None
-    self.wives = []
-    self.husbands = []
+    self.wives = _NO_PEOPLE
+    self.husbands = _NO_PEOPLE
     self.father = None
     self.mother = None
-    self.children = []
+    self.children = _NO_PEOPLE
     self.birth = None
     self.death = None
     self.spouse_death = None
+    self.dot = None  # The cached _DotFragments, if any.
+    # (order added of the highest-ranked husband, position among his wives
+    # counting from 1), or None if the person has had no husbands.
+    self.rank = None
 
   def Family(self) -> 'Family':
     return self.family
 
   def Generation(self) -> int:
-    return self.generation
+    return self.family._GetGeneration(self)
 
   def AddWife(self, wife: 'Person') -> 'Person':
-    for w in self.wives:
-      if w == wife:
-        return self
-    self.SetGender('M')
-    self.wives.append(wife)
-    wife.AddHusband(self)
+    if self.wives is _NO_PEOPLE:
+      self.wives = _PersonList()
+    if self.wives.Add(wife):
+      if wife.rank is None or wife.rank[0] < self.order_added:
+        wife.rank = (self.order_added, len(self.wives))
+      self.family._Link(self, 'wife', wife, 0)
+      self.family._Touch(self)
+      self.SetGender('M')
+      wife.AddHusband(self)
     return self
 
   def AddHusband(self, husband: 'Person') -> 'Person':
-    for h in self.husbands:
-      if h == husband:
-        return self
-    self.SetGender('F')
-    self.husbands.append(husband)
-    husband.AddWife(self)
+    if self.husbands is _NO_PEOPLE:
+      self.husbands = _PersonList()
+    if self.husbands.Add(husband):
+      self.family._Link(self, 'husband', husband, 0)
+      self.family._Touch(self)
+      self.SetGender('F')
+      husband.AddWife(self)
     return self
 
   def SetFather(self, father: 'Person') -> 'Person':
     if self.father != father:
       father.SetGender('M')
       self.father = father
+      self.family._Link(self, 'father', father, -1)
+      self.family._Touch(self)
       father.AddChild(self)
     return self
 
@@ -71,6 +364,8 @@ class Person:
     if self.mother != mother:
       mother.SetGender('F')
       self.mother = mother
+      self.family._Link(self, 'mother', mother, -1)
+      self.family._Touch(self)
       mother.AddChild(self)
     return self
 
@@ -78,87 +373,106 @@ class Person:
     return self.mother
 
   def AddChild(self, child: 'Person') -> 'Person':
-    id = child.ID()
-    for c in self.children:
-      if c.ID() == id:
-        return self
-    self.children.append(child)
+    if self.children is _NO_PEOPLE:
+      self.children = _PersonList()
+    if not self.children.Add(child):
+      return self
+    self.family._Link(self, 'child', child, 1)
     if self.Gender() == 'M':
       child.SetFather(self)
     elif self.Gender() == 'F':
       child.SetMother(self)
     return self
 
-  def Children(self) -> Sequence['Person']:
-    return self.children
+  def Children(self) -> List['Person']:
+    """Returns a copy of the list of children, in the order added."""
+
+    return list(self.children)
 
   def Update(self, **args) -> 'Person':
     for name, value in args.items():
-      if name == 'name':
-        self.name = value
-      elif name == 'annotation':
-        self.annotation = value
-      elif name == 'gender':
-        self.gender = value
-      elif name == 'birth':
-        self.birth = value
-      elif name == 'death':
-        self.death = value
+      if name in _FIELD_ATTRIBUTES:
+        self._SetAttribute(name, value)
       elif name == 'spouse_death':
-        self.spouse_death = value
-        if self.spouse_death:
-          for spouse in self.Wives() + self.Husbands():
-            spouse.death = self.spouse_death
+        self._SetSpouseDeath(value)
       elif name == 'wife':
-        # The 'wife' attribute can be either a string or a tuple of strings.
-        if not isinstance(value, tuple):
-          value = (value,)
-
-        for wife_name in value:
-          wife = self.Family().PersonByName(name=wife_name)
-          if self.spouse_death:  # Spouse death status is known.
-            wife.death = self.spouse_death
-          self.AddWife(wife)
+        self._AddWives([self.Family().PersonByName(name=wife_name)
+                        for wife_name in _AsNames(value)])
       elif name == 'husband':
-        # The 'husband' attribute can be either a string or a tuple of strings.
-        if not isinstance(value, tuple):
-          value = (value,)
-
-        for husband_name in value:
-          husband = self.Family().PersonByName(name=husband_name)
-          if self.spouse_death:  # Spouse death status is known.
-            husband.death = self.spouse_death
-          self.AddHusband(husband)
+        self._AddHusbands([self.Family().PersonByName(name=husband_name)
+                           for husband_name in _AsNames(value)])
       elif name == 'father':
-        father = self.Family().PersonByName(name=value)
-        self.SetFather(father)
-        mothers = father.Wives()
-        if len(mothers) == 1 and not self.mother:
-          self.SetMother(mothers[0])          
+        self._SetFatherAndInferMother(self.Family().PersonByName(name=value))
       elif name == 'mother':
-        mother = self.Family().PersonByName(name=value)
-        self.SetMother(mother)
-        fathers = mother.Husbands()
-        if len(fathers) == 1 and not self.father:
-          self.SetFather(fathers[0])
+        self._SetMotherAndInferFather(self.Family().PersonByName(name=value))
       else:
         raise ValueError(f'Invalid person attribute "{name}".')
     return self
 
+  def _SetAttribute(self, name: Text, value: Text) -> None:
+    if getattr(self, name) == value:
+      return  # So that looking up a person doesn't invalidate the caches.
+    family = self.family
+    if name == 'name' and family._name_index is not None:
+      family._name_index.Remove(self)
+      self.name = value
+      family._name_index.Add(self)
+    else:
+      setattr(self, name, value)
+      if name in _DATE_ATTRIBUTES and family._lifespan_index is not None:
+        family._lifespan_index.Update(self)
+    self.dot = None
+    self.family._Touch(self)
+
+  def _SetSpouseDeath(self, spouse_death: Text) -> None:
+    self.spouse_death = spouse_death
+    if self.spouse_death:
+      for spouse in itertools.chain(self.wives, self.husbands):
+        spouse._SetAttribute('death', self.spouse_death)
+
+  def _AddWives(self, wives: Sequence['Person']) -> None:
+    for wife in wives:
+      if self.spouse_death:  # Spouse death status is known.
+        wife._SetAttribute('death', self.spouse_death)
+      self.AddWife(wife)
+
+  def _AddHusbands(self, husbands: Sequence['Person']) -> None:
+    for husband in husbands:
+      if self.spouse_death:  # Spouse death status is known.
+        husband._SetAttribute('death', self.spouse_death)
+      self.AddHusband(husband)
+
+  def _SetFatherAndInferMother(self, father: 'Person') -> None:
+    self.SetFather(father)
+    mothers = father.wives
+    if len(mothers) == 1 and not self.mother:
+      self.SetMother(mothers[0])
+
+  def _SetMotherAndInferFather(self, mother: 'Person') -> None:
+    self.SetMother(mother)
+    fathers = mother.husbands
+    if len(fathers) == 1 and not self.father:
+      self.SetFather(fathers[0])
+
   def ID(self) -> Text:
     return self.id
 
   def Name(self) -> Text:
     return self.name
 
-  def Wives(self) -> Sequence['Person']:
-    return self.wives
+  def Wives(self) -> List['Person']:
+    """Returns a copy of the list of wives, in the order married."""
+
+    return list(self.wives)
+
+  def Husbands(self) -> List['Person']:
+    """Returns a copy of the list of husbands, in the order married."""
 
-  def Husbands(self) -> Sequence['Person']:
-    return self.husbands
+    return list(self.husbands)
 
   def SetGender(self, gender : Text) -> 'Person':
-    self.gender = gender
+    if self.gender != gender:
+      self._SetAttribute('gender', gender)
     return self
 
   def Gender(self) -> Text:
@@ -177,25 +491,24 @@ class Person:
   def Deceased(self) -> bool:
     return self.death
 
-  def PropagateGeneration(self, my_generation: int) -> 'Person':
-    if self.generation is not None:
-      assert self.generation == my_generation
-      return self
+  def _Dot(self) -> _DotFragments:
+    if self.dot is None:
+      self.dot = _DotFragments(self)
+    return self.dot
 
-    self.generation = my_generation
-    if self.Father():
-      self.Father().PropagateGeneration(my_generation - 1)
-    if self.Mother():
-      self.Mother().PropagateGeneration(my_generation - 1)
-    for husband in self.Husbands():
-      husband.PropagateGeneration(my_generation)
-    for wife in self.Wives():
-      wife.PropagateGeneration(my_generation)
-    for child in self.Children():
-      child.PropagateGeneration(my_generation + 1)
-    return self
+  def _MarriageId(self, wife: 'Person') -> Text:
+    """Returns the ID of the node for this person's marriage to `wife`."""
+
+    marriages = self._Dot().marriages
+    marriage_id = marriages.get(wife)
+    if marriage_id is None:
+      marriage_id = marriages[wife] = f'm_{self.id}_{wife.id}'
+    return marriage_id
 
   def ToDot(self) -> Text:
+    return self._Dot().node
+
+  def _NodeToDot(self) -> Text:
     attribs = []
     label = self.name
     if self.annotation:
@@ -225,34 +538,889 @@ class Person:
     dot = f'{self.id} [{" ".join(attribs)}];'
     return dot
 
-class Family:
-  """Represents a family of people."""
+def _GetRankInGeneration(p: Person) -> Tuple[int, int]:
+  """Returns the rank of the person within the same generation.
+
+  A male, or a female who has not had a husband, is ranked by the order they
+  were added.  A female who has had husbands is ranked after her
+  highest-ranked husband, with his wives in the order they were married;
+  AddWife() keeps that rank up to date.
+  """
+
+  rank = p.rank
+  if rank is None or p.gender == 'M':
+    return (p.order_added, 0)
+  return rank
+
+def _GenerationToDot(gen_num: int, gen: Sequence[Person],
+                     members: Optional[AbstractSet[Person]]=None,
+                     stats: Optional['RenderStats']=None) -> Text:
+  """Returns the DOT representation of generation `gen_num`, which has the
+  people in `gen` in order.
+
+  If `members` is not None, relatives who are not in it are left out.
+  The work is recorded in `stats` if it's not None.
+  """
+
+  if stats is not None:
+    start = time.perf_counter()
+
+  def Parents(p: Person) -> Tuple[Optional[Person], Optional[Person]]:
+    father, mother = p.Father(), p.Mother()
+    if members is not None:
+      if father not in members:
+        father = None
+      if mother not in members:
+        mother = None
+    return father, mother
+
+  def Wives(p: Person) -> Sequence[Person]:
+    if members is None or not p.wives:
+      return p.wives
+    return [w for w in p.wives if w in members]
+
+  dot = []
+  dot.append('\t################')
+  dot.append(f'\t# Generation {gen_num}.')
+
+  dot.append('')
+  dot.append(f'\t# People in generation {gen_num}.')
+  for p in gen:
+    dot.append('\t' + p._Dot().node)
+
+  # Maps marriage ID to child list, in the order the marriages are first
+  # seen.
+  if stats is not None:
+    grouping = time.perf_counter()
+    stats.seconds['emission'] += grouping - start
+  marriage_to_children = {}
+  for p in gen:
+    father, mother = Parents(p)
+    if father and mother:
+      marriage_id = father._MarriageId(mother)
+      marriage_to_children.setdefault(marriage_id, []).append(p)
+  if stats is not None:
+    grouped = time.perf_counter()
+    stats.seconds['grouping'] += grouped - grouping
+
+  dot.append('')
+  dot.append(f'\t# Parents of generation {gen_num}.')
+  for marriage_id, children in marriage_to_children.items():
+    if len(children) == 1:
+      dot.append(f'\t{marriage_id} -> {children[0].id} [weight=10];')
+    else:
+      for child in children:
+        # Define the elbow point.
+        dot.append('\t' + child._Dot().elbow_node)
+      middle_child = children[(len(children) -1) // 2]
+      dot.append(f'\t{marriage_id} -> {middle_child._Dot().elbow} '
+                 '[weight=10];')
+      for child in children:
+        dot.append(f'\t{child._Dot().elbow} -> {child.id} [weight=10];')
+
+  dot.append('')
+  dot.append(f'\t# Order the parent elbow points for generation {gen_num}.')
+  dot.append('\t{')
+  dot.append('\t\trank=same;')
+  last_p_node = None
+  for marriage_id, children in marriage_to_children.items():
+    if len(children) == 1:
+      continue
+    if last_p_node:
+      dot.append(f'\t\t{last_p_node} -> {children[0]._Dot().elbow} '
+                 '[style="invis"];')
+    chain = ' -> '.join(child._Dot().elbow for child in children)
+    dot.append(f'\t\t{chain};')
+    last_p_node = children[-1]._Dot().elbow
+  dot.append('\t}')
+
+  dot.append('')
+  dot.append(f'\t# Order the people in generation {gen_num}.')
+  for p in gen:
+    wives = Wives(p)
+    if len(wives) > 1:
+      # Add extra elbow points to account for multiple wives of the same person.
+      fragments = p._Dot()
+      dot.append('\t' + fragments.union_node)
+      dot.append(f'\t{fragments.union} -> {p.id} [weight=10];')
+      elbows = [fragments.union]
+      for w in wives[1:]:
+        union = w._Dot().union
+        dot.append('\t' + w._Dot().union_node)
+        dot.append(f'\t{union} -> {p._MarriageId(w)} [weight=10];')
+        elbows.append(union)
+      dot.append('\t{')
+      dot.append('\t\trank=same;')
+      dot.append('\t\t' + ' -> '.join(elbows) + ';')
+      dot.append('\t}')
+
+  dot.append('\t{')
+  dot.append('\t\trank=same;')
+  last_person = None
+  last_male = None
+  for p in gen:
+    marriage_id = None
+    if last_male:
+      wives = Wives(last_male)
+      if p in wives:
+        k = wives.index(p)
+        marriage_id = last_male._MarriageId(p)
+        dot.append(f'\t\t{marriage_id} [shape="diamond" label="" height=0.25 width=0.25];')
+        if k == 0:
+          dot.append(f'\t\t{last_male.ID()} -> {marriage_id} -> {p.ID()} [weight=10];')
+        else:
+          dot.append(f'\t\t{marriage_id} -> {p.ID()} [weight=10];')
+    if last_person:
+      if p not in Wives(last_person):
+        id = marriage_id if marriage_id else p.ID()
+        dot.append(f'\t\t{last_person.ID()} -> {id} [style="invis"];')
+    last_person = p
+    if p.Gender() == 'M':
+      last_male = p
+  dot.append('\t}')
+  dot.append('')
+  dot = '\n'.join(dot) + '\n'
+
+  if stats is not None:
+    stats.seconds['emission'] += time.perf_counter() - grouped
+    elbows = sum(len(children) for children in marriage_to_children.values()
+                 if len(children) > 1)
+    elbows += sum(len(Wives(p)) for p in gen if len(Wives(p)) > 1)
+    stats._AddGeneration(gen_num, len(gen), len(marriage_to_children), elbows,
+                         len(dot), False)
+  return dot
+
+def _DotHeader(rankdir: Optional[Text]) -> Text:
+  """Returns the beginning of a DOT graph, up to the first generation."""
+
+  rankdir = rankdir if rankdir else ''
+  return f"""digraph G {{
+    rankdir="{rankdir}";
+    node [shape=box fontname="Kai"];
+    edge [dir=none];
+    graph [splines="line"];
+
+"""
+
+class _DotWriter(abc.ABC):
+  """Provides WriteDot() and ToDot() on top of IterDot()."""
+
+  @abc.abstractmethod
+  def IterDot(self) -> Iterator[Text]:
+    """Generates the DOT representation piece by piece, starting with the
+    graph header."""
+
+  def WriteDot(self, fp: TextIO) -> None:
+    """Writes the DOT representation to a text file object, one generation at
+    a time."""
+
+    for chunk in self.IterDot():
+      fp.write(chunk)
+
+  def ToDot(self) -> Text:
+    """Returns the DOT representation."""
+
+    return ''.join(self.IterDot())
+
+class FamilyView(_DotWriter):
+  """A subset of the people in a family, e.g. the descendants of a person.
+
+  Sort() and ToDot() only look at the people in the view and the
+  relationships among them, so they take time proportional to the size of
+  the view rather than of the family.  The view doesn't follow changes to
+  the family made after it's created, other than changes to the people in it.
+  """
+
+  def __init__(self, family: 'Family', people: Iterable[Person]):
+    self.family = family
+    self.members = frozenset(people)
+    # In the order they were added to the family.
+    self.people = sorted(self.members, key=lambda p: p.order_added)
+
+  def Family(self) -> 'Family':
+    return self.family
+
+  def Size(self) -> int:
+    return len(self.people)
+
+  def __contains__(self, person) -> bool:
+    return person in self.members
+
+  def Sort(self) -> List[List[Person]]:
+    """Sorts the people in the view like Family.Sort() does."""
+
+    if not self.people:
+      return [[]]
+
+    conflicts = [c for c in self.family.GenerationConflicts()
+                 if c.person in self.members and c.relative in self.members]
+    if conflicts:
+      raise GenerationConflictError(conflicts)
+
+    with self.family._cache_lock:
+      self.family._ApplyShifts()
+    min_level = min(p.level for p in self.people)
+    max_level = max(p.level for p in self.people)
+    generations = [[] for _ in range(max_level - min_level + 1)]
+    for p in self.people:
+      generations[p.level - min_level].append(p)
+
+    members = self.members
+    def GetRankInGeneration(p: Person) -> Tuple[int, int]:
+      """Like _GetRankInGeneration(), but ignores people outside the view."""
+
+      husbands = [h for h in p.husbands if h in members]
+      if p.Gender() == 'M' or not husbands:
+        return (p.order_added, 0)
+      husband = max(husbands, key=lambda h: h.order_added)
+      wives = [w for w in husband.wives if w in members]
+      return (husband.order_added, wives.index(p) + 1)
+
+    for gen in generations:
+      gen.sort(key=GetRankInGeneration)
+    return generations
+
+  def IterDot(self) -> Iterator[Text]:
+    """Generates the DOT representation of the view piece by piece, like
+    Family.IterDot() does."""
+
+    yield _DotHeader(self.family.rankdir)
+    for i, gen in enumerate(self.Sort()):
+      yield _GenerationToDot(i + 1, gen, self.members, self.family._stats)
+    yield '}'
+
+class Page(FamilyView):
+  """One page of a family that is too large to lay out in one piece.
+
+  A page has the people in generations `first_generation` to
+  `last_generation` (numbered from 1 as in Family.ToDot()).  Its DOT has stub
+  nodes standing for the parents on the previous page and for the children
+  on the next page.
+  """
+
+  def __init__(self, family: 'Family', people: Iterable[Person], number: int,
+               first_generation: int, last_generation: int):
+    super().__init__(family, people)
+    self.number = number
+    self.first_generation = first_generation
+    self.last_generation = last_generation
+
+  def _StubsToDot(self) -> List[Text]:
+    members = self.members
+    parent_stubs = {}  # Maps parents outside the page to their children.
+    child_stubs = {}  # Maps a parent to the number of children off the page.
+    for p in self.people:
+      parents = tuple(q for q in (p.Father(), p.Mother()) if q)
+      if parents and not any(q in members for q in parents):
+        parent_stubs.setdefault(parents, []).append(p)
+      for child in p.children:
+        if child in members:
+          continue
+        # Count each child once, under the father if there is one.
+        parent = child.Father() or child.Mother()
+        if parent is p:
+          child_stubs[p] = child_stubs.get(p, 0) + 1
+
+    dot = []
+    if parent_stubs:
+      dot.append(f'\t# Parents on page {self.number - 1}.')
+      for parents, children in parent_stubs.items():
+        stub_id = 's_' + '_'.join(q.ID() for q in parents)
+        names = ' & '.join(q.Name() for q in parents)
+        dot.append(f'\t{stub_id} [shape=note label="{names}\\n'
+                   f'(page {self.number - 1})"];')
+        for child in children:
+          dot.append(f'\t{stub_id} -> {child.ID()} [style="dashed"];')
+      dot.append('')
+    if child_stubs:
+      dot.append(f'\t# Children on page {self.number + 1}.')
+      for parent, count in child_stubs.items():
+        stub_id = f'c_{parent.ID()}'
+        noun = 'child' if count == 1 else 'children'
+        dot.append(f'\t{stub_id} [shape=note label="{count} {noun}\\n'
+                   f'(page {self.number + 1})"];')
+        dot.append(f'\t{parent.ID()} -> {stub_id} [style="dashed"];')
+      dot.append('')
+    return dot
+
+  def IterDot(self) -> Iterator[Text]:
+    """Generates the DOT representation of the page piece by piece."""
+
+    yield _DotHeader(self.family.rankdir)
+    for i, gen in enumerate(self.Sort()):
+      yield _GenerationToDot(self.first_generation + i, gen, self.members,
+                             self.family._stats)
+    stubs = self._StubsToDot()
+    if stubs:
+      yield '\n'.join(stubs) + '\n'
+    yield '}'
+
+def _GetLineParent(person: Person) -> Optional[Person]:
+  """Returns the parent under whom `person` is counted as a descendant: the
+  one who has parents themselves (i.e. the one of the family's line rather
+  than married into it), the father if both or neither do."""
+
+  father, mother = person.father, person.mother
+  if father is None:
+    return mother
+  if (mother is not None and father.father is None and
+      father.mother is None and
+      (mother.father is not None or mother.mother is not None)):
+    return mother
+  return father
+
+class Overview(FamilyView):
+  """A family with its large branches collapsed into summary nodes, so that
+  it can be laid out quickly; see Family.Overview()."""
+
+  def __init__(self, family: 'Family', people: Iterable[Person],
+               summaries: Mapping[Person, Tuple[int, int]]):
+    super().__init__(family, people)
+    # Maps a person in the overview to the number of their children left
+    # out, and the number of descendants left out in all.
+    self.summaries = summaries
+
+  def _SummariesToDot(self) -> List[Text]:
+    dot = ['\t# Descendants left out.']
+    for parent, (children, descendants) in self.summaries.items():
+      stub_id = f'd_{parent.ID()}'
+      if any(child in self.members for child in parent.children):
+        noun = 'child' if children == 1 else 'children'
+        label = f'+{children} more {noun}'
+        if descendants > children:
+          label += f'\\n+{descendants - children} of their descendants'
+      else:
+        label = f'+{descendants} descendants'
+      dot.append(f'\t{stub_id} [shape=note label="{label}"];')
+      dot.append(f'\t{parent.ID()} -> {stub_id} [style="dashed"];')
+    dot.append('')
+    return dot
+
+  def IterDot(self) -> Iterator[Text]:
+    """Generates the DOT representation of the overview piece by piece."""
+
+    yield _DotHeader(self.family.rankdir)
+    for i, gen in enumerate(self.Sort()):
+      yield _GenerationToDot(i + 1, gen, self.members, self.family._stats)
+    if self.summaries:
+      yield '\n'.join(self._SummariesToDot()) + '\n'
+    yield '}'
+
+class Kinship(NamedTuple):
+  """How `person` is related to `relative`, e.g. their 'second cousin'."""
+
+  person: Person
+  relative: Person
+  term: Text
+  # The expected fraction of genes shared by descent (ignoring inbreeding),
+  # e.g. 0.5 for siblings and 0 for in-laws.
+  coefficient: float
+  # The nearest ancestors both share by blood (through the spouse for
+  # in-laws).
+  common_ancestors: Tuple[Person, ...]
+
+  def __str__(self) -> Text:
+    return f"{self.person.Name()} is {self.relative.Name()}'s {self.term}."
+
+_ORDINALS = ('first', 'second', 'third', 'fourth', 'fifth', 'sixth',
+             'seventh', 'eighth', 'ninth', 'tenth')
+
+def _GetKinshipTerm(up: int, down: int, half: bool,
+                    gender: Optional[Text]) -> Text:
+  """Returns what someone is to a blood relative, given how many generations
+  each of them is below their nearest common ancestor (`up` and `down`).
+
+  E.g. (0, 1) is a parent and (2, 3) is a first cousin once removed.
+  """
+
+  def Gendered(male: Text, female: Text, neutral: Text) -> Text:
+    return {'M': male, 'F': female}.get(gender, neutral)
+
+  if up == 0 or down == 0:
+    if up == 0:
+      n, word = down, Gendered('father', 'mother', 'parent')
+    else:
+      n, word = up, Gendered('son', 'daughter', 'child')
+    return word if n == 1 else 'great-' * (n - 2) + 'grand' + word
+
+  prefix = 'half-' if half else ''
+  if up == 1 and down == 1:
+    return prefix + Gendered('brother', 'sister', 'sibling')
+  if up == 1:
+    return prefix + 'great-' * (down - 2) + Gendered('uncle', 'aunt',
+                                                     'uncle/aunt')
+  if down == 1:
+    return prefix + 'great-' * (up - 2) + Gendered('nephew', 'niece',
+                                                   'nephew/niece')
+  degree = min(up, down) - 1
+  term = (_ORDINALS[degree - 1] if degree <= len(_ORDINALS) else
+          f'{degree}th') + ' cousin'
+  removed = abs(up - down)
+  if removed:
+    term += ' ' + {1: 'once', 2: 'twice'}.get(removed, f'{removed} times')
+    term += ' removed'
+  return prefix + term
+
+class _BloodRelation(NamedTuple):
+  up: int  # Generations from the person to the nearest common ancestors.
+  down: int  # Generations from the relative to them.
+  half: bool
+  coefficient: float
+  common_ancestors: Tuple[Person, ...]
+
+class _AncestorIndex:
+  """Answers blood relationship queries with ancestor bitsets.
+
+  Everyone gets a bit, numbered in generation order, so the highest bit that
+  two people's ancestor sets share is one of their nearest common ancestors.
+  The bitsets are computed on demand and memoized; each one costs a few
+  big-integer ORs as it reuses the bitsets of the parents.
+  """
+
+  def __init__(self, generations: Sequence[Sequence[Person]]):
+    self.people = []  # Maps a bit to its person.
+    self.bits = {}  # Maps a person to their bit.
+    self.first_bits = []  # The first bit of each generation, then the end.
+    self.generations = {}  # Maps a person to their generation index.
+    for i, gen in enumerate(generations):
+      self.first_bits.append(len(self.people))
+      for p in gen:
+        self.bits[p] = len(self.people)
+        self.generations[p] = i
+        self.people.append(p)
+    self.first_bits.append(len(self.people))
+    self.ancestors = {}  # Maps a person to the bitset of them and ancestors.
+
+  def Ancestors(self, person: Person) -> int:
+    """Returns the bitset of `person` and their ancestors."""
+
+    ancestors = self.ancestors
+    if person in ancestors:
+      return ancestors[person]
+    stack = [person]
+    while stack:  # Not recursive, as the ancestry may be very deep.
+      p = stack[-1]
+      parents = [q for q in (p.father, p.mother) if q is not None]
+      missing = [q for q in parents if q not in ancestors]
+      if missing:
+        stack.extend(missing)
+        continue
+      stack.pop()
+      bits = 1 << self.bits[p]
+      for q in parents:
+        bits |= ancestors[q]
+      ancestors[p] = bits
+    return ancestors[person]
+
+  def _PathChild(self, ancestor: Person, person: Person) -> Optional[Person]:
+    """Returns the child of `ancestor` that `person` descends from."""
+
+    ancestors = self.Ancestors(person)
+    for child in ancestor.children:
+      if ancestors >> self.bits[child] & 1:
+        return child
+    return None
+
+  def Relate(self, person: Person,
+             relative: Person) -> Optional[_BloodRelation]:
+    """Returns how `person` is related to `relative` by blood, if at all."""
+
+    common = self.Ancestors(person) & self.Ancestors(relative)
+    if not common:
+      return None
+
+    nearest = self.people[common.bit_length() - 1]
+    gen = self.generations[nearest]
+    up = self.generations[person] - gen
+    down = self.generations[relative] - gen
+    mask = (1 << self.first_bits[gen + 1]) - (1 << self.first_bits[gen])
+    nearest_bits = common & mask
+    common_ancestors = tuple(
+        p for p in self.people[self.first_bits[gen]:self.first_bits[gen + 1]]
+        if nearest_bits >> self.bits[p] & 1)
+
+    half = False
+    if up and down and len(common_ancestors) == 1:
+      # The lines only share one ancestor; it's a half relationship if both
+      # lines have another parent there that isn't shared.
+      half = all(child is not None and child.father is not None and
+                 child.mother is not None
+                 for child in (self._PathChild(nearest, person),
+                               self._PathChild(nearest, relative)))
+
+    # Sum over the common ancestors that aren't ancestors of another one.
+    coefficient = 0.0
+    remaining = common
+    while remaining:
+      ancestor = self.people[remaining.bit_length() - 1]
+      gen = self.generations[ancestor]
+      coefficient += 0.5 ** (self.generations[person] +
+                             self.generations[relative] - 2 * gen)
+      remaining &= ~self.Ancestors(ancestor)
+    return _BloodRelation(up, down, half, coefficient, common_ancestors)
+
+class GenerationStats(NamedTuple):
+  """What went into the DOT of one generation."""
+
+  number: int
+  people: int
+  marriages: int  # Couples with children in this generation.
+  elbows: int  # Elbow point nodes.
+  bytes: int  # Length of the DOT text.
+  cached: bool  # Whether the DOT was reused from an earlier render.
+
+class RenderStats:
+  """Where the time of Sort() and ToDot() goes.
+
+  Filled in while Family.Instrument() is active.  The phases are 'placement'
+  (putting new and moved people in their generations), 'ranking' (ordering
+  the people within a generation), 'grouping' (grouping children by their
+  parents' marriage) and 'emission' (building the DOT text).
+  """
+
+  def __init__(self):
+    self.seconds = {'placement': 0.0, 'ranking': 0.0, 'grouping': 0.0,
+                    'emission': 0.0}
+    self.generations = []  # GenerationStats in the order rendered.
+    self.profile = None  # A cProfile.Profile if profiling was requested.
+    self.peak_memory = None  # Bytes, if tracing memory was requested.
+
+  def _AddGeneration(self, number: int, people: int, marriages: int,
+                     elbows: int, bytes: int, cached: bool) -> None:
+    self.generations.append(GenerationStats(number, people, marriages, elbows,
+                                            bytes, cached))
+
+  def __str__(self) -> Text:
+    lines = ['Phase          Seconds']
+    for phase, seconds in self.seconds.items():
+      lines.append(f'{phase:<14} {seconds:.6f}')
+    cached = sum(g.cached for g in self.generations)
+    lines.append(f'{len(self.generations)} generations rendered '
+                 f'({cached} from cache): '
+                 f'{sum(g.people for g in self.generations)} people, '
+                 f'{sum(g.marriages for g in self.generations)} marriages, '
+                 f'{sum(g.elbows for g in self.generations)} elbow nodes, '
+                 f'{sum(g.bytes for g in self.generations)} bytes')
+    if self.peak_memory is not None:
+      lines.append(f'Peak traced memory: {self.peak_memory / 2**20:.1f} MB')
+    if self.profile is not None:
+      out = io.StringIO()
+      pstats.Stats(self.profile, stream=out).sort_stats(
+          'cumulative').print_stats(15)
+      lines.append(out.getvalue().rstrip())
+    return '\n'.join(lines)
+
+class Family(_DotWriter):
+  """Represents a family of people.
+
+  Sort(), ToDot() and the other queries may run in many threads at once, as
+  long as nothing changes the family meanwhile; they update the cached
+  generations under an internal lock.  When one thread edits the family
+  while others query it, wrap the edits in `with family.Writing():` and the
+  queries in `with family.Reading():`.
+  """
 
   def __init__(self, rankdir : Text=None):
     self.rankdir = rankdir
     self.id_to_person = {}  # Maps ID to person.
     self.people = []  # People in the order they are first added.
 
+    # The generations are maintained incrementally as people and
+    # relationships are added, so that Sort() and ToDot() only redo the
+    # generations that changed since the last call.
+    #
+    # Maps a level to the sorted list of people at that level, as of the last
+    # call to _SortLevels().
+    self._levels = {}
+    self._unsorted_levels = set()  # Levels people have left since then.
+    self._shifted = set()  # Components whose offsets haven't been applied.
+    self._moved = set()  # People who have joined a level since then.
+    self._touched = set()  # People whose generation needs to be redone.
+    self._dot_cache = {}  # Maps a level to its (generation number, DOT).
+    self._conflicts = []  # Each item is a (person, relation, relative) tuple.
+    self._conflicting_pairs = set()
+    self._ancestor_index = None  # Built by Relationship() when needed.
+    self._name_index = None  # Built by Search() when needed.
+    self._lifespan_index = None  # Built by AliveIn() when needed.
+    self._version = 0  # Increases with every change; see Version().
+    self._stats = None  # The RenderStats being filled in, if any.
+    self._lock = _ReadWriteLock()
+    # Held while the caches above are brought up to date, so that concurrent
+    # readers don't do it at the same time.
+    self._cache_lock = threading.RLock()
+
   def Size(self) -> int:
     return len(self.people)
 
+  def Version(self) -> int:
+    """Returns a number that increases whenever a person or relationship is
+    added or changed, e.g. for keying caches of renders."""
+
+    return self._version
+
   def Person(self, name: Text, **attribs) -> 'Person':
     """Returns the person with the given name.
     
     Also sets the person's display name to `name`.
     """
 
-    global Person  # Allow referencing the outer name.
     id = _GetDefaultIdFromName(name)
     if id not in self.id_to_person:
-      person = Person(self, name)
-      self.id_to_person[id] = person
-      self.people.append(person)
+      person = self._AddPerson(name, id)
     else:
       person = self.id_to_person[id]
     person.Update(name=name).Update(**attribs)
     return person
 
+  def AddMany(self, records: Iterable[Mapping[Text, object]]) -> List[Person]:
+    """Adds people in bulk.
+
+    Each record is a mapping with a 'name' and any attributes accepted by
+    Person(), e.g. {'name': 'John Smith', 'wife': 'Ada Smith'}.  The result
+    is the same as calling Person(**record) for each record in order, but all
+    names are first resolved to people in one pass, and then the attributes
+    and relationships are applied without going through Update().
+
+    Returns the person of each record.
+    """
+
+    with _PauseGc():
+      return self._AddMany(list(records))
+
+  def _AddMany(self, records: List[Mapping[Text, object]]) -> List[Person]:
+    for record in records:
+      for attribute in record:
+        if (attribute not in _FIELD_ATTRIBUTES and
+            attribute not in _RELATION_ATTRIBUTES and
+            attribute != 'spouse_death'):
+          raise ValueError(f'Invalid person attribute "{attribute}".')
+
+    # Resolve every name, creating people in the same order as Person() would.
+    id_to_person = self.id_to_person
+    def Resolve(name: Text) -> Person:
+      id = _GetDefaultIdFromName(name)
+      person = id_to_person.get(id)
+      if person is None:
+        person = self._AddPerson(name, id)
+      return person
+
+    people = []
+    ops = []  # Each item is a (function, arguments) pair.
+    for record in records:
+      person = Resolve(record['name'])
+      people.append(person)
+      for attribute, value in record.items():
+        if attribute in _FIELD_ATTRIBUTES:
+          ops.append((Person._SetAttribute, (person, attribute, value)))
+        elif attribute == 'spouse_death':
+          ops.append((Person._SetSpouseDeath, (person, value)))
+        elif attribute == 'wife':
+          ops.append((Person._AddWives,
+                      (person, [Resolve(n) for n in _AsNames(value)])))
+        elif attribute == 'husband':
+          ops.append((Person._AddHusbands,
+                      (person, [Resolve(n) for n in _AsNames(value)])))
+        elif attribute == 'father':
+          ops.append((Person._SetFatherAndInferMother, (person, Resolve(value))))
+        else:  # 'mother'
+          ops.append((Person._SetMotherAndInferFather, (person, Resolve(value))))
+
+    # Now wire everything up.  This has to follow the order of the records,
+    # as the inferred parents depend on the marriages known at the time.
+    for function, args in ops:
+      function(*args)
+    return people
+
+  def _AddPerson(self, name: Text, id: Text) -> Person:
+    """Adds a new person with the given name and ID, which must not be taken.
+
+    This is the fast path for bulk loaders; it doesn't go through Update().
+    """
+
+    global Person  # Allow referencing the outer name.
+    person = Person(self, name, id)
+    person.order_added = len(self.people)
+    self.id_to_person[id] = person
+    self.people.append(person)
+    self._moved.add(person)
+    self._ancestor_index = None
+    self._version += 1
+    if self._name_index is not None:
+      self._name_index.Add(person)
+    return person
+
+  def _Touch(self, person: Person) -> None:
+    """Notes that the generation of `person` needs to be sorted and rendered
+    again."""
+
+    self._version += 1
+    # People who just joined a level are redone anyway.
+    if person not in self._moved:
+      self._touched.add(person)
+
+  def _Link(self, person: Person, relation: Text, relative: Person,
+            delta: int) -> None:
+    """Notes that `relative` is `person`'s `relation` and thus belongs to
+    generation `delta` relative to theirs.
+
+    Takes constant time unless this joins two groups of people that were
+    placed independently, in which case the group whose first member was
+    added later is moved.  That takes time linear in the smaller group, so
+    building a family takes O(n log n) time overall.
+    """
+
+    self._ancestor_index = None
+    self._version += 1
+    expected = _GetLevel(person) + delta
+    relative_level = _GetLevel(relative)
+    if relative_level == expected:
+      self._Join(person, relative)
+      return
+
+    if person is relative or (person.component is not None and
+                              person.component is relative.component):
+      # Another path between them disagrees.  Report each pair once.
+      pair = frozenset((id(person), id(relative)))
+      if pair not in self._conflicting_pairs:
+        self._conflicting_pairs.add(pair)
+        self._conflicts.append((person, relation, relative))
+      return
+
+    if self._First(relative).order_added > self._First(person).order_added:
+      self._Shift(relative, expected - relative_level, person)
+    else:
+      self._Shift(person, relative_level - expected, relative)
+    self._Join(person, relative)
+
+  def _First(self, person: Person) -> Person:
+    """Returns the first person added in `person`'s component."""
+
+    return person.component.first if person.component else person
+
+  def _Shift(self, person: Person, delta: int, other: Person) -> None:
+    """Moves everyone in `person`'s component by `delta` generations, before
+    joining it with `other`'s.
+
+    If `person`'s component is the larger one, only its offset changes, and
+    the move is applied to its members by _ApplyShifts() when the levels are
+    next needed.
+    """
+
+    component = person.component
+    if component is not None and (
+        other.component is None or
+        len(component.members) > len(other.component.members)):
+      component.offset += delta
+      self._shifted.add(component)
+      return
+    members = component.members if component else (person,)
+    for p in members:
+      if p not in self._moved:
+        self._unsorted_levels.add(p.level)
+        self._moved.add(p)
+      p.level += delta
+
+  def _Join(self, a: Person, b: Person) -> None:
+    """Puts `a` and `b` in the same component."""
+
+    if a.component is not None and a.component is b.component:
+      return
+    first = min(self._First(a), self._First(b), key=lambda p: p.order_added)
+    if a.component is None and b.component is None:
+      a.component = b.component = _Component(first, [a] if a is b else [a, b])
+      return
+
+    # Merge the smaller component into the larger one.
+    if (b.component is None or
+        (a.component is not None and
+         len(a.component.members) >= len(b.component.members))):
+      larger, smaller = a, b
+    else:
+      larger, smaller = b, a
+    component = larger.component
+    old_component = smaller.component
+    members = old_component.members if old_component else (smaller,)
+    # Keep the levels of the smaller component's members as they are, once
+    # the larger component's offset is applied.  If the smaller component
+    # had an offset of its own, it's still in _shifted, and its members are
+    # moved when that's applied.
+    offset = -component.offset
+    if old_component:
+      offset += old_component.offset
+      old_component.offset = 0
+    for p in members:
+      p.component = component
+      p.level += offset
+    component.members.extend(members)
+    component.first = first
+
+  def _ApplyShifts(self) -> None:
+    """Applies the offsets of the components that were shifted, so that
+    every person's level is up to date.  Must be called with _cache_lock
+    held."""
+
+    if not self._shifted:
+      return
+    for component in self._shifted:
+      for p in component.members:
+        p.level += component.offset
+        self._moved.add(p)
+      component.offset = 0
+    self._shifted.clear()
+    # Where the moved people were isn't known, so check every level.
+    self._unsorted_levels.update(self._levels)
+
+  def _SortLevels(self) -> None:
+    """Cleans up and sorts the levels that changed."""
+
+    stats = self._stats
+    if stats is not None:
+      start = time.perf_counter()
+      ranking = 0.0
+
+    self._ApplyShifts()
+    joiners = {}  # Maps a level to the people who joined it.
+    for p in self._moved:
+      joiners.setdefault(p.level, []).append(p)
+    self._unsorted_levels.update(joiners)
+    self._unsorted_levels.update(p.level for p in self._touched)
+
+    # The lists are replaced rather than modified, as _Generations() returns
+    # them.
+    for level in self._unsorted_levels:
+      old_people = self._levels.get(level, [])
+      people = [p for p in old_people
+                if p.level == level and p not in self._moved]
+      people.extend(joiners.get(level, ()))
+      if stats is None:
+        people.sort(key=_GetRankInGeneration)
+      else:
+        ranking_start = time.perf_counter()
+        people.sort(key=_GetRankInGeneration)
+        ranking += time.perf_counter() - ranking_start
+      if people != old_people:
+        # People left or moved within the generation.
+        self._dot_cache.pop(level, None)
+      if people:
+        self._levels[level] = people
+      else:
+        self._levels.pop(level, None)
+    self._unsorted_levels.clear()
+    self._moved.clear()
+
+    for level in itertools.chain(joiners, (p.level for p in self._touched)):
+      self._dot_cache.pop(level, None)
+    self._touched.clear()
+
+    if stats is not None:
+      stats.seconds['ranking'] += ranking
+      stats.seconds['placement'] += time.perf_counter() - start - ranking
+
+  def _GetGeneration(self, person: Person) -> int:
+    with self._cache_lock:
+      self._SortLevels()
+      return person.level - min(self._levels)
+
   def PersonByName(self, name: Text) -> Person:
     """Returns the person with the given name, which may or may not contain spaces.
 
@@ -264,171 +1432,626 @@ class Family:
       return self.id_to_person[id]
     return self.Person(name=name)
 
-  def Sort(self) -> List[List[Person]]:
-    """Sorts the people by generation; within the same generation,
-    sort by the order they are added.
+  def Search(self, query: Text, limit: int=10,
+             fuzzy: bool=True) -> List[Person]:
+    """Returns up to `limit` people whose names match `query`, best first.
 
-    Each element in the return value is a list of people in the same generation.
+    Each word of the query has to match a word of the name, ignoring case,
+    accents and punctuation: exactly, as a prefix (so 'jo sm' finds John
+    Smith as it's typed) or, if `fuzzy` is True, with one typo.  Each Chinese
+    character counts as a word.
+
+    The first call indexes the names in linear time; the index is then kept
+    up to date as people are added and renamed, and a query only looks at
+    the names with matching words.  To stay fast in big families, a query
+    word matches at most 200 name words as a prefix (the shortest ones), and
+    at most 1000 people are ranked, so a query that matches more people than
+    that (e.g. a single letter) may miss some of the best matches.  See
+    source/search.py.
     """
 
-    if not self.people:
-      return [[]]
+    with self._cache_lock:
+      if self._name_index is None:
+        from . import search
+        with _PauseGc():
+          self._name_index = search.NameIndex(self.people)
+      index = self._name_index
+    return index.Search(query, limit, fuzzy)
 
-    for i, p in enumerate(self.people):
-      p.generation = None
-      p.order_added = i
+  def _GetLifespanIndex(self) -> 'lifespans.LifespanIndex':
+    with self._cache_lock:
+      if self._lifespan_index is None:
+        from . import lifespans
+        with _PauseGc():
+          self._lifespan_index = lifespans.LifespanIndex(self.people)
+      return self._lifespan_index
 
-    for p in self.people:
-      if p.generation is None:
-        p.PropagateGeneration(1)
+  def AliveIn(self, year: int) -> List[Person]:
+    """Returns the people who were alive in `year`, in the order they were
+    added.
 
-    max_generation = max(p.generation for p in self.people)
-    min_generation = min(p.generation for p in self.people)
-    num_generations = max_generation - min_generation + 1
-    for p in self.people:
-      p.generation -= min_generation
+    Only the years of the birth and death dates are looked at.  People with
+    no death date are alive; people whose birth year is unknown, or who died
+    at an unknown date, are left out, as it isn't known when they lived.
 
-    generations = [[] for i in range(num_generations)]
-    for p in self.people:
-      generations[p.Generation()].append(p)
-    
-    def GetRankInGeneration(p: Person) -> Tuple[int, int]:
-      """Returns the rank of the person within the same generation."""
+    The first call indexes the lifespans in linear time; the index is then
+    kept up to date as dates change, and a query takes O(log n + k) for k
+    people found (plus sorting them).  See source/lifespans.py.
+    """
 
-      # A male is ranked by the order he was added.
-      if p.Gender() == 'M':
-        return (p.order_added, 0)
+    alive = self._GetLifespanIndex().AliveIn(year)
+    alive.sort(key=lambda p: p.order_added)
+    return alive
 
-      # Now we know p is a female.
+  def AliveBetween(self, first: int, last: int) -> List[Person]:
+    """Returns the people who were alive at some time from year `first` to
+    `last`, in the order they were added; see AliveIn()."""
 
-      # If p has not had a husband, she's ranked by the order she was added.
-      husbands = p.Husbands()
-      if not husbands:
-        return (p.order_added, 0)
+    alive = self._GetLifespanIndex().AliveBetween(first, last)
+    alive.sort(key=lambda p: p.order_added)
+    return alive
 
-      # p has had at least one husband.  She should be after her highest-ranked
-      # husband.
-      max_husband_rank = max(h.order_added for h in husbands)
-      for h in husbands:
-        if h.order_added == max_husband_rank:
-          # In case this husband has N wives, the wives should be ranked by the
-          # order they were married.
-          for i, w in enumerate(h.Wives()):
-            if w == p:
-              return (max_husband_rank, i + 1)
+  def _Find(self, id: Text) -> Person:
+    """Returns the person with the given ID or name."""
 
-    for gen in generations:
-      gen.sort(key=GetRankInGeneration)
+    person = self.id_to_person.get(_GetDefaultIdFromName(id))
+    if person is None:
+      raise ValueError(f'Unknown person "{id}".')
+    return person
 
-    return generations
+  def _Collect(self, id: Text, depth: Optional[int],
+               GetRelatives: Callable[[Person], Iterable[Person]],
+               spouses: bool) -> FamilyView:
+    """Returns a view of the person with the given ID and everyone reachable
+    from them in at most `depth` GetRelatives() steps (no limit if None),
+    plus their spouses if `spouses` is True."""
 
-  def ToDot(self) -> Text:
-    dot = []
-    rankdir = self.rankdir if self.rankdir else ''
-    dot.append(f"""digraph G {{
-    rankdir="{rankdir}";
-    node [shape=box fontname="Kai"];
-    edge [dir=none];
-    graph [splines="line"];
-""")
+    start = self._Find(id)
+    seen = {start}
+    frontier = [start]
+    distance = 0
+    while frontier and (depth is None or distance < depth):
+      distance += 1
+      next_frontier = []
+      for p in frontier:
+        for relative in GetRelatives(p):
+          if relative is not None and relative not in seen:
+            seen.add(relative)
+            next_frontier.append(relative)
+      frontier = next_frontier
 
-    for i, gen in enumerate(self.Sort()):
-      gen_num = i + 1
-      dot.append('\t################')
-      dot.append(f'\t# Generation {gen_num}.')
+    if spouses:
+      for p in list(seen):
+        seen.update(p.wives)
+        seen.update(p.husbands)
+    return FamilyView(self, seen)
 
-      dot.append('')
-      dot.append(f'\t# People in generation {gen_num}.')
-      for p in gen:
-        dot.append('\t' + p.ToDot())
-
-      # Each item is a (marriage ID, child ID list).
-      marriage_to_children = []
-      def GetChildren(marrage_id: Text) -> List[Text]:
-        for id, children in marriage_to_children:
-          if id == marriage_id:
-            return children
-        children = []
-        marriage_to_children.append((marriage_id, children))
-        return children
+  def Descendants(self, id: Text, depth: Optional[int]=None,
+                  spouses: bool=True) -> FamilyView:
+    """Returns a view of the person with the given ID or name and their
+    descendants down to `depth` generations (all if None).
 
-      for p in gen:
-        if p.Father() and p.Mother():
-          marriage_id = f'm_{p.Father().ID()}_{p.Mother().ID()}'
-          GetChildren(marriage_id).append(p.ID())
+    The spouses of everyone in the view are included unless `spouses` is
+    False.
+    """
 
-      dot.append('')
-      dot.append(f'\t# Parents of generation {gen_num}.')
-      for marriage_id, children in marriage_to_children:
-        if len(children) == 1:
-          dot.append(f'\t{marriage_id} -> {children[0]} [weight=10];')
-        else:
-          for child in children:
-            # Define the elbow point.
-            dot.append(f'\tp_{child} [shape=circle label="" height=0.01 width=0.01];')
-          middle_child = children[(len(children) -1) // 2]
-          dot.append(f'\t{marriage_id} -> p_{middle_child} [weight=10];')
-          for child in children:
-            dot.append(f'\tp_{child} -> {child} [weight=10];')
+    return self._Collect(id, depth, Person.Children, spouses)
 
-      dot.append('')
-      dot.append(f'\t# Order the parent elbow points for generation {gen_num}.')
-      dot.append('\t{')
-      dot.append('\t\trank=same;')
-      last_p_node = None
-      for marriage_id, children in marriage_to_children:
-        if len(children) == 1:
-          continue
-        if last_p_node:
-          dot.append(f'\t\t{last_p_node} -> p_{children[0]} [style="invis"];')
-        chain = ' -> '.join(f'p_{child}' for child in children)
-        dot.append(f'\t\t{chain};')
-        last_p_node = f'p_{children[-1]}'
-      dot.append('\t}')
+  def Ancestors(self, id: Text, depth: Optional[int]=None,
+                spouses: bool=False) -> FamilyView:
+    """Returns a view of the person with the given ID or name and their
+    ancestors up to `depth` generations (all if None).
 
-      dot.append('')
-      dot.append(f'\t# Order the people in generation {gen_num}.')
+    If `spouses` is True, the spouses of everyone in the view are included,
+    e.g. a grandfather's second wife.
+    """
+
+    return self._Collect(id, depth, lambda p: (p.Father(), p.Mother()),
+                         spouses)
+
+  def Neighborhood(self, id: Text, radius: int) -> FamilyView:
+    """Returns a view of everyone within `radius` relationships (parent,
+    child or spouse) of the person with the given ID or name."""
+
+    def GetRelatives(p: Person) -> Iterable[Person]:
+      return itertools.chain((p.Father(), p.Mother()), p.husbands,
+                             p.wives, p.children)
+
+    return self._Collect(id, radius, GetRelatives, False)
+
+  def Paginate(self, max_people: int) -> List[Page]:
+    """Splits the family into pages of consecutive generations.
+
+    Each page has at most `max_people` people, unless a single generation is
+    larger than that, in which case it gets a page of its own.
+    """
+
+    generations = self._Generations()
+    pages = []
+    window = []  # People on the current page.
+    first = 0  # Index of the first generation on the current page.
+    for i, gen in enumerate(generations):
+      if window and len(window) + len(gen) > max_people:
+        pages.append(Page(self, window, len(pages) + 1, first + 1, i))
+        window = []
+        first = i
+      window.extend(gen)
+    pages.append(Page(self, window, len(pages) + 1, first + 1,
+                      len(generations)))
+    return pages
+
+  def WritePages(self, directory: Text, max_people: int) -> List[Text]:
+    """Writes the pages of the family as DOT files in `directory`, plus an
+    index.tsv that lists the page and generation of everyone.
+
+    Returns the paths of the DOT files.
+    """
+
+    pages = self.Paginate(max_people)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    with open(os.path.join(directory, 'index.tsv'), 'w',
+              encoding='utf-8') as index:
+      index.write('id\tname\tgeneration\tpage\n')
+      for page in pages:
+        path = os.path.join(directory, f'page_{page.number:03d}.dot')
+        with open(path, 'w', encoding='utf-8') as fp:
+          page.WriteDot(fp)
+        paths.append(path)
+        for p in page.people:
+          index.write(f'{p.ID()}\t{p.Name()}\t{p.Generation() + 1}\t'
+                      f'{page.number}\n')
+    return paths
+
+  def Overview(self, max_depth: Optional[int]=None,
+               max_children: Optional[int]=None) -> Overview:
+    """Returns an overview of the family for rendering large families.
+
+    Only the first `max_depth` generations are shown, and only the first
+    `max_children` children of each person (no limit if None).  The
+    descendants left out of each person shown are replaced by a summary node
+    like "+312 descendants", and so are the people who married into the
+    family and whose spouses were all left out.
+
+    Each child is counted once, under the parent of the family's line, so
+    the counts add up.  They are computed in one pass from the last
+    generation up.
+    """
+
+    if max_depth is not None and max_depth < 1:
+      raise ValueError('max_depth must be at least 1.')
+    if max_children is not None and max_children < 1:
+      raise ValueError('max_children must be at least 1.')
+    generations = self._Generations() if self.people else []
+
+    descendants = {}  # Maps a person to their number of descendants.
+    for gen in reversed(generations):
       for p in gen:
-        if len(p.Wives()) > 1:
-          # Add extra elbow points to account for multiple wives of the same person.
-          elbows = []
-          dot.append(f'\tu_{p.ID()} [shape=circle label="" height=0.01 width=0.01];')
-          dot.append(f'\tu_{p.ID()} -> {p.ID()} [weight=10];')
-          elbows = [f'u_{p.ID()}']
-          for w in p.Wives()[1:]:
-            dot.append(f'\tu_{w.ID()} [shape=circle label="" height=0.01 width=0.01];')
-            dot.append(f'\tu_{w.ID()} -> m_{p.ID()}_{w.ID()} [weight=10];')
-            elbows.append(f'u_{w.ID()}')
-          dot.append('\t{')
-          dot.append('\t\trank=same;')
-          dot.append('\t\t' + ' -> '.join(elbows) + ';')
-          dot.append('\t}')
+        parent = _GetLineParent(p)
+        if parent is not None:
+          descendants[parent] = (descendants.get(parent, 0) + 1 +
+                                 descendants.get(p, 0))
 
-      dot.append('\t{')
-      dot.append('\t\trank=same;')
-      last_person = None
-      last_male = None
+    shown = []
+    hidden = set()
+    shown_children = {}  # Maps a parent to the number of children shown.
+    summaries = {}
+    for depth, gen in enumerate(generations):
+      married_in = []
       for p in gen:
-        marriage_id = None
-        if last_male:
-          wives = last_male.Wives()
-          if p in wives:
-            k = wives.index(p)
-            marriage_id = f'm_{last_male.ID()}_{p.ID()}'
-            dot.append(f'\t\t{marriage_id} [shape="diamond" label="" height=0.25 width=0.25];')
-            if k == 0:
-              dot.append(f'\t\t{last_male.ID()} -> {marriage_id} -> {p.ID()} [weight=10];')
-            else:
-              dot.append(f'\t\t{marriage_id} -> {p.ID()} [weight=10];')
-        if last_person:
-          if p not in last_person.Wives():
-            id = marriage_id if marriage_id else p.ID()
-            dot.append(f'\t\t{last_person.ID()} -> {id} [style="invis"];')
-        last_person = p
-        if p.Gender() == 'M':
-          last_male = p
-      dot.append('\t}')
-      dot.append('')
+        parent = _GetLineParent(p)
+        if parent is None:
+          married_in.append(p)
+          continue
+        if parent in hidden:
+          hidden.add(p)
+          continue
+        count = shown_children.get(parent, 0)
+        if ((max_depth is not None and depth >= max_depth) or
+            (max_children is not None and count >= max_children)):
+          hidden.add(p)
+          children, total = summaries.get(parent, (0, 0))
+          summaries[parent] = (children + 1,
+                               total + 1 + descendants.get(p, 0))
+        else:
+          shown_children[parent] = count + 1
+          shown.append(p)
+      # The people without parents are shown with their spouses.
+      for p in married_in:
+        spouses = list(itertools.chain(p.wives, p.husbands))
+        if ((max_depth is not None and depth >= max_depth) or
+            (spouses and all(s in hidden for s in spouses))):
+          hidden.add(p)
+        else:
+          shown.append(p)
+    return Overview(self, shown, summaries)
+
+  def Relationship(self, id: Text, relative_id: Text) -> Optional[Kinship]:
+    """Returns how the person with the given ID or name is related to the
+    person with `relative_id`, or None if they aren't related by blood or
+    marriage.
+
+    The first call after the family changes indexes it in linear time; later
+    calls only look at the ancestors of the two people.  Raises
+    GenerationConflictError if the family can't be sorted.
+    """
+
+    person = self._Find(id)
+    relative = self._Find(relative_id)
+    with self._cache_lock:
+      if self._ancestor_index is None:
+        self._ancestor_index = _AncestorIndex(self._Generations())
+      index = self._ancestor_index
+
+    if person is relative:
+      return Kinship(person, relative, 'self', 1.0, (person,))
+    blood = index.Relate(person, relative)
+    coefficient = blood.coefficient if blood else 0.0
+    common_ancestors = blood.common_ancestors if blood else ()
+    if relative in person.wives or relative in person.husbands:
+      term = 'wife' if relative in person.husbands else 'husband'
+      return Kinship(person, relative, term, coefficient, common_ancestors)
+    if blood:
+      term = _GetKinshipTerm(blood.up, blood.down, blood.half,
+                             person.Gender())
+      return Kinship(person, relative, term, coefficient, common_ancestors)
+
+    # Step relatives: a descendant of the relative's spouse, or the spouse
+    # of an ancestor of the relative.  In-laws: any other blood relative of
+    # a spouse, or the spouse of a blood relative.  Prefer the closest one.
+    # Each candidate is (relation, whether it's a step relation).
+    candidates = [(index.Relate(person, spouse), False)
+                  for spouse in itertools.chain(relative.wives,
+                                                relative.husbands)]
+    candidates = [(c, not c.down) for c, _ in candidates if c]
+    for spouse in itertools.chain(person.wives, person.husbands):
+      blood = index.Relate(spouse, relative)
+      if blood:
+        candidates.append((blood, not blood.up))
+    if not candidates:
+      return None
+    blood, step = min(candidates, key=lambda c: c[0].up + c[0].down)
+    term = _GetKinshipTerm(blood.up, blood.down, blood.half, person.Gender())
+    if not step:
+      term += '-in-law'
+    elif term.startswith('great-') or term.startswith('grand'):
+      term = 'step-' + term
+    else:
+      term = 'step' + term
+    return Kinship(person, relative, term, 0.0, blood.common_ancestors)
+
+  def Save(self, path: Text) -> None:
+    """Saves the family to a binary snapshot file that Load() can read.
+
+    The file has a table of all the strings, followed by one array of 32-bit
+    integers per person attribute, the people of each generation in sorted
+    order, and flat arrays of the relationships.
+    """
+
+    with self._cache_lock:
+      self._SortLevels()  # So that Load() doesn't need to sort.
+
+    string_indices = {}  # Maps a string to its index in the table.
+    strings = []
+
+    def Intern(value: Optional[Text]) -> int:
+      if value is None:
+        return -1
+      index = string_indices.get(value)
+      if index is None:
+        if '\0' in value:
+          raise ValueError(f'Cannot save "{value}": it contains a NUL.')
+        index = string_indices[value] = len(strings)
+        strings.append(value)
+      return index
+
+    def PersonIndex(person: Optional[Person]) -> int:
+      return -1 if person is None else person.order_added
+
+    columns = [array.array('i') for _ in range(len(_SNAPSHOT_STRING_COLUMNS) +
+                                              len(_SNAPSHOT_INT_COLUMNS))]
+    # Maps a relation to the people who have some, and where their relatives
+    # start and end in the flat list of relatives.
+    lists = {name: (array.array('i'), array.array('i', [0]), array.array('i'))
+             for name in ('children', 'wives', 'husbands')}
+    for p in self.people:
+      for column, name in zip(columns, _SNAPSHOT_STRING_COLUMNS):
+        column.append(Intern(getattr(p, name)))
+      int_columns = columns[len(_SNAPSHOT_STRING_COLUMNS):]
+      int_columns[0].append(PersonIndex(p.father))
+      int_columns[1].append(PersonIndex(p.mother))
+      int_columns[2].append(p.level)
+      int_columns[3].append(PersonIndex(p.component and p.component.first))
+      for name, (owners, offsets, items) in lists.items():
+        relatives = getattr(p, name)
+        if relatives:
+          owners.append(p.order_added)
+          items.extend(q.order_added for q in relatives)
+          offsets.append(len(items))
+    order = array.array('i', (p.order_added for level in sorted(self._levels)
+                              for p in self._levels[level]))
+    conflicts = array.array('i')
+    for person, relation, relative in self._conflicts:
+      conflicts.extend((person.order_added, Intern(relation),
+                        relative.order_added))
+    rankdir = Intern(self.rankdir)
+
+    blob = '\0'.join(strings).encode('utf-8')
+    with open(path, 'wb') as fp:
+      fp.write(_SNAPSHOT_HEADER.pack(
+          _SNAPSHOT_MAGIC, len(self.people), len(strings), len(blob),
+          *itertools.chain.from_iterable(
+              (len(owners), len(items)) for owners, _, items in lists.values()),
+          len(conflicts) // 3, rankdir))
+      fp.write(blob)
+      for values in itertools.chain(columns, (order,),
+                                    itertools.chain(*lists.values()),
+                                    (conflicts,)):
+        _ToLittleEndian(values).tofile(fp)
+
+  @classmethod
+  def Load(cls, path: Text) -> 'Family':
+    """Returns the family saved by Save() to `path`.
+
+    The file is read in one go; the time taken grows with its size.
+    """
+
+    with open(path, 'rb') as fp:
+      data = memoryview(fp.read())
+    if bytes(data[:len(_SNAPSHOT_MAGIC)]) != _SNAPSHOT_MAGIC:
+      raise ValueError(f'{path} is not a family snapshot.')
+    (_, num_people, num_strings, blob_size, *list_sizes, num_conflicts,
+     rankdir) = _SNAPSHOT_HEADER.unpack_from(data)
+    offset = _SNAPSHOT_HEADER.size
+
+    def Read(count: int) -> array.array:
+      nonlocal offset
+      values = array.array('i')
+      values.frombytes(data[offset:offset + count * values.itemsize])
+      offset += count * values.itemsize
+      return _ToLittleEndian(values)
+
+    strings = []
+    if num_strings:
+      strings = bytes(data[offset:offset + blob_size]).decode('utf-8').split(
+          '\0')
+    strings.append(None)  # So that index -1 is None.
+    offset += blob_size
+    string_columns = [Read(num_people) for _ in _SNAPSHOT_STRING_COLUMNS]
+    fathers, mothers, levels, firsts = [Read(num_people)
+                                        for _ in _SNAPSHOT_INT_COLUMNS]
+    order = Read(num_people)
+    lists = []
+    for num_owners, num_items in zip(list_sizes[::2], list_sizes[1::2]):
+      lists.append((Read(num_owners), Read(num_owners + 1), Read(num_items)))
+    conflicts = Read(3 * num_conflicts)
+
+    family = cls(strings[rankdir])
+    with _PauseGc():
+      people = family.people
+      for i, (name, person_id, annotation, gender, birth, death,
+              spouse_death) in enumerate(zip(*string_columns)):
+        p = Person(family, strings[name], strings[person_id])
+        p.order_added = i
+        p.annotation = strings[annotation]
+        p.gender = strings[gender]
+        p.birth = strings[birth]
+        p.death = strings[death]
+        p.spouse_death = strings[spouse_death]
+        people.append(p)
+      family.id_to_person = {p.id: p for p in people}
+
+      components = {}  # Maps the index of the first member to the component.
+      for p, father, mother, level, first in zip(people, fathers, mothers,
+                                                 levels, firsts):
+        if father >= 0:
+          p.father = people[father]
+        if mother >= 0:
+          p.mother = people[mother]
+        p.level = level
+        if first >= 0:
+          component = components.get(first)
+          if component is None:
+            component = components[first] = _Component(people[first], [])
+          component.members.append(p)
+          p.component = component
+      for name, (owners, offsets, items) in zip(
+          ('children', 'wives', 'husbands'), lists):
+        for owner, start, end in zip(owners, offsets, offsets[1:]):
+          setattr(people[owner],
+                  name, _PersonList(people[j] for j in items[start:end]))
+      for owner in lists[1][0]:  # Everyone who has wives.
+        husband = people[owner]
+        for i, wife in enumerate(husband.wives):
+          if wife.rank is None or wife.rank[0] < husband.order_added:
+            wife.rank = (husband.order_added, i + 1)
+
+      for i in range(0, len(conflicts), 3):
+        person, relative = people[conflicts[i]], people[conflicts[i + 2]]
+        family._conflicts.append((person, strings[conflicts[i + 1]],
+                                  relative))
+        family._conflicting_pairs.add(frozenset((id(person), id(relative))))
+      levels = family._levels
+      for i in order:
+        p = people[i]
+        level = levels.get(p.level)
+        if level is None:
+          level = levels[p.level] = []
+        level.append(p)
+    return family
+
+  def ToArrays(self) -> 'stats.FamilyArrays':
+    """Returns the people as NumPy arrays (generation, birth and death years,
+    gender, parents, number of children) for vectorized analysis.
+
+    Needs NumPy; see source/stats.py.
+    """
+
+    from . import stats
+    with self._cache_lock:
+      self._ApplyShifts()  # FamilyArrays reads the levels.
+      return stats.FamilyArrays(self)
+
+  def Stats(self) -> 'stats.Summary':
+    """Returns the generation sizes, lifespans and numbers of children of the
+    family.  Needs NumPy."""
+
+    from . import stats
+    return stats.Summarize(self.ToArrays())
+
+  def Merge(self, other: 'Family', threshold: float=1.0) -> 'merge.MergeResult':
+    """Adds the people and relationships of `other` to this family.
+
+    People of `other` who are likely already in this family (similar names,
+    the same birth and death years, the same parents) are merged with them,
+    filling in what this family doesn't know; see source/merge.py for the
+    scoring.  A higher `threshold` merges fewer people.  The others are added
+    as new people, with a numbered ID if theirs is taken.
+    """
+
+    from . import merge
+    with _PauseGc():
+      return merge.Merge(self, other, threshold)
+
+  def Reading(self) -> ContextManager[None]:
+    """Returns a context manager that keeps other threads from changing the
+    family while it's active, e.g.
+
+      with family.Reading():
+        dot = family.ToDot()
+
+    Any number of threads can be reading at once.
+    """
+
+    return self._lock.Reading()
+
+  def Writing(self) -> ContextManager[None]:
+    """Returns a context manager that keeps other threads from reading or
+    changing the family while it's active, e.g.
+
+      with family.Writing():
+        family.Person('Ada Smith', father='John Smith')
+
+    A writer waits for the current readers to finish, and new readers wait
+    for it.
+    """
+
+    return self._lock.Writing()
+
+  @contextlib.contextmanager
+  def Instrument(self, profile: bool=False,
+                 trace_memory: bool=False) -> Iterator[RenderStats]:
+    """Records where the time of Sort() and ToDot() goes while active.
+
+      with family.Instrument() as stats:
+        family.ToDot()
+      print(stats)
+
+    If `profile` is True, everything run is also profiled with cProfile; if
+    `trace_memory` is True, the peak memory is traced with tracemalloc.
+    Nothing is recorded, and nothing is slowed down, outside of this.
+    """
+
+    stats = RenderStats()
+    previous = self._stats
+    self._stats = stats
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+      tracemalloc.start()
+    elif trace_memory:
+      if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+.
+        tracemalloc.reset_peak()
+      else:
+        # Restarting is the only way to reset the peak.  It also drops the
+        # traces so far, but the caller keeps tracing afterwards.
+        frames = tracemalloc.get_traceback_limit()
+        tracemalloc.stop()
+        tracemalloc.start(frames)
+    if profile:
+      stats.profile = cProfile.Profile()
+      stats.profile.enable()
+    try:
+      yield stats
+    finally:
+      if profile:
+        stats.profile.disable()
+      if trace_memory:
+        stats.peak_memory = tracemalloc.get_traced_memory()[1]
+        if tracing:
+          tracemalloc.stop()
+      self._stats = previous
+
+  def GenerationConflicts(self) -> List[GenerationConflict]:
+    """Returns the relationship edges that imply inconsistent generations.
+
+    An empty list means the family can be sorted.
+    """
+
+    if not self._conflicts:
+      return []
+    with self._cache_lock:
+      self._SortLevels()
+      min_level = min(self._levels)
+    return [GenerationConflict(person, relation, relative,
+                               person.level + _RELATION_DELTAS[relation] -
+                               min_level,
+                               relative.level - min_level)
+            for person, relation, relative in self._conflicts]
+
+  def Sort(self) -> List[List[Person]]:
+    """Sorts the people by generation; within the same generation,
+    sort by the order they are added.
+
+    Each element in the return value is a list of people in the same generation.
+    Raises GenerationConflictError if the relationships imply inconsistent
+    generations.
+    """
+
+    return [list(gen) for gen in self._Generations()]
+
+  def _Generations(self) -> List[List[Person]]:
+    """Returns what Sort() does, but with the cached lists of each
+    generation, which must not be modified."""
+
+    if not self.people:
+      return [[]]
+
+    if self._conflicts:
+      raise GenerationConflictError(self.GenerationConflicts())
+    with self._cache_lock:
+      self._SortLevels()
+      return [self._levels[level]
+              for level in range(min(self._levels), max(self._levels) + 1)]
+
+  def IterDot(self) -> Iterator[Text]:
+    """Generates the DOT representation of the family piece by piece.
+
+    The graph header is yielded first, followed by one chunk per generation as
+    soon as it is computed, and finally the closing brace.  Concatenating the
+    chunks gives exactly ToDot().
+    """
+
+    yield _DotHeader(self.rankdir)
+
+    with self._cache_lock:
+      generations = self._Generations()
+      first_level = min(self._levels) if self._levels else 0
+    for i, gen in enumerate(generations):
+      # Reuse the DOT of generations that haven't changed.
+      gen_num = i + 1
+      level = first_level + i
+      with self._cache_lock:
+        cached = self._dot_cache.get(level)
+      if cached is None or cached[0] != gen_num:
+        # Rendered without the lock, so that other readers can go ahead;
+        # they would render the same DOT.
+        cached = (gen_num, _GenerationToDot(gen_num, gen, stats=self._stats))
+        if gen:
+          with self._cache_lock:
+            self._dot_cache[level] = cached
+      elif self._stats is not None:
+        self._stats._AddGeneration(gen_num, len(gen), 0, 0, len(cached[1]),
+                                   True)
+      yield cached[1]
 
-    dot.append('}')
-    return '\n'.join(dot)
\ No newline at end of file
+    yield '}'
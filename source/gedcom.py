@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""Imports GEDCOM files into a family tree.
+
+The file is parsed line by line, so only the people and families read so far
+are kept in memory.  INDI records become people (name, sex, birth, death) and
+FAM records connect husbands, wives and children.
+
+Usage:
+  python -m source.gedcom input.ged [-o output.dot]
+"""
+
+import argparse
+import contextlib
+import re
+import sys
+import time
+from typing import Iterable, List, NamedTuple, Optional, Text
+
+from . import family_tree as ft
+
+# Matches a GEDCOM line: level, optional cross-reference ID, tag and value.
+_LINE_RE = re.compile(r'\s*(\d+)\s+(?:(@[^@]+@)\s+)?(\S+)(?:\s(.*))?$')
+
+class ImportResult(NamedTuple):
+  """Summarizes a GEDCOM import."""
+
+  family: ft.Family
+  individuals: int  # Number of INDI records.
+  families: int  # Number of FAM records.
+  seconds: float
+
+  @property
+  def records_per_second(self) -> float:
+    if not self.seconds:
+      return float('inf')
+    return (self.individuals + self.families) / self.seconds
+
+  def __str__(self) -> Text:
+    return (f'Imported {self.individuals} individuals and {self.families} '
+            f'families in {self.seconds:.3f}s '
+            f'({self.records_per_second:.0f} records/s).')
+
+def _GetNameFromGedcom(value: Text) -> Text:
+  """Converts a GEDCOM NAME value like 'John /Smith/' to 'John Smith'."""
+
+  return ' '.join(value.replace('/', ' ').split())
+
+class _Individual:
+  """Fields of the INDI record being parsed."""
+
+  __slots__ = ('xref', 'name', 'nickname', 'gender', 'birth', 'death')
+
+  def __init__(self, xref: Text):
+    self.xref = xref
+    self.name = None
+    self.nickname = None
+    self.gender = None
+    self.birth = None
+    self.death = None
+
+class _Importer:
+  """Builds a family from a stream of GEDCOM lines."""
+
+  def __init__(self, family: ft.Family):
+    self.family = family
+    self.xref_to_person = {}
+    # [husband xref, wife xref, child xrefs] of each FAM record.  They are
+    # connected at the end, as a FAM record may come before its members.
+    self.unions = []
+    self.num_individuals = 0
+    self.num_families = 0
+
+  def AddIndividual(self, indi: _Individual) -> None:
+    name = indi.name or indi.xref.strip('@')
+    id = ft._GetDefaultIdFromName(name)
+    if id in self.family.id_to_person:
+      # A different person with the same name; GEDCOM tells them apart.
+      # Someone else may have that ID too, e.g. when the same file is read
+      # twice.
+      base = id = f'{id}_{indi.xref.strip("@")}'
+      suffix = 1
+      while id in self.family.id_to_person:
+        suffix += 1
+        id = f'{base}_{suffix}'
+    person = self.family._AddPerson(name, id)
+    person.annotation = indi.nickname
+    person.gender = indi.gender
+    # Through _SetAttribute(), which keeps the family's lifespan index (if
+    # any) up to date.
+    for name in ('birth', 'death'):
+      value = getattr(indi, name)
+      if value is not None:
+        person._SetAttribute(name, value)
+    self.xref_to_person[indi.xref] = person
+    self.num_individuals += 1
+
+  def Connect(self) -> None:
+    """Wires up the relationships of all FAM records."""
+
+    people = self.xref_to_person
+    for husband_xref, wife_xref, child_xrefs in self.unions:
+      husband = people.get(husband_xref)
+      wife = people.get(wife_xref)
+      if husband and wife:
+        husband.AddWife(wife)
+      for child_xref in child_xrefs:
+        child = people.get(child_xref)
+        if not child:
+          continue
+        if husband:
+          child.SetFather(husband)
+        if wife:
+          child.SetMother(wife)
+
+  def Read(self, lines: Iterable[Text]) -> None:
+    indi = None
+    union = None
+    event = None  # The level-1 tag that level-2 lines belong to.
+    for line in lines:
+      match = _LINE_RE.match(line)
+      if not match:
+        continue
+      level, xref, tag, value = match.groups()
+      value = (value or '').strip()
+
+      if level == '0':
+        if indi:
+          self.AddIndividual(indi)
+        indi = None
+        union = None
+        if tag == 'INDI':
+          indi = _Individual(xref or f'@I{self.num_individuals + 1}@')
+        elif tag == 'FAM':
+          union = [None, None, []]
+          self.unions.append(union)
+          self.num_families += 1
+      elif level == '1':
+        event = tag
+        if indi:
+          if tag == 'NAME':
+            if indi.name is None:
+              indi.name = _GetNameFromGedcom(value)
+          elif tag == 'NICK':
+            indi.nickname = value
+          elif tag == 'SEX':
+            if value in ('M', 'F'):
+              indi.gender = value
+          elif tag == 'DEAT':
+            indi.death = '?'  # Deceased, date not known yet.
+        elif union:
+          if tag == 'HUSB':
+            union[0] = value
+          elif tag == 'WIFE':
+            union[1] = value
+          elif tag == 'CHIL':
+            union[2].append(value)
+      elif level == '2' and indi and tag == 'DATE' and value:
+        if event == 'BIRT':
+          indi.birth = value
+        elif event == 'DEAT':
+          indi.death = value
+    if indi:
+      self.AddIndividual(indi)
+
+def Read(fp: Iterable[Text],
+         family: Optional[ft.Family]=None) -> ImportResult:
+  """Imports the GEDCOM lines in `fp` (e.g. a text file object).
+
+  The people are added to `family`, or to a new family if it's None.
+  """
+
+  start = time.perf_counter()
+  importer = _Importer(family if family is not None else ft.Family())
+  with ft._PauseGc():
+    importer.Read(fp)
+    importer.Connect()
+  return ImportResult(importer.family, importer.num_individuals,
+                      importer.num_families, time.perf_counter() - start)
+
+def Load(path: Text, family: Optional[ft.Family]=None) -> ImportResult:
+  """Imports the GEDCOM file at `path`."""
+
+  with open(path, encoding='utf-8-sig', errors='replace') as fp:
+    return Read(fp, family)
+
+def main(argv: Optional[List[Text]]=None) -> None:
+  parser = argparse.ArgumentParser(description='Converts GEDCOM to DOT.')
+  parser.add_argument('input', help='the GEDCOM file to import')
+  parser.add_argument('-o', '--output',
+                      help='where to write the DOT file (default: stdout)')
+  parser.add_argument('--rankdir', help='the graphviz rankdir, e.g. LR')
+  parser.add_argument('--max-depth', type=int,
+                      help='only show this many generations, summarizing '
+                      'the descendants beyond them')
+  parser.add_argument('--max-children', type=int,
+                      help="only show this many of each person's children, "
+                      'summarizing the rest')
+  parser.add_argument('--stats', action='store_true',
+                      help='print where the time of sorting and rendering '
+                      'goes')
+  parser.add_argument('--profile', action='store_true',
+                      help='like --stats, plus a cProfile report and the '
+                      'peak memory')
+  args = parser.parse_args(argv)
+
+  result = Load(args.input, ft.Family(rankdir=args.rankdir))
+  print(result, file=sys.stderr)
+  family = result.family
+  tree = family
+  if args.max_depth is not None or args.max_children is not None:
+    tree = family.Overview(args.max_depth, args.max_children)
+  with contextlib.ExitStack() as stack:
+    stats = None
+    if args.stats or args.profile:
+      stats = stack.enter_context(family.Instrument(
+          profile=args.profile, trace_memory=args.profile))
+    if args.output:
+      with open(args.output, 'w', encoding='utf-8') as fp:
+        tree.WriteDot(fp)
+    else:
+      tree.WriteDot(sys.stdout)
+  if stats:
+    print(stats, file=sys.stderr)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+"""Lays out a family tree and draws it as SVG, without graphviz.
+
+The layout is layered like the DOT output: each generation is a row, in the
+order given by Sort().  Within a row, a man is followed by a diamond and a
+wife for each of his marriages in the row, and children are placed under the
+marriage (or single parent) they come from, joined to it by an elbow line.
+
+The x-coordinates are found in two linear passes.  Going down, each sibling
+group is centered under its parents where there's room, and otherwise pushed
+right of its neighbors.  Going back up, each couple (or single parent) is
+moved right to be over their children if they're left of them.
+
+Usage:
+  python -m source.layout input.ged -o output.svg
+"""
+
+import argparse
+import html
+import sys
+from typing import (Iterator, List, Optional, Sequence, Text, TextIO, Tuple,
+                    Union)
+
+from . import family_tree as ft
+from . import gedcom
+
+# Sizes in SVG user units (pixels).
+_CHAR_WIDTH = 8  # Of a narrow character; wide (e.g. CJK) ones are double.
+_BOX_HEIGHT = 36  # A person box with one line of text.
+_LINE_HEIGHT = 14
+_BOX_PADDING = 10
+_DIAMOND = 12  # Width and height of a marriage diamond.
+_GAP = 16  # Between neighbors in a row.
+_ROW_GAP = 60  # Between the bottom of a row and the top of the next one.
+_MARGIN = 20
+
+def _TextWidth(text: Text) -> int:
+  return _CHAR_WIDTH * sum(2 if ord(c) >= 0x2e80 else 1 for c in text)
+
+class _Node:
+  """A box or diamond in the layout."""
+
+  __slots__ = ('person', 'x', 'width', 'row')
+
+  def __init__(self, person: Optional[ft.Person], width: float, row: int):
+    self.person = person  # None for a marriage diamond.
+    self.x = 0.0  # Of the center.
+    self.width = width
+    self.row = row
+
+class Layout:
+  """The positions of the people of a family or view.
+
+  `tree` is a Family or a FamilyView; relatives outside a view are left out.
+  """
+
+  def __init__(self, tree: Union[ft.Family, ft.FamilyView]):
+    self.family = tree if isinstance(tree, ft.Family) else tree.Family()
+    members = getattr(tree, 'members', None)
+    self._members = members
+    self.rows = []  # Each row is a list of _Node from left to right.
+    self.nodes = {}  # Maps a person to their node.
+    # Maps a (husband, wife) pair to the node of their marriage diamond.
+    self.marriages = {}
+    # Maps a node (marriage or single parent) to its children's nodes.
+    self.children = {}
+    # Each unit is a man with the diamonds and wives that follow him, or a
+    # single person; its nodes stay together when moved.
+    self.units = []  # Each item is a list of units, per row.
+    self.row_heights = []
+
+    for row, gen in enumerate(tree.Sort()):
+      self._AddRow(row, gen)
+    for row in range(len(self.rows)):
+      self._PlaceBelowParents(row)
+    for row in reversed(range(len(self.rows) - 1)):
+      self._CenterOverChildren(row)
+
+    left = min((r[0].x - r[0].width / 2 for r in self.rows if r), default=0)
+    for r in self.rows:
+      for node in r:
+        node.x += _MARGIN - left
+    self.width = max((r[-1].x + r[-1].width / 2 for r in self.rows if r),
+                     default=0) + _MARGIN
+    self.row_tops = []
+    top = _MARGIN
+    for height in self.row_heights:
+      self.row_tops.append(top)
+      top += height + _ROW_GAP
+    self.height = top - _ROW_GAP + _MARGIN
+
+  def _Wives(self, p: ft.Person) -> Sequence[ft.Person]:
+    if self._members is None:
+      return p.wives
+    return [w for w in p.wives if w in self._members]
+
+  def _Parents(self, p: ft.Person) -> Tuple[Optional[ft.Person],
+                                            Optional[ft.Person]]:
+    father, mother = p.Father(), p.Mother()
+    if self._members is not None:
+      if father not in self._members:
+        father = None
+      if mother not in self._members:
+        mother = None
+    return father, mother
+
+  def _AddRow(self, row: int, gen: Sequence[ft.Person]) -> None:
+    nodes = []
+    units = []
+    height = _BOX_HEIGHT
+    last_male = None
+    for p in gen:
+      lines = _GetLabel(p)
+      height = max(height, _BOX_HEIGHT + _LINE_HEIGHT * (len(lines) - 1))
+      node = _Node(p, max(_TextWidth(line) for line in lines) +
+                   2 * _BOX_PADDING, row)
+      if last_male is not None and p in self._Wives(last_male):
+        # As in the DOT, a wife follows her husband with their diamond
+        # between them.
+        marriage = _Node(None, _DIAMOND, row)
+        self.marriages[(last_male, p)] = marriage
+        nodes.append(marriage)
+        units[-1].extend((marriage, node))
+      else:
+        units.append([node])
+      nodes.append(node)
+      self.nodes[p] = node
+      if p.Gender() == 'M':
+        last_male = p
+    self.rows.append(nodes)
+    self.units.append(units)
+    self.row_heights.append(height)
+
+    if row == 0:
+      return
+    for p in gen:
+      father, mother = self._Parents(p)
+      parent = (self.marriages.get((father, mother)) or
+                self.nodes.get(father) or self.nodes.get(mother))
+      if parent is not None:
+        self.children.setdefault(parent, []).append(self.nodes[p])
+
+  def _PlaceBelowParents(self, row: int) -> None:
+    """Places the nodes of `row` given the row above."""
+
+    # Where each node wants to be, if anywhere: sibling groups are centered
+    # under their parent node.
+    # A child who heads a unit brings their spouses along.
+    unit_widths = {unit[0]: sum(n.width for n in unit) + _GAP * (len(unit) - 1)
+                   for unit in self.units[row]}
+    desired = {}
+    for parent in self.rows[row - 1] if row else ():
+      children = self.children.get(parent)
+      if not children:
+        continue
+      widths = [unit_widths.get(c, c.width) for c in children]
+      x = parent.x - (sum(widths) + _GAP * (len(children) - 1)) / 2
+      for child, width in zip(children, widths):
+        desired[child] = x + child.width / 2
+        x += width + _GAP
+
+    right = None  # The right edge of the previous node.
+    for node in self.rows[row]:
+      x = desired.get(node)
+      if right is not None:
+        leftmost = right + _GAP + node.width / 2
+        if x is None or x < leftmost:
+          x = leftmost
+      elif x is None:
+        x = node.width / 2
+      node.x = x
+      right = x + node.width / 2
+
+  def _CenterOverChildren(self, row: int) -> None:
+    """Moves the units of `row` right to be over their children."""
+
+    shift = 0.0
+    for unit in self.units[row]:
+      for node in unit:
+        node.x += shift
+      # The first marriage (or the person) with children anchors the unit.
+      for node in unit:
+        children = self.children.get(node)
+        if children:
+          center = (children[0].x + children[-1].x) / 2
+          if center > node.x:
+            delta = center - node.x
+            for n in unit:
+              n.x += delta
+            shift += delta
+          break
+
+  def Position(self, person: ft.Person) -> Tuple[float, float]:
+    """Returns the center of `person`'s box."""
+
+    node = self.nodes[person]
+    return node.x, self.row_tops[node.row] + self.row_heights[node.row] / 2
+
+  def IterSvg(self) -> Iterator[Text]:
+    """Generates the SVG piece by piece."""
+
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" '
+           f'width="{self.width:.0f}" height="{self.height:.0f}" '
+           f'font-family="Kai, serif" font-size="13">\n'
+           '<g stroke="black" fill="none">\n')
+
+    # Lines first, so that the boxes are drawn over them.
+    for (husband, wife), marriage in self.marriages.items():
+      y = self._Middle(marriage.row)
+      start = self.nodes[husband]
+      if self._Wives(husband).index(wife) == 0:
+        yield (f'<path d="M{start.x + start.width / 2:.1f},{y:.1f} '
+               f'H{marriage.x - _DIAMOND / 2:.1f}"/>\n')
+      else:
+        # Later marriages arc over the row from the husband.
+        top = self.row_tops[marriage.row]
+        yield (f'<path d="M{start.x:.1f},{top:.1f} '
+               f'C{start.x:.1f},{top - _ROW_GAP / 3:.1f} '
+               f'{marriage.x:.1f},{top - _ROW_GAP / 3:.1f} '
+               f'{marriage.x:.1f},{y - _DIAMOND / 2:.1f}"/>\n')
+      end = self.nodes[wife]
+      yield (f'<path d="M{marriage.x + _DIAMOND / 2:.1f},{y:.1f} '
+             f'H{end.x - end.width / 2:.1f}"/>\n')
+    for parent, children in self.children.items():
+      yield self._ElbowToSvg(parent, children)
+    yield '</g>\n'
+
+    for (husband, wife), marriage in self.marriages.items():
+      x, y = marriage.x, self._Middle(marriage.row)
+      half = _DIAMOND / 2
+      yield (f'<path d="M{x:.1f},{y - half:.1f} L{x + half:.1f},{y:.1f} '
+             f'L{x:.1f},{y + half:.1f} L{x - half:.1f},{y:.1f} Z" '
+             'fill="white" stroke="black"/>\n')
+    for row in self.rows:
+      for node in row:
+        if node.person is not None:
+          yield self._PersonToSvg(node)
+    yield '</svg>\n'
+
+  def _Middle(self, row: int) -> float:
+    return self.row_tops[row] + self.row_heights[row] / 2
+
+  def _ElbowToSvg(self, parent: _Node, children: List[_Node]) -> Text:
+    if parent.person is None:  # A marriage diamond.
+      start = self._Middle(parent.row) + _DIAMOND / 2
+    else:
+      start = self.row_tops[parent.row] + self.row_heights[parent.row]
+    child_top = self.row_tops[parent.row + 1]
+    elbow = child_top - _ROW_GAP / 2
+    xs = [c.x for c in children]
+    left, right = min(xs + [parent.x]), max(xs + [parent.x])
+    path = [f'M{parent.x:.1f},{start:.1f} V{elbow:.1f}']
+    if left != right:
+      path.append(f'M{left:.1f},{elbow:.1f} H{right:.1f}')
+    for x in xs:
+      path.append(f'M{x:.1f},{elbow:.1f} V{child_top:.1f}')
+    return f'<path d="{" ".join(path)}"/>\n'
+
+  def _PersonToSvg(self, node: _Node) -> Text:
+    p = node.person
+    top = self.row_tops[node.row]
+    height = self.row_heights[node.row]
+    # The same styles as Person.ToDot().
+    male = p.Gender() == 'M'
+    if p.Deceased():
+      fill, stroke_width = 'white', 3
+    else:
+      fill, stroke_width = 'lightblue' if male else 'pink', 1
+    radius = 0 if male else 8
+    svg = [f'<g id="{html.escape(p.ID())}">'
+           f'<rect x="{node.x - node.width / 2:.1f}" y="{top:.1f}" '
+           f'width="{node.width:.1f}" height="{height:.1f}" rx="{radius}" '
+           f'fill="{fill}" stroke="black" stroke-width="{stroke_width}"/>']
+    lines = _GetLabel(p)
+    y = top + height / 2 - _LINE_HEIGHT * (len(lines) - 1) / 2
+    for line in lines:
+      svg.append(f'<text x="{node.x:.1f}" y="{y:.1f}" text-anchor="middle" '
+                 f'dominant-baseline="central">{html.escape(line)}</text>')
+      y += _LINE_HEIGHT
+    svg.append('</g>\n')
+    return ''.join(svg)
+
+  def WriteSvg(self, fp: TextIO) -> None:
+    for chunk in self.IterSvg():
+      fp.write(chunk)
+
+  def ToSvg(self) -> Text:
+    return ''.join(self.IterSvg())
+
+def _GetLabel(p: ft.Person) -> List[Text]:
+  """Returns the lines of `p`'s label, as in Person.ToDot()."""
+
+  label = p.Name()
+  if p.annotation:
+    label += f' ({p.annotation})'
+  lines = [label]
+  birth, death = p.Birth(), p.Death()
+  if birth or death:
+    lines.append(f'{birth or ""}-{death or ""}')
+  return lines
+
+def main(argv: Optional[Sequence[Text]]=None) -> None:
+  parser = argparse.ArgumentParser(
+      description='Draws a GEDCOM file as SVG without graphviz.')
+  parser.add_argument('input', help='the GEDCOM file to import')
+  parser.add_argument('-o', '--output',
+                      help='where to write the SVG file (default: stdout)')
+  args = parser.parse_args(argv)
+
+  result = gedcom.Load(args.input)
+  print(result, file=sys.stderr)
+  layout = Layout(result.family)
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as fp:
+      layout.WriteSvg(fp)
+  else:
+    layout.WriteSvg(sys.stdout)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""An index of when the people of a family lived, for queries like "who was
+alive in 1950".
+
+A lifespan is the range of years from the birth year to the death year
+(see GetLifespan() for unknown dates).  The lifespans are kept in a segment
+tree over the years 0 to 16383: each lifespan is stored at the O(log Y)
+nodes that cover it, and the people alive in a year are those stored on the
+path from the year's leaf to the root.  The people born in each year are
+also kept, with the birth years in a sorted list, for the people born within
+a range.  Both take O(log Y) to update, so the index follows changes to the
+family as they happen.
+"""
+
+import bisect
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from . import family_tree as ft
+
+# The number of years covered, which includes every year that _GetYear()
+# finds (three or four digits).
+_SIZE = 1 << 14
+
+# The end of the lifespan of the living.
+_END_OF_TIME = _SIZE - 1
+
+def GetLifespan(person: ft.Person) -> Optional[Tuple[int, int]]:
+  """Returns the first and last years `person` was alive, or None if that
+  isn't known.
+
+  As with Birth(), Death() and Deceased(), a '?' date is unknown, and a
+  person with no death date is alive.  The last year of the living is
+  _END_OF_TIME.  It isn't known when someone whose birth year is unknown, or
+  who died at an unknown date, was alive.
+  """
+
+  birth = ft._GetYear(person.Birth())
+  if birth is None:
+    return None
+  if not person.Deceased():
+    return (birth, _END_OF_TIME)
+  death = ft._GetYear(person.Death())
+  if death is None or death < birth:
+    return None
+  return (birth, death)
+
+def _GetNodes(first: int, last: int) -> Iterator[int]:
+  """Returns the segment tree nodes that together cover the years `first`
+  to `last`."""
+
+  low = first + _SIZE
+  high = last + _SIZE + 1
+  while low < high:
+    if low & 1:
+      yield low
+      low += 1
+    if high & 1:
+      high -= 1
+      yield high
+    low >>= 1
+    high >>= 1
+
+class LifespanIndex:
+  """The lifespan index of a family; see Family.AliveIn()."""
+
+  def __init__(self, people: Iterable[ft.Person]=()):
+    # The sets of people below are dicts (with None values), which keep
+    # their order and remove people in constant time.
+    self.nodes = {}  # Maps a tree node to the people whose lifespans it's in.
+    self.births = {}  # Maps a birth year to the people born then.
+    self.birth_years = []  # The keys of `births`, sorted.
+    self.lifespans = {}  # Maps each person in the index to their lifespan.
+    for p in people:
+      self.Update(p)
+
+  def Update(self, person: ft.Person) -> None:
+    """Indexes `person` with their current birth and death."""
+
+    lifespan = GetLifespan(person)
+    old = self.lifespans.get(person)
+    if lifespan == old:
+      return
+    if old is not None:
+      self._Remove(person, old)
+    if lifespan is None:
+      return
+
+    self.lifespans[person] = lifespan
+    first, last = lifespan
+    for node in _GetNodes(first, last):
+      people = self.nodes.get(node)
+      if people is None:
+        people = self.nodes[node] = {}
+      people[person] = None
+    born = self.births.get(first)
+    if born is None:
+      born = self.births[first] = {}
+      bisect.insort(self.birth_years, first)
+    born[person] = None
+
+  def _Remove(self, person: ft.Person, lifespan: Tuple[int, int]) -> None:
+    del self.lifespans[person]
+    first, last = lifespan
+    for node in _GetNodes(first, last):
+      del self.nodes[node][person]
+    born = self.births[first]
+    del born[person]
+    if not born:
+      del self.births[first]
+      del self.birth_years[bisect.bisect_left(self.birth_years, first)]
+
+  def AliveIn(self, year: int) -> List[ft.Person]:
+    """Returns the people alive in `year`, in no particular order."""
+
+    if year < 0:
+      return []
+    node = min(year, _END_OF_TIME) + _SIZE
+    alive = []
+    while node:
+      alive.extend(self.nodes.get(node, ()))
+      node >>= 1
+    return alive
+
+  def AliveBetween(self, first: int, last: int) -> List[ft.Person]:
+    """Returns the people alive at some time from `first` to `last`, in no
+    particular order."""
+
+    if last < first or last < 0:
+      return []
+    # Those alive at the start, plus those born after it.
+    alive = self.AliveIn(first)
+    years = self.birth_years
+    for i in range(bisect.bisect_right(years, max(first, -1)),
+                   bisect.bisect_right(years, last)):
+      alive.extend(self.births[years[i]])
+    return alive
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""Merges one family into another, recognizing people who are in both.
+
+Comparing everyone with everyone is too slow for large trees, so each person
+is only compared with the people who share a blocking key with them: the
+same normalized name, a similar-sounding name with the same birth year, or a
+similar-sounding given name with the same parent.  Each such candidate pair
+is scored on the names, dates, genders and parents, and the best-scoring
+pairs above a threshold are taken as the same person.
+"""
+
+import difflib
+import itertools
+from typing import Dict, Iterable, List, NamedTuple, Text, Tuple
+
+from . import family_tree as ft
+
+# Blocks with more people than this (e.g. 'John Smith' without a birth year)
+# are too vague to compare everyone in them.
+_MAX_BLOCK_SIZE = 50
+
+_SOUNDEX_CODES = {c: str(code) for code, letters in enumerate(
+    ('aehiouwy', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r')) for c in letters}
+
+def _Soundex(word: Text) -> Text:
+  """Returns the Soundex code of `word`, e.g. 'r163' for 'Robert' and
+  'Rupert'.  Words that aren't in the Latin alphabet are returned as is."""
+
+  if not word or not ft._IsAscii(word) or not word[0].isalpha():
+    return word
+  code = word[0]
+  last = _SOUNDEX_CODES.get(word[0], '')
+  for c in word[1:]:
+    digit = _SOUNDEX_CODES.get(c, '')
+    if digit and digit != '0' and digit != last:
+      code += digit
+      if len(code) == 4:
+        break
+    if c not in 'hw':
+      last = digit
+  return code.ljust(4, '0')
+
+def _GetNameKeys(name: Text,
+                 cache: Dict[Text, Tuple]) -> Tuple[Text, Tuple[Text, Text]]:
+  """Returns `name` normalized, and the Soundex codes of its first and last
+  words.  Many people share names, and parents are looked up again for each
+  child, so the results are cached in `cache`."""
+
+  keys = cache.get(name)
+  if keys is None:
+    normalized = ft._NormalizeName(name)
+    words = normalized.split() or ['']
+    keys = cache[name] = (normalized,
+                          (_Soundex(words[0]), _Soundex(words[-1])))
+  return keys
+
+class _Profile:
+  """What is compared about a person."""
+
+  __slots__ = ('person', 'name', 'sound', 'given', 'birth', 'death', 'father',
+               'mother')
+
+  def __init__(self, person: ft.Person, names: Dict[Text, Tuple]):
+    self.person = person
+    self.name, self.sound = _GetNameKeys(person.name, names)
+    self.given = self.sound[0]
+    self.birth = ft._GetYear(person.birth)
+    self.death = ft._GetYear(person.death)
+    self.father = person.father and _GetNameKeys(person.father.name, names)[0]
+    self.mother = person.mother and _GetNameKeys(person.mother.name, names)[0]
+
+  def BlockingKeys(self) -> Iterable[Tuple]:
+    yield ('name', self.name)
+    yield ('sound', self.sound)
+    if self.birth is not None:
+      yield ('sound+birth', self.sound, self.birth)
+    if self.father:
+      yield ('father', self.given, self.father)
+    if self.mother:
+      yield ('mother', self.given, self.mother)
+
+def _Score(a: _Profile, b: _Profile, threshold: float) -> float:
+  """Returns how likely `a` and `b` are the same person, from about 1 for
+  the same name without anything else known to 2 for everything matching;
+  -1 if the score would be below `threshold`."""
+
+  gender_a, gender_b = a.person.gender, b.person.gender
+  if gender_a and gender_b and gender_a != gender_b:
+    return -1.0
+  # The cheap comparisons go first, so that the names need only be compared
+  # closely when they could push the score above the threshold.
+  score = 0.0
+  for year_a, year_b, weight in ((a.birth, b.birth, 0.3),
+                                 (a.death, b.death, 0.1)):
+    if year_a is not None and year_b is not None:
+      difference = abs(year_a - year_b)
+      if difference > 2:
+        return -1.0
+      score += weight if difference == 0 else weight / 3
+  for parent_a, parent_b in ((a.father, b.father), (a.mother, b.mother)):
+    if parent_a and parent_b:
+      same = parent_a == parent_b or _IsSimilar(parent_a, parent_b, 0.85)
+      score += 0.3 if same else -0.3
+
+  if a.name == b.name:
+    return score + 1.0
+  minimum = max(threshold - score, 0.7)
+  matcher = difflib.SequenceMatcher(None, a.name, b.name, autojunk=False)
+  if matcher.real_quick_ratio() < minimum or matcher.quick_ratio() < minimum:
+    return -1.0
+  similarity = matcher.ratio()
+  return score + similarity if similarity >= minimum else -1.0
+
+def _IsSimilar(a: Text, b: Text, minimum: float) -> bool:
+  matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+  return (matcher.real_quick_ratio() >= minimum and
+          matcher.quick_ratio() >= minimum and matcher.ratio() >= minimum)
+
+class MergeResult(NamedTuple):
+  """What Family.Merge() did."""
+
+  # (person in the family, person from the other family, score) for each
+  # pair that were taken to be the same person.
+  matches: List[Tuple[ft.Person, ft.Person, float]]
+  added: List[ft.Person]  # New people in the family.
+  # Relationships from the other family that contradict the family's, e.g.
+  # a different father; they were left out.
+  conflicts: List[Text]
+
+  def __str__(self) -> Text:
+    return (f'Matched {len(self.matches)} people, added {len(self.added)}, '
+            f'{len(self.conflicts)} conflicting relationships left out.')
+
+def FindMatches(family: ft.Family, other: ft.Family,
+                threshold: float=1.0) -> List[Tuple[ft.Person, ft.Person,
+                                                     float]]:
+  """Returns the (person in `family`, person in `other`, score) pairs that
+  are likely the same person, best first.  Each person is in one pair at
+  most."""
+
+  names = {}
+  blocks = {}  # Maps a blocking key to the profiles of `family` with it.
+  for p in family.people:
+    profile = _Profile(p, names)
+    for key in profile.BlockingKeys():
+      blocks.setdefault(key, []).append(profile)
+
+  pairs = []
+  for p in other.people:
+    profile = _Profile(p, names)
+    seen = set()
+    for key in profile.BlockingKeys():
+      block = blocks.get(key, ())
+      if len(block) > _MAX_BLOCK_SIZE:
+        continue
+      for candidate in block:
+        if candidate.person in seen:
+          continue
+        seen.add(candidate.person)
+        score = _Score(candidate, profile, threshold)
+        if score >= threshold:
+          pairs.append((score, candidate.person.order_added,
+                        p.order_added, candidate.person, p))
+
+  pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+  matched = set()
+  matches = []
+  for score, _, _, person, other_person in pairs:
+    if person not in matched and other_person not in matched:
+      matched.add(person)
+      matched.add(other_person)
+      matches.append((person, other_person, score))
+  return matches
+
+def Merge(family: ft.Family, other: ft.Family,
+          threshold: float=1.0) -> MergeResult:
+  """Merges `other` into `family`; see Family.Merge()."""
+
+  matches = FindMatches(family, other, threshold)
+  # Maps a person of `other` to the same person in `family`.
+  mapping = {q: p for p, q, _ in matches}
+  added = []
+  for q in other.people:
+    if q in mapping:
+      continue
+    id = q.ID()
+    suffix = 1
+    while id in family.id_to_person:
+      # Someone else with the same name.
+      suffix += 1
+      id = f'{q.ID()}_{suffix}'
+    p = family._AddPerson(q.Name(), id)
+    mapping[q] = p
+    added.append(p)
+
+  conflicts = []
+  for q in other.people:
+    p = mapping[q]
+    for name in ('annotation', 'birth'):
+      if getattr(p, name) is None and getattr(q, name) is not None:
+        p._SetAttribute(name, getattr(q, name))
+    if q.death and (p.death is None or (p.death == '?' and q.death != '?')):
+      p._SetAttribute('death', q.death)
+    if q.gender and not p.gender:
+      p.SetGender(q.gender)
+
+  for q in other.people:
+    p = mapping[q]
+    for wife in q.wives:
+      p.AddWife(mapping[wife])
+    for relation, parent in (('father', q.father), ('mother', q.mother)):
+      if parent is None:
+        continue
+      current = getattr(p, relation)
+      if current is None:
+        if relation == 'father':
+          p.SetFather(mapping[parent])
+        else:
+          p.SetMother(mapping[parent])
+      elif current is not mapping[parent]:
+        conflicts.append(f'{p.ID()} has {relation} {current.ID()}, not '
+                         f'{mapping[parent].ID()}')
+    # Children added with AddChild() alone, without a father or mother.
+    for child in q.children:
+      if q is child.father or q is child.mother:
+        continue  # Linked above from the child's side.
+      c = mapping[child]
+      relation = {'M': 'father', 'F': 'mother'}.get(p.Gender())
+      current = getattr(c, relation) if relation else None
+      if current is None or current is p:
+        p.AddChild(c)
+      else:
+        conflicts.append(f'{c.ID()} has {relation} {current.ID()}, not '
+                         f'{p.ID()}')
+
+  # Once everyone is married: whether the spouses are deceased.
+  for q in other.people:
+    p = mapping[q]
+    if q.spouse_death and not p.spouse_death:
+      p.spouse_death = q.spouse_death
+      for spouse in itertools.chain(q.wives, q.husbands):
+        if mapping[spouse].death is None:
+          mapping[spouse]._SetAttribute('death', q.spouse_death)
+  return MergeResult(matches, added, conflicts)
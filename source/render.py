@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""Renders a family tree to images with graphviz.
+
+The tree is split into pages (see Family.Paginate).  The DOT text of the pages
+is generated in a pool of forked processes (unless other threads are running),
+and each DOT file is handed to the `dot` binary as soon as it's written, with
+a bounded number of `dot` processes running at a time.
+
+Usage:
+  python -m source.render input.ged -d output_dir [-T svg] [--max-people N]
+"""
+
+import argparse
+import concurrent.futures
+import multiprocessing
+import multiprocessing.pool
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import List, NamedTuple, Optional, Sequence, Text, Tuple
+
+from . import family_tree as ft
+from . import gedcom
+
+class RenderJob(NamedTuple):
+  """The outcome of rendering one part of a family."""
+
+  name: Text
+  dot_path: Text
+  output_path: Optional[Text]  # None if no image was requested.
+  dot_seconds: float  # Time to write the DOT file.
+  render_seconds: float  # Time spent in graphviz.
+  error: Optional[Text]  # None on success.
+
+  @property
+  def ok(self) -> bool:
+    return self.error is None
+
+  def __str__(self) -> Text:
+    status = 'ok' if self.ok else f'FAILED: {self.error}'
+    return (f'{self.name}: dot {self.dot_seconds:.3f}s, '
+            f'graphviz {self.render_seconds:.3f}s, {status}')
+
+# In a worker process, the parts being rendered by the Render() call that
+# started it; see _GetProcessPool().
+_worker_parts = []  # type: List[ft._DotWriter]
+
+def _InitWorker(parts: List[ft._DotWriter]) -> None:
+  global _worker_parts
+  _worker_parts = parts
+
+def _WriteDot(part: ft._DotWriter, path: Text) -> float:
+  """Writes `part` to `path` and returns the time it took."""
+
+  start = time.perf_counter()
+  with open(path, 'w', encoding='utf-8') as fp:
+    part.WriteDot(fp)
+  return time.perf_counter() - start
+
+def _WriteWorkerDot(job: Tuple[int, Text]) -> Tuple[int, float]:
+  """Writes the worker's part `index` to `path`, where `job` is (index,
+  path), and returns the index and the time it took."""
+
+  index, path = job
+  return index, _WriteDot(_worker_parts[index], path)
+
+def _RunGraphviz(dot: Text, format: Text, dot_path: Text, output_path: Text,
+                 timeout: Optional[float]) -> Tuple[float, Optional[Text]]:
+  """Runs `dot` on one file.  Returns the time taken and the error, if any."""
+
+  start = time.perf_counter()
+  try:
+    result = subprocess.run([dot, f'-T{format}', dot_path, '-o', output_path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                            timeout=timeout)
+  except FileNotFoundError:
+    error = f'{dot} not found'
+  except subprocess.TimeoutExpired:
+    error = f'timed out after {timeout}s'
+  else:
+    error = None
+    if result.returncode:
+      stderr = result.stderr.decode('utf-8', 'replace').strip()
+      error = f'exit status {result.returncode}' + (
+          f': {stderr}' if stderr else '')
+  return time.perf_counter() - start, error
+
+def _GetProcessPool(workers: int, parts: List[ft._DotWriter]) -> Optional[
+    multiprocessing.pool.Pool]:
+  """Returns a pool of forked processes that write `parts`, or None if
+  forking isn't available, not worth it, or unsafe.
+
+  The processes inherit the parts through the initializer's arguments
+  instead of unpickling the whole family, and each pool has its own, so
+  concurrent Render() calls don't interfere.  Forking while other threads
+  run is unsafe, as the child inherits any locks they hold (e.g. the
+  family's), so then the pages are written in this process instead.
+  """
+
+  if (workers <= 1 or threading.active_count() > 1 or
+      'fork' not in multiprocessing.get_all_start_methods()):
+    return None
+  return multiprocessing.get_context('fork').Pool(workers, _InitWorker,
+                                                   (parts,))
+
+def Render(family: ft.Family, directory: Text,
+           max_people: Optional[int]=None, format: Optional[Text]='svg',
+           dot: Text='dot', workers: Optional[int]=None,
+           timeout: Optional[float]=60) -> List[RenderJob]:
+  """Renders `family` into `directory`.
+
+  The family is split into pages of at most `max_people` people (one page
+  if None).  Each page is written as page_NNN.dot and, unless `format` is
+  None, rendered by the graphviz binary `dot` into page_NNN.<format>.
+  `workers` bounds both the DOT processes and the concurrent graphviz runs
+  (default: the number of CPUs), and a graphviz run taking longer than
+  `timeout` seconds is killed.
+
+  Returns one job per page, in page order.  Failed graphviz runs are
+  reported in the jobs rather than raised.
+  """
+
+  workers = workers or os.cpu_count() or 1
+  os.makedirs(directory, exist_ok=True)
+  if max_people is None:
+    family.Sort()  # Sort once here rather than in every worker.
+    parts = [family]
+  else:
+    parts = family.Paginate(max_people)
+  names = [f'page_{i + 1:03d}' for i in range(len(parts))]
+  dot_paths = [os.path.join(directory, f'{name}.dot') for name in names]
+  dot_seconds = [0.0] * len(parts)
+  renders = {}  # Part index => future of (seconds, error).
+
+  # Before starting any threads, as it forks.
+  pool = _GetProcessPool(min(workers, len(parts)), parts)
+  try:
+    with concurrent.futures.ThreadPoolExecutor(workers) as graphviz:
+      def Written(i: int, seconds: float) -> None:
+        dot_seconds[i] = seconds
+        if format:
+          output_path = os.path.join(directory, f'{names[i]}.{format}')
+          renders[i] = graphviz.submit(_RunGraphviz, dot, format,
+                                       dot_paths[i], output_path, timeout)
+
+      if pool:
+        for i, seconds in pool.imap_unordered(_WriteWorkerDot,
+                                              enumerate(dot_paths)):
+          Written(i, seconds)
+      else:
+        for i, path in enumerate(dot_paths):
+          Written(i, _WriteDot(parts[i], path))
+
+      jobs = []
+      for i, name in enumerate(names):
+        output_path = None
+        render_seconds, error = 0.0, None
+        if format:
+          output_path = os.path.join(directory, f'{name}.{format}')
+          render_seconds, error = renders[i].result()
+        jobs.append(RenderJob(name, dot_paths[i], output_path,
+                              dot_seconds[i], render_seconds, error))
+  finally:
+    if pool:
+      pool.terminate()
+      pool.join()
+  return jobs
+
+def main(argv: Optional[Sequence[Text]]=None) -> int:
+  parser = argparse.ArgumentParser(
+      description='Renders a GEDCOM file with graphviz.')
+  parser.add_argument('input', help='the GEDCOM file to import')
+  parser.add_argument('-d', '--directory', default='.',
+                      help='where to write the output (default: .)')
+  parser.add_argument('-T', '--format', default='svg',
+                      help='the graphviz output format, or "none" to only '
+                      'write DOT files (default: svg)')
+  parser.add_argument('--max-people', type=int,
+                      help='split the tree into pages of this many people')
+  parser.add_argument('--dot', default='dot',
+                      help='the graphviz binary (default: dot)')
+  parser.add_argument('-j', '--jobs', type=int,
+                      help='how many pages to work on at a time '
+                      '(default: number of CPUs)')
+  parser.add_argument('--timeout', type=float, default=60,
+                      help='seconds to allow graphviz per page (default: 60)')
+  parser.add_argument('--rankdir', help='the graphviz rankdir, e.g. LR')
+  args = parser.parse_args(argv)
+
+  result = gedcom.Load(args.input, ft.Family(rankdir=args.rankdir))
+  print(result, file=sys.stderr)
+  format = None if args.format == 'none' else args.format
+  jobs = Render(result.family, args.directory, args.max_people, format,
+                args.dot, args.jobs, args.timeout)
+  for job in jobs:
+    print(job, file=sys.stderr)
+  return 0 if all(job.ok for job in jobs) else 1
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+"""An index of the names in a family for type-ahead and fuzzy search.
+
+Names are normalized (lower case, no accents or punctuation) and split into
+words; Chinese characters are words of their own, as Chinese names aren't
+written with spaces.  Three structures map a query word to name words:
+
+- a dict of the people with each word, for exact matches;
+- a sorted list of all the words, where the words starting with a prefix are
+  a contiguous range found by bisection (a flat prefix trie);
+- a dict from each word with one letter deleted to the words it came from,
+  which finds the words one typo away: two words are one substitution,
+  insertion, deletion or transposition apart iff they share such a variant.
+
+A query matches the people whose names have a matching word for every query
+word.  Exact words rank above prefixes, which rank above typos; ties go to
+shorter names, then to the people added first.
+
+So that short prefixes stay fast in big families, a query word expands to at
+most _MAX_PREFIX_WORDS name words (the shortest ones), and at most
+_MAX_CANDIDATES people are ranked; see NameIndex.Search().
+"""
+
+import bisect
+import heapq
+import re
+from typing import Dict, Iterable, List, Text
+
+from . import family_tree as ft
+
+# A Chinese character, which is a word by itself.
+_WORD_RE = re.compile(r'[\u3400-\u9fff\uf900-\ufaff]|'
+                      r'[^\s\u3400-\u9fff\uf900-\ufaff]+')
+
+# How many people to rank at most per query, and how many name words a
+# prefix may expand to; a one-letter prefix can match most of a big family.
+_MAX_CANDIDATES = 1000
+_MAX_PREFIX_WORDS = 200
+
+# Greater than any character, so that the words starting with a prefix sort
+# before the prefix followed by it.
+_LAST_CHARACTER = '\U0010ffff'
+
+# Query words shorter than this aren't matched with typos.
+_MIN_FUZZY_LENGTH = 4
+
+_EXACT, _PREFIX, _TYPO = 3, 2, 1  # Scores of a word match.
+
+def _GetWords(text: Text) -> List[Text]:
+  return _WORD_RE.findall(ft._NormalizeName(text))
+
+def _GetDeletions(word: Text) -> Iterable[Text]:
+  """Returns `word` with each letter deleted in turn."""
+
+  return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+def _IsOneEditApart(a: Text, b: Text) -> bool:
+  """Returns True iff `a` and `b` differ by one substitution, insertion,
+  deletion or transposition of adjacent letters."""
+
+  if abs(len(a) - len(b)) > 1 or a == b:
+    return False
+  if len(a) > len(b):
+    a, b = b, a
+  i = 0
+  while i < len(a) and a[i] == b[i]:
+    i += 1
+  if len(a) < len(b):
+    return a[i:] == b[i + 1:]
+  if a[i + 1:] == b[i + 1:]:  # A substitution at i.
+    return True
+  return (i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and
+          a[i + 2:] == b[i + 2:])
+
+class NameIndex:
+  """The name index of a family; see Family.Search()."""
+
+  def __init__(self, people: Iterable[ft.Person]=()):
+    # The sets below are dicts (with None values), which keep their order
+    # and remove items in constant time.
+    self.words = []  # All name words, sorted.
+    self.people = {}  # Maps a name word to the set of people with it.
+    self.deletions = {}  # Maps a word minus one letter to the set of words.
+    self.person_words = {}  # Maps a person to their name words.
+    new_words = set()
+    for p in people:
+      new_words.update(self._AddPerson(p))
+    self.words = sorted(new_words)
+    for word in new_words:
+      self._AddDeletions(word)
+
+  def _AddPerson(self, person: ft.Person) -> List[Text]:
+    """Indexes `person` under their name words, and returns the words that
+    weren't indexed before."""
+
+    words = tuple(_GetWords(person.name))
+    self.person_words[person] = words
+    new_words = []
+    for word in set(words):
+      people = self.people.get(word)
+      if people is None:
+        people = self.people[word] = {}
+        new_words.append(word)
+      people[person] = None
+    return new_words
+
+  def _AddDeletions(self, word: Text) -> None:
+    deletions = self.deletions
+    for deletion in _GetDeletions(word):
+      words = deletions.get(deletion)
+      if words is None:
+        deletions[deletion] = {word: None}
+      else:
+        words[word] = None
+
+  def Add(self, person: ft.Person) -> None:
+    """Indexes a new person."""
+
+    for word in self._AddPerson(person):
+      bisect.insort(self.words, word)
+      self._AddDeletions(word)
+
+  def Remove(self, person: ft.Person) -> None:
+    """Removes `person` from the index, e.g. before their name changes."""
+
+    for word in set(self.person_words.pop(person)):
+      people = self.people[word]
+      del people[person]
+      if people:
+        continue
+      del self.people[word]
+      del self.words[bisect.bisect_left(self.words, word)]
+      for deletion in _GetDeletions(word):
+        words = self.deletions[deletion]
+        del words[word]
+        if not words:
+          del self.deletions[deletion]
+
+  def _Match(self, query_word: Text, fuzzy: bool) -> Dict[Text, int]:
+    """Returns the name words that `query_word` matches, with the score of
+    each match."""
+
+    matches = {}
+    start = bisect.bisect_left(self.words, query_word)
+    end = bisect.bisect_left(self.words, query_word + _LAST_CHARACTER, start)
+    words = self.words[start:end]
+    if len(words) > _MAX_PREFIX_WORDS:
+      # The shortest words, which are the closest to the prefix (and include
+      # the exact match, if any).
+      words = heapq.nsmallest(_MAX_PREFIX_WORDS, words, key=len)
+    for word in words:
+      matches[word] = _EXACT if word == query_word else _PREFIX
+    if fuzzy and len(query_word) >= _MIN_FUZZY_LENGTH:
+      candidates = set(self.deletions.get(query_word, ()))
+      for deletion in _GetDeletions(query_word):
+        if deletion in self.people:
+          candidates.add(deletion)
+        candidates.update(self.deletions.get(deletion, ()))
+      for word in candidates:
+        if word not in matches and _IsOneEditApart(query_word, word):
+          matches[word] = _TYPO
+    return matches
+
+  def Search(self, query: Text, limit: int=10,
+             fuzzy: bool=True) -> List[ft.Person]:
+    """Returns the best `limit` people whose names match `query`.
+
+    The candidates are the people with a word that matches the query word
+    with the fewest people, taken best match first.  Once the candidates
+    left can't rank among the best `limit`, the rest are skipped.  At most
+    _MAX_CANDIDATES people are ranked, though, so a query that matches more
+    people than that (e.g. a single letter in a big family) may miss some of
+    the best matches.
+    """
+
+    query_words = _GetWords(query)
+    if not query_words or limit <= 0:
+      return []
+    matches = [self._Match(word, fuzzy) for word in query_words]
+    # Find the candidates through the query word with the fewest people,
+    # best matches first, and check the other words on each.
+    driver = min(matches, key=lambda m: sum(len(self.people[w]) for w in m))
+    # The best score the other query words can add.
+    others = sum(max(m.values(), default=0) for m in matches) - max(
+        driver.values(), default=0)
+
+    ranked = []  # A heap of the best `limit` (score, -len, -order, person).
+    seen = set()
+    for word in sorted(driver, key=lambda w: (-driver[w], len(w), w)):
+      if len(seen) >= _MAX_CANDIDATES:
+        break
+      if len(ranked) == limit and ranked[0][0] > driver[word] + others:
+        break  # Nobody left can rank among the best.
+      for p in self.people[word]:
+        if p in seen:
+          continue
+        seen.add(p)
+        words = self.person_words[p]
+        score = 0
+        for word_matches in matches:
+          best = max((word_matches.get(w, 0) for w in words), default=0)
+          if not best:
+            break
+          score += best
+        else:
+          item = (score, -len(p.name), -p.order_added, p)
+          if len(ranked) < limit:
+            heapq.heappush(ranked, item)
+          elif item[:3] > ranked[0][:3]:
+            heapq.heapreplace(ranked, item)
+    ranked.sort(key=lambda r: r[:3], reverse=True)
+    return [r[-1] for r in ranked]
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""An asyncio service that renders a family on request, e.g. behind a web
+server.
+
+  service = RenderService(family)
+  svg = await service.Render(root='Adam Smith', depth=3, format='svg')
+  print(service.Metrics())
+
+The output of each request is kept in an LRU cache bounded by total size,
+keyed by the family's version (see Family.Version()) and the parameters of
+the request, so requests after a change to the family simply miss.
+Identical requests that arrive while one is being rendered wait for it
+instead of rendering again.  Sorting and generating the DOT run in a thread
+pool under the family's read lock, which keeps the event loop responsive
+and lets other threads edit the family with `family.Writing()`; graphviz
+runs as a subprocess.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import time
+from typing import Dict, Hashable, NamedTuple, Optional, Text, Tuple
+
+from . import family_tree as ft
+
+class RenderRequest(NamedTuple):
+  """What to render."""
+
+  # The ID or name of the person whose descendants to render, or None for
+  # the whole family.
+  root: Optional[Text]
+  # How many generations to render below the root (or from the top of the
+  # family, with the rest summarized as in Family.Overview()); no limit if
+  # None.
+  depth: Optional[int]
+  # The graphviz rankdir, e.g. 'LR'; the family's rankdir by default.
+  rankdir: Optional[Text]
+  format: Text  # 'dot' for the DOT text, or a graphviz output format.
+
+class RenderError(Exception):
+  """Raised when graphviz fails."""
+
+class _LruCache:
+  """Maps keys to byte strings, evicting the least recently used ones when
+  their total size goes over `max_bytes`."""
+
+  def __init__(self, max_bytes: int):
+    self.max_bytes = max_bytes
+    self.bytes = 0
+    self.evictions = 0
+    self._items = collections.OrderedDict()
+
+  def __len__(self) -> int:
+    return len(self._items)
+
+  def Get(self, key: Hashable) -> Optional[bytes]:
+    value = self._items.get(key)
+    if value is not None:
+      self._items.move_to_end(key)
+    return value
+
+  def Put(self, key: Hashable, value: bytes) -> None:
+    if len(value) > self.max_bytes:
+      return  # It would evict everything else.
+    old = self._items.pop(key, None)
+    if old is not None:
+      self.bytes -= len(old)
+    self._items[key] = value
+    self.bytes += len(value)
+    while self.bytes > self.max_bytes:
+      _, evicted = self._items.popitem(last=False)
+      self.bytes -= len(evicted)
+      self.evictions += 1
+
+class ServiceMetrics(NamedTuple):
+  """How a RenderService has been doing."""
+
+  requests: int
+  hits: int  # Served from the cache.
+  coalesced: int  # Waited for an identical request that was being rendered.
+  renders: int  # Rendered.
+  errors: int
+  cache_entries: int
+  cache_bytes: int
+  evictions: int
+  # Percentiles of the latency in seconds, over the recent requests.
+  latency_p50: float
+  latency_p99: float
+
+  @property
+  def hit_rate(self) -> float:
+    """The fraction of requests served from the cache."""
+
+    return self.hits / self.requests if self.requests else 0.0
+
+  def __str__(self) -> Text:
+    return (f'{self.requests} requests: {self.hits} hits '
+            f'({self.hit_rate:.1%}), {self.coalesced} coalesced, '
+            f'{self.renders} renders, {self.errors} errors; '
+            f'cache {self.cache_entries} entries, {self.cache_bytes} bytes, '
+            f'{self.evictions} evictions; latency p50 '
+            f'{self.latency_p50 * 1000:.2f}ms, '
+            f'p99 {self.latency_p99 * 1000:.2f}ms')
+
+# The number of recent latencies kept for the percentiles.
+_LATENCY_WINDOW = 10000
+
+class RenderService:
+  """Renders a family on request, with caching and coalescing.
+
+  All methods must be called from the same event loop.  `workers` is the
+  number of threads rendering DOT; `dot` is the graphviz binary, run for any
+  format other than 'dot' with a timeout of `timeout` seconds.
+  """
+
+  def __init__(self, family: ft.Family, max_cache_bytes: int=64 * 2**20,
+               workers: Optional[int]=None, dot: Text='dot',
+               timeout: Optional[float]=60):
+    self.family = family
+    self.dot = dot
+    self.timeout = timeout
+    self._cache = _LruCache(max_cache_bytes)
+    self._executor = concurrent.futures.ThreadPoolExecutor(workers)
+    # Maps the key of each request being rendered to its task.
+    self._pending = {}  # type: Dict[Tuple[int, RenderRequest], asyncio.Future]
+    self._requests = 0
+    self._hits = 0
+    self._coalesced = 0
+    self._renders = 0
+    self._errors = 0
+    self._latencies = collections.deque(maxlen=_LATENCY_WINDOW)
+
+  def Close(self) -> None:
+    """Waits for the renders in progress and stops the threads."""
+
+    self._executor.shutdown()
+
+  async def Render(self, root: Optional[Text]=None, depth: Optional[int]=None,
+                   rankdir: Optional[Text]=None, format: Text='dot') -> bytes:
+    """Returns the rendering of the family as of now; see RenderRequest.
+
+    Raises ValueError if `root` isn't in the family, and RenderError if
+    graphviz fails.
+    """
+
+    start = time.perf_counter()
+    # With the family's rankdir if none is given, as changing it doesn't
+    # change the version.
+    if rankdir is None:
+      rankdir = self.family.rankdir
+    request = RenderRequest(root, depth, rankdir, format)
+    key = (self.family.Version(), request)
+    self._requests += 1
+    try:
+      output = self._cache.Get(key)
+      if output is not None:
+        self._hits += 1
+        return output
+      task = self._pending.get(key)
+      if task is None:
+        self._renders += 1
+        task = asyncio.ensure_future(self._Render(request))
+        self._pending[key] = task
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+      else:
+        self._coalesced += 1
+      # Shielded, so that a cancelled request doesn't cancel the render
+      # others are waiting for.
+      return await asyncio.shield(task)
+    except Exception:
+      self._errors += 1
+      raise
+    finally:
+      self._latencies.append(time.perf_counter() - start)
+
+  async def _Render(self, request: RenderRequest) -> bytes:
+    loop = asyncio.get_event_loop()
+    version, output = await loop.run_in_executor(self._executor,
+                                                 self._RenderDot, request)
+    if request.format != 'dot':
+      output = await self._RunGraphviz(output, request.format)
+    # Under the version rendered, which is newer than the request's if the
+    # family changed in the meantime.
+    self._cache.Put((version, request), output)
+    return output
+
+  def _RenderDot(self, request: RenderRequest) -> Tuple[int, bytes]:
+    """Returns the family's version and the DOT of `request`.  Runs in a
+    worker thread."""
+
+    family = self.family
+    with family.Reading():
+      version = family.Version()
+      if request.root is not None:
+        tree = family.Descendants(request.root, request.depth)
+      elif request.depth is not None:
+        tree = family.Overview(max_depth=request.depth)
+      else:
+        tree = family
+      chunks = tree.IterDot()
+      next(chunks)
+      # The header with the rankdir of the request, rather than setting
+      # family.rankdir, which other threads use.
+      dot = ft._DotHeader(request.rankdir) + ''.join(chunks)
+    return version, dot.encode('utf-8')
+
+  async def _RunGraphviz(self, dot: bytes, format: Text) -> bytes:
+    try:
+      process = await asyncio.create_subprocess_exec(
+          self.dot, f'-T{format}', stdin=asyncio.subprocess.PIPE,
+          stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError:
+      raise RenderError(f'{self.dot} not found')
+    try:
+      output, stderr = await asyncio.wait_for(process.communicate(dot),
+                                              self.timeout)
+    except asyncio.TimeoutError:
+      process.kill()
+      await process.wait()
+      raise RenderError(f'timed out after {self.timeout}s')
+    if process.returncode:
+      stderr = stderr.decode('utf-8', 'replace').strip()
+      raise RenderError(f'exit status {process.returncode}' +
+                        (f': {stderr}' if stderr else ''))
+    return output
+
+  def Metrics(self) -> ServiceMetrics:
+    latencies = sorted(self._latencies)
+    def Percentile(fraction: float) -> float:
+      if not latencies:
+        return 0.0
+      return latencies[min(int(len(latencies) * fraction),
+                           len(latencies) - 1)]
+    return ServiceMetrics(self._requests, self._hits, self._coalesced,
+                          self._renders, self._errors, len(self._cache),
+                          self._cache.bytes, self._cache.evictions,
+                          Percentile(0.5), Percentile(0.99))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""Statistics over a family, computed with NumPy.
+
+The people of a family are exported once into flat arrays (see ToArrays()),
+with the birth and death dates parsed into years.  The statistics are then
+vectorized operations over the arrays rather than loops over Person objects.
+
+NumPy is only needed by this module; the rest of the package works without
+it.
+"""
+
+from typing import List, NamedTuple, Optional, Text
+
+import numpy as np
+
+from . import family_tree as ft
+
+# Values of FamilyArrays.gender.
+UNKNOWN, MALE, FEMALE = 0, 1, 2
+
+def _ParseYears(dates: List[Optional[Text]]) -> np.ndarray:
+  """Returns the years of `dates` as floats, NaN where unknown."""
+
+  years = {}  # Many people share dates, so parse each string once.
+  values = np.full(len(dates), np.nan)
+  for i, date in enumerate(dates):
+    if date is None:
+      continue
+    year = years.get(date)
+    if year is None:
+      match = ft._YEAR_RE.search(date)
+      year = years[date] = float(match.group(1)) if match else np.nan
+    values[i] = year
+  return values
+
+class FamilyArrays:
+  """The people of a family as parallel arrays, indexed by the order the
+  people were added (so `people[i]` is described by element i of each).
+
+  Unknown years are NaN, and unknown parents are -1.  The marriages are a
+  separate pair of arrays of husband and wife indices.
+  """
+
+  def __init__(self, family: ft.Family):
+    people = family.people
+    self.people = list(people)
+    n = len(people)
+    levels = np.fromiter((p.level for p in people), np.int64, n)
+    self.generation = levels - levels.min() if n else levels
+    self.birth_year = _ParseYears([p.birth for p in people])
+    self.death_year = _ParseYears([p.death for p in people])
+    self.deceased = np.fromiter((bool(p.death) for p in people), bool, n)
+    genders = {'M': MALE, 'F': FEMALE}
+    self.gender = np.fromiter((genders.get(p.gender, UNKNOWN) for p in people),
+                              np.int8, n)
+    self.father = np.fromiter(
+        (-1 if p.father is None else p.father.order_added for p in people),
+        np.int64, n)
+    self.mother = np.fromiter(
+        (-1 if p.mother is None else p.mother.order_added for p in people),
+        np.int64, n)
+    self.num_children = np.fromiter((len(p.children) for p in people),
+                                    np.int64, n)
+    self.husband = np.fromiter(
+        (p.order_added for p in people for _ in p.wives), np.int64)
+    self.wife = np.fromiter(
+        (w.order_added for p in people for w in p.wives), np.int64)
+
+  def Size(self) -> int:
+    return len(self.people)
+
+  def GenerationSizes(self) -> np.ndarray:
+    """Returns the number of people in each generation."""
+
+    return np.bincount(self.generation, minlength=1 if self.Size() else 0)
+
+  def Lifespans(self) -> np.ndarray:
+    """Returns everyone's age at death in years, NaN where unknown."""
+
+    return self.death_year - self.birth_year
+
+  def _MeanByGeneration(self, values: np.ndarray) -> np.ndarray:
+    """Returns the mean of the known (not NaN) `values` in each generation,
+    NaN for generations without any."""
+
+    known = ~np.isnan(values)
+    num_generations = len(self.GenerationSizes())
+    counts = np.bincount(self.generation[known], minlength=num_generations)
+    sums = np.bincount(self.generation[known], weights=values[known],
+                       minlength=num_generations)
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return sums / counts
+
+  def MeanLifespanByGeneration(self) -> np.ndarray:
+    return self._MeanByGeneration(self.Lifespans())
+
+  def ChildrenPerCouple(self) -> np.ndarray:
+    """Returns the number of children of each marriage, in the order of the
+    `husband` and `wife` arrays.
+
+    A child is counted for a marriage if the husband is their father and the
+    wife their mother.
+    """
+
+    n = max(self.Size(), 1)
+    has_parents = (self.father >= 0) & (self.mother >= 0)
+    keys, counts = np.unique(self.father[has_parents] * n +
+                             self.mother[has_parents], return_counts=True)
+    # A sentinel that matches no couple, for couples past the last key.
+    keys = np.append(keys, -1)
+    counts = np.append(counts, 0)
+    couple_keys = self.husband * n + self.wife
+    positions = np.searchsorted(keys[:-1], couple_keys)
+    return np.where(keys[positions] == couple_keys, counts[positions], 0)
+
+  def MeanChildrenByGeneration(self) -> np.ndarray:
+    """Returns the average number of children of the married people in each
+    generation."""
+
+    married = np.zeros(self.Size(), bool)
+    married[self.husband] = True
+    married[self.wife] = True
+    values = np.where(married, self.num_children.astype(float), np.nan)
+    return self._MeanByGeneration(values)
+
+class Summary(NamedTuple):
+  """Aggregate statistics of a family; see Family.Stats()."""
+
+  people: int
+  generation_sizes: np.ndarray
+  mean_lifespan_by_generation: np.ndarray  # NaN where no lifespan is known.
+  mean_children_by_generation: np.ndarray  # Of married people.
+  couples: int
+  mean_children_per_couple: float  # NaN if there are no couples.
+
+  def __str__(self) -> Text:
+    lines = [f'{self.people} people, {self.couples} couples, '
+             f'{self.mean_children_per_couple:.2f} children per couple.',
+             'Generation   People   Lifespan   Children']
+    for i, size in enumerate(self.generation_sizes):
+      lines.append(f'{i + 1:>10} {size:>8} '
+                   f'{self.mean_lifespan_by_generation[i]:>10.1f} '
+                   f'{self.mean_children_by_generation[i]:>10.2f}')
+    return '\n'.join(lines)
+
+def Summarize(arrays: FamilyArrays) -> Summary:
+  children = arrays.ChildrenPerCouple()
+  return Summary(arrays.Size(), arrays.GenerationSizes(),
+                 arrays.MeanLifespanByGeneration(),
+                 arrays.MeanChildrenByGeneration(), len(children),
+                 float(children.mean()) if len(children) else float('nan'))
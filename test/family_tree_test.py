@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
 import sys
+import tempfile
+import threading
+import tracemalloc
 import unittest
 
 # Add the repo root to the beginning of the Python module path.
@@ -158,6 +162,83 @@ class FamilyTreeTest(unittest.TestCase):
 
     self.assertEqual(2, self.family.Size())
 
+  def testAddChildIgnoresDuplicates(self):
+    p = self.family.Person('Adam Smith', gender='M')
+    children = [self.family.Person(f'Child {i}') for i in range(100)]
+    for c in children + children:
+      p.AddChild(c)
+    self.assertEqual(children, list(p.Children()))
+    self.assertIn(children[42], p.Children())
+    self.assertEqual(42, p.Children().index(children[42]))
+    self.assertEqual(p, children[42].Father())
+
+  def testAddWifeAndHusbandIgnoreDuplicates(self):
+    h = self.family.Person('John Smith')
+    w1 = self.family.Person('Ada Smith')
+    w2 = self.family.Person('Katty Lam')
+    h.AddWife(w1).AddWife(w2).AddWife(w1)
+    w2.AddHusband(h)
+    self.assertEqual([w1, w2], list(h.Wives()))
+    self.assertEqual(1, h.Wives().index(w2))
+    self.assertEqual([h], list(w1.Husbands()))
+    self.assertEqual([h], list(w2.Husbands()))
+    self.assertNotIn(h, h.Wives())
+
+  def testPeopleWithoutRelativesShareEmptyLists(self):
+    p = self.family.Person('John Smith')
+    q = self.family.Person('Ada Smith')
+    self.assertFalse(hasattr(p, '__dict__'))
+    self.assertIs(p.children, q.children)
+    self.assertIs(p.wives, q.husbands)
+    self.assertNotIn(q, p.Wives())
+    p.AddWife(q)
+    self.assertEqual([q], list(p.Wives()))
+    self.assertEqual(0, len(p.Children()))
+    # The accessors still return lists.
+    self.assertEqual([q], p.Children() + [q])
+    self.assertEqual([p], q.Wives() + [p])
+    # Changing them doesn't change the person.
+    husbands = p.Husbands()
+    husbands.append(q)
+    self.assertEqual([], p.Husbands())
+    p.Wives().append(p)
+    self.assertEqual([q], p.Wives())
+    self.assertIn(p, q.Husbands())
+
+  def _Describe(self, family):
+    """Returns a comparable description of everyone in the family."""
+
+    def Ids(people):
+      return [p.ID() if p else None for p in people]
+
+    return [(p.ID(), p.Name(), p.Gender(), p.birth, p.death, p.annotation,
+             Ids([p.Father(), p.Mother()]), Ids(p.Wives()), Ids(p.Husbands()),
+             Ids(p.Children())) for p in family.people]
+
+  def testAddManyMatchesPerson(self):
+    records = [
+        {'name': 'Mike Smith', 'wife': 'Jan Smith', 'spouse_death': '?'},
+        {'name': 'Tom Smith', 'father': 'Mike Smith', 'birth': '1950'},
+        {'name': 'Mike Smith', 'wife': ('Mary Jones', 'Jan Smith')},
+        {'name': 'Ann Smith', 'father': 'Mike Smith', 'mother': 'Mary Jones'},
+        {'name': 'Bob  Jones', 'mother': 'Mary Jones', 'annotation': 'Bobby'},
+        {'name': 'Eve Lee', 'husband': 'Tom Smith', 'gender': 'F'},
+        {'name': 'Kid Smith', 'mother': 'EveLee', 'death': '2000'},
+    ]
+    for record in records:
+      self.family.Person(**record)
+    batch = ft.Family()
+    people = batch.AddMany(records)
+
+    self.assertEqual(self._Describe(self.family), self._Describe(batch))
+    self.assertEqual(len(records), len(people))
+    self.assertEqual('TomSmith', people[1].ID())
+    self.assertEqual(self.family.ToDot(), batch.ToDot())
+
+  def testAddManyRejectsInvalidAttribute(self):
+    with self.assertRaises(ValueError):
+      self.family.AddMany([{'name': 'John Smith', 'wives': 'Ada Smith'}])
+
   def testSortEmptyFamily(self):
     self.assertEqual([[]], self.family.Sort())
 
@@ -196,6 +277,511 @@ class FamilyTreeTest(unittest.TestCase):
     self.assertEqual(0, w1.Generation())
     self.assertEqual(0, w2.Generation())
 
+  def testSortAfterRemarriage(self):
+    ann = self.family.Person('Ann Lee', husband='Bob Lee')
+    bob = self.family.Person('Bob Lee')
+    carl = self.family.Person('Carl Wu', wife='Dee Wu')
+    dee = self.family.Person('Dee Wu')
+    self.assertEqual([[bob, ann, carl, dee]], self.family.Sort())
+
+    # Ann is now ranked after her later husband, as his second wife.
+    self.family.Person('Carl Wu', wife='Ann Lee')
+    self.assertEqual([[bob, carl, dee, ann]], self.family.Sort())
+    self.assertEqual((carl.order_added, 2), ft._GetRankInGeneration(ann))
+
+    # Marrying Bob again, an earlier husband, changes nothing.
+    self.family.Person('Bob Lee', wife='Ann Lee')
+    self.assertEqual([[bob, carl, dee, ann]], self.family.Sort())
+
+  def testSortDeepFamily(self):
+    # Deeper than Python's default recursion limit.
+    depth = sys.getrecursionlimit() * 2
+    people = [self.family.Person('Person 0')]
+    for i in range(1, depth):
+      people.append(self.family.Person(f'Person {i}', father=f'Person {i - 1}'))
+    generations = self.family.Sort()
+    self.assertEqual(depth, len(generations))
+    self.assertEqual([people[-1]], generations[-1])
+    self.assertEqual(depth - 1, people[-1].Generation())
+
+  def testSortReturnsNewLists(self):
+    self.family.Person('Adam Smith', wife=('Eve Smith', 'Lilith'))
+    self.family.Person('Cain Smith', father='Adam Smith')
+    dot = self.family.ToDot()
+    generations = self.family.Sort()
+    expected = [list(gen) for gen in generations]
+    generations[0].reverse()
+    generations[1].clear()
+    self.assertEqual(expected, self.family.Sort())
+    self.assertEqual(dot, self.family.ToDot())
+
+  def testSortChainLinkedYoungestFirst(self):
+    # Each link moves everyone linked so far, which is done lazily.
+    people = [self.family.Person(f'Person {i}') for i in range(2000)]
+    self.family.ToDot()
+    for i in range(len(people) - 1, 0, -1):
+      self.family.Person(f'Person {i}', father=f'Person {i - 1}')
+    self.assertTrue(self.family._shifted)
+    self.assertEqual([[p] for p in people], self.family.Sort())
+    self.assertFalse(self.family._shifted)
+    self.assertEqual(1999, people[-1].Generation())
+    # Attaching a new ancestor after the levels are applied.
+    self.family.Person('Person 0', mother='Eve')
+    self.assertEqual(2000, people[-1].Generation())
+    self.assertEqual(2001, len(self.family.ToDot().split('# Generation ')) - 1)
+
+  def testSortConflictingGenerations(self):
+    # Bob marries his own great-granddaughter, which cannot be drawn in a
+    # layered family tree.
+    a = self.family.Person('Adam Smith', father='Bob Smith')
+    b = self.family.Person('Bob Smith')
+    c = self.family.Person('Carl Smith', father='Adam Smith')
+    d = self.family.Person('Dora Smith', father='Carl Smith', husband='Bob Smith')
+    self.assertEqual(b, d.Husbands()[0])
+
+    conflicts = self.family.GenerationConflicts()
+    self.assertEqual(1, len(conflicts))
+    conflict = conflicts[0]
+    # Dora's marriage is the edge that closes the cycle.
+    self.assertEqual(d, conflict.person)
+    self.assertEqual('husband', conflict.relation)
+    self.assertEqual(b, conflict.relative)
+    self.assertEqual(3, conflict.expected)
+    self.assertEqual(0, conflict.actual)
+    self.assertNotEqual(conflict.expected, conflict.actual)
+
+    with self.assertRaises(ft.GenerationConflictError) as cm:
+      self.family.Sort()
+    self.assertEqual(conflicts, cm.exception.conflicts)
+    self.assertIn('DoraSmith', str(cm.exception))
+
+  def testNoGenerationConflicts(self):
+    self.family.Person('Adam Smith', father='Bob Smith', wife='Eve Smith')
+    self.assertEqual([], self.family.GenerationConflicts())
+
+  def testSortJoinsSeparatelyPlacedPeople(self):
+    # Tom and Ann are placed independently, then Ann turns out to be Tom's
+    # granddaughter.
+    tom = self.family.Person('Tom Smith', wife='Eve Smith')
+    ann = self.family.Person('Ann Smith', husband='Bob Lee')
+    self.assertEqual([[tom, self.family.Person('Eve Smith'),
+                       self.family.Person('Bob Lee'), ann]], self.family.Sort())
+    self.family.Person('Jim Smith', father='Tom Smith')
+    self.family.Person('Ann Smith', father='Jim Smith')
+    self.assertEqual(0, tom.Generation())
+    self.assertEqual(2, ann.Generation())
+    self.assertEqual(3, len(self.family.Sort()))
+
+  def testSortAfterAddingAncestor(self):
+    p = self.family.Person('Adam Smith', father='Jim Smith')
+    self.assertEqual(0, self.family.Person('Jim Smith').Generation())
+    self.family.Person('Jim Smith', mother='Ann Smith')
+    self.assertEqual(2, p.Generation())
+    self.assertEqual(3, len(self.family.Sort()))
+
+  def testToDotOnlyRedoesChangedGenerations(self):
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    self.family.Person('Cain Smith', father='Adam Smith')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+    before = list(self.family.IterDot())
+
+    self.family.Person('Abel Smith', father='Adam Smith')
+    after = list(self.family.IterDot())
+    self.assertIs(before[1], after[1])
+    self.assertIsNot(before[2], after[2])
+    self.assertIn('AbelSmith', after[2])
+    self.assertIs(before[3], after[3])
+
+    self.family.Person('Eve Smith', birth='1900')
+    self.assertIn('1900-', self.family.ToDot())
+
+    # Renumbering the generations redoes everything.
+    self.family.Person('Adam Smith', father='Noah Smith')
+    again = list(self.family.IterDot())
+    self.assertEqual(6, len(again))
+    self.assertIn('# Generation 4.', again[4])
+
+  def testPersonToDotIsCachedUntilUpdated(self):
+    adam = self.family.Person('Adam Smith', wife='Eve Smith')
+    dot = adam.ToDot()
+    self.assertIs(dot, adam.ToDot())
+    self.family.ToDot()
+    self.assertIs(dot, adam.ToDot())
+    # Looking people up, or setting what they already have, changes nothing.
+    version = self.family.Version()
+    self.family.Person('Adam Smith', gender='M')
+    self.family.Person('Eve Smith')
+    self.assertIs(dot, adam.ToDot())
+    self.assertEqual(version, self.family.Version())
+    self.assertEqual(set(), self.family._touched)
+
+    adam.Update(birth='1900')
+    self.assertIn('1900-', adam.ToDot())
+    adam.SetGender('M')
+    self.assertIn('lightblue', adam.ToDot())
+    self.assertIn('lightblue', self.family.ToDot())
+
+  def testInstrument(self):
+    self.family.Person('Adam Smith', wife=('Eve Smith', 'Lilith'))
+    self.family.Person('Cain Smith', father='Adam Smith', mother='Eve Smith')
+    self.family.Person('Abel Smith', father='Adam Smith', mother='Eve Smith')
+    self.family.Person('Seth Smith', father='Adam Smith', mother='Lilith')
+    with self.family.Instrument() as stats:
+      dot = self.family.ToDot()
+    self.assertIsNone(self.family._stats)
+    self.assertEqual([1, 2], [g.number for g in stats.generations])
+    first, second = stats.generations
+    self.assertEqual((3, 0, 2, False),
+                     (first.people, first.marriages, first.elbows,
+                      first.cached))  # Adam's two marriages.
+    self.assertEqual((3, 2, 2), (second.people, second.marriages,
+                                 second.elbows))  # Cain and Abel's.
+    self.assertEqual(len(dot), len(ft._DotHeader(None)) + first.bytes +
+                     second.bytes + 1)
+    self.assertGreater(stats.seconds['ranking'], 0)
+    self.assertGreater(stats.seconds['emission'], 0)
+    self.assertIn('2 generations rendered (0 from cache)', str(stats))
+
+    with self.family.Instrument(profile=True, trace_memory=True) as stats:
+      self.family.ToDot()
+    self.assertTrue(all(g.cached for g in stats.generations))
+    self.assertGreater(stats.peak_memory, 0)
+    self.assertIn('function calls', str(stats))
+
+  def testInstrumentWhileTracingMemory(self):
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    tracemalloc.start()
+    self.addCleanup(tracemalloc.stop)
+    with self.family.Instrument(trace_memory=True) as stats:
+      self.family.ToDot()
+    self.assertGreater(stats.peak_memory, 0)
+    self.assertTrue(tracemalloc.is_tracing())
+
+    # Without tracemalloc.reset_peak(), as before Python 3.9.
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    if reset_peak:
+      del tracemalloc.reset_peak
+      self.addCleanup(setattr, tracemalloc, 'reset_peak', reset_peak)
+    with self.family.Instrument(trace_memory=True) as stats:
+      self.family.Person('Cain Smith', father='Adam Smith')
+      self.family.ToDot()
+    self.assertGreater(stats.peak_memory, 0)
+    self.assertTrue(tracemalloc.is_tracing())
+
+  def testIterDotYieldsOneChunkPerGeneration(self):
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    self.family.Person('Cain Smith', father='Adam Smith')
+    self.family.Person('Abel Smith', father='Adam Smith')
+    chunks = list(self.family.IterDot())
+    self.assertEqual(4, len(chunks))  # Header, 2 generations, closing brace.
+    self.assertTrue(chunks[0].startswith('digraph G {'))
+    self.assertIn('# Generation 1.', chunks[1])
+    self.assertIn('# Generation 2.', chunks[2])
+    self.assertEqual('}', chunks[3])
+    self.assertEqual(self.family.ToDot(), ''.join(chunks))
+    # Every DOT writer must implement IterDot().
+    self.assertRaises(TypeError, ft._DotWriter)
+
+  def testWriteDot(self):
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    self.family.Person('Cain Smith', father='Adam Smith', mother='Eve Smith')
+    fp = io.StringIO()
+    self.family.WriteDot(fp)
+    self.assertEqual(self.family.ToDot(), fp.getvalue())
+
+  def _MakeThreeGenerations(self):
+    self.family.Person('Adam Smith', wife='Eve Smith', father='Noah Smith')
+    self.family.Person('Cain Smith', father='Adam Smith', wife='Ada Lee')
+    self.family.Person('Abel Smith', father='Adam Smith')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+    self.family.Person('Irad Smith', father='Enoch Smith')
+    self.family.Person('Tom Jones', wife='Ann Jones')
+
+  def _Ids(self, view):
+    return sorted(p.ID() for p in view.people)
+
+  def testDescendants(self):
+    self._MakeThreeGenerations()
+    view = self.family.Descendants('Adam Smith', 2)
+    self.assertEqual(['AbelSmith', 'AdaLee', 'AdamSmith', 'CainSmith',
+                      'EnochSmith', 'EveSmith'], self._Ids(view))
+    self.assertEqual(['AbelSmith', 'AdamSmith', 'CainSmith', 'EnochSmith'],
+                     self._Ids(self.family.Descendants('AdamSmith', 2,
+                                                       spouses=False)))
+    generations = view.Sort()
+    self.assertEqual(3, len(generations))
+    self.assertEqual(['AdamSmith', 'EveSmith'], [p.ID() for p in generations[0]])
+
+    dot = view.ToDot()
+    self.assertIn('m_AdamSmith_EveSmith -> p_CainSmith', dot)
+    self.assertIn('m_CainSmith_AdaLee -> EnochSmith', dot)
+    self.assertNotIn('Noah', dot)
+    self.assertNotIn('Irad', dot)
+
+  def testAncestors(self):
+    self._MakeThreeGenerations()
+    self.family.Person('Noah Smith', wife='Naamah Smith')
+    self.assertEqual(['AdaLee', 'AdamSmith', 'CainSmith', 'EnochSmith',
+                      'EveSmith'],
+                     self._Ids(self.family.Ancestors('Enoch Smith', 2)))
+    self.assertEqual(['AdaLee', 'AdamSmith', 'CainSmith', 'EnochSmith',
+                      'EveSmith', 'NaamahSmith', 'NoahSmith'],
+                     self._Ids(self.family.Ancestors('Enoch Smith',
+                                                     spouses=True)))
+
+  def testNeighborhood(self):
+    self._MakeThreeGenerations()
+    self.assertEqual(['CainSmith'],
+                     self._Ids(self.family.Neighborhood('Cain Smith', 0)))
+    self.assertEqual(['AdaLee', 'AdamSmith', 'CainSmith', 'EnochSmith',
+                      'EveSmith'],
+                     self._Ids(self.family.Neighborhood('Cain Smith', 1)))
+
+  def testViewOfEveryoneRendersLikeFamily(self):
+    self._MakeThreeGenerations()
+    view = ft.FamilyView(self.family, self.family.people)
+    self.assertEqual(self.family.Sort(), view.Sort())
+    self.assertEqual(self.family.ToDot(), view.ToDot())
+
+  def testViewOfUnknownPerson(self):
+    with self.assertRaises(ValueError):
+      self.family.Descendants('Nobody', 1)
+
+  def testPaginate(self):
+    self._MakeThreeGenerations()
+    # Generation sizes are 1, 4 (incl. Tom and Ann), 3, 1 and 1.
+    pages = self.family.Paginate(5)
+    self.assertEqual([(1, 2), (3, 5)],
+                     [(p.first_generation, p.last_generation) for p in pages])
+    self.assertEqual([5, 5], [p.Size() for p in pages])
+
+    dot = pages[0].ToDot()
+    self.assertIn('c_AdamSmith [shape=note label="2 children\\n(page 2)"];',
+                  dot)
+    self.assertIn('AdamSmith -> c_AdamSmith', dot)
+    self.assertNotIn('Enoch', dot)
+
+    dot = pages[1].ToDot()
+    self.assertIn('# Generation 3.', dot)
+    self.assertIn('s_AdamSmith_EveSmith -> CainSmith', dot)
+    self.assertIn('s_AdamSmith_EveSmith -> AbelSmith', dot)
+    self.assertNotIn('Noah', dot)
+
+  def testPaginateOversizedGeneration(self):
+    self._MakeThreeGenerations()
+    pages = self.family.Paginate(1)
+    self.assertEqual(5, len(pages))
+    self.assertEqual(4, pages[1].Size())
+
+  def testWritePages(self):
+    self._MakeThreeGenerations()
+    with tempfile.TemporaryDirectory() as directory:
+      paths = self.family.WritePages(directory, 5)
+      self.assertEqual(2, len(paths))
+      with open(paths[1], encoding='utf-8') as fp:
+        self.assertEqual(self.family.Paginate(5)[1].ToDot(), fp.read())
+      with open(os.path.join(directory, 'index.tsv'), encoding='utf-8') as fp:
+        index = fp.read().splitlines()
+    self.assertEqual('id\tname\tgeneration\tpage', index[0])
+    self.assertIn('IradSmith\tIrad Smith\t5\t2', index)
+    self.assertEqual(11, len(index))
+
+  def testOverviewMaxDepth(self):
+    self._MakeThreeGenerations()
+    overview = self.family.Overview(max_depth=2)
+    self.assertEqual(['AdamSmith', 'AnnJones', 'EveSmith', 'NoahSmith',
+                      'TomJones'], self._Ids(overview))
+    dot = overview.ToDot()
+    # Ada Lee married in, so she isn't counted.
+    self.assertIn('d_AdamSmith [shape=note label="+4 descendants"];', dot)
+    self.assertIn('AdamSmith -> d_AdamSmith [style="dashed"];', dot)
+    self.assertNotIn('AdaLee', dot)
+    self.assertEqual(2, len(overview.Sort()))
+
+  def testOverviewMaxChildren(self):
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    for i in range(5):
+      self.family.Person(f'Child {i}', father='Adam Smith',
+                         wife=f'Wife {i}')
+      self.family.Person(f'Grandchild {i}', father=f'Child {i}')
+    overview = self.family.Overview(max_children=2)
+    self.assertEqual(['AdamSmith', 'Child0', 'Child1', 'EveSmith',
+                      'Grandchild0', 'Grandchild1', 'Wife0', 'Wife1'],
+                     self._Ids(overview))
+    self.assertEqual({'AdamSmith': (3, 6)},
+                     {p.ID(): s for p, s in overview.summaries.items()})
+    self.assertIn('d_AdamSmith [shape=note label="+3 more children\\n'
+                  '+3 of their descendants"];', overview.ToDot())
+
+  def testOverviewCountsChildrenUnderTheirLine(self):
+    self.family.Person('Ann Smith', father='John Smith', husband='Tom Brown')
+    self.family.Person('Tim Brown', father='Tom Brown', mother='Ann Smith')
+    overview = self.family.Overview(max_depth=2)
+    # Tim is counted under Ann, as Tom married into the family.
+    self.assertEqual({'AnnSmith': (1, 1)},
+                     {p.ID(): s for p, s in overview.summaries.items()})
+    self.assertEqual(['AnnSmith', 'JohnSmith', 'TomBrown'],
+                     self._Ids(overview))
+    overview = self.family.Overview(max_depth=1)
+    self.assertEqual(['JohnSmith'], self._Ids(overview))
+    self.assertEqual({'JohnSmith': (1, 2)},
+                     {p.ID(): s for p, s in overview.summaries.items()})
+
+  def testOverviewWithoutLimits(self):
+    self._MakeThreeGenerations()
+    overview = self.family.Overview()
+    self.assertEqual(self.family.Size(), overview.Size())
+    self.assertEqual({}, overview.summaries)
+    self.assertEqual(self.family.ToDot(), overview.ToDot())
+    self.assertRaises(ValueError, self.family.Overview, max_depth=0)
+    self.assertEqual(0, ft.Family().Overview(max_depth=1).Size())
+
+  def _MakeRelatives(self):
+    self.family.Person('Adam Smith', gender='M', wife='Eve Smith')
+    self.family.Person('Eve Smith', gender='F')
+    self.family.Person('Cain Smith', gender='M', father='Adam Smith',
+                       wife='Ada Lee')
+    self.family.Person('Abel Smith', gender='M', father='Adam Smith')
+    self.family.Person('Seth Smith', father='Adam Smith', mother='Lilith')
+    self.family.Person('Enoch Smith', gender='M', father='Cain Smith')
+    self.family.Person('Enos Smith', gender='F', father='Abel Smith')
+    self.family.Person('Irad Smith', father='Enoch Smith')
+    self.family.Person('Ada Lee', gender='F', father='Bob Lee')
+
+  def _Term(self, name, relative_name):
+    return self.family.Relationship(name, relative_name).term
+
+  def testRelationshipByBlood(self):
+    self._MakeRelatives()
+    self.assertEqual('great-grandfather',
+                     self._Term('Adam Smith', 'Irad Smith'))
+    self.assertEqual('great-grandchild',
+                     self._Term('Irad Smith', 'Adam Smith'))
+    self.assertEqual('brother', self._Term('Cain Smith', 'Abel Smith'))
+    self.assertEqual('half-brother', self._Term('Cain Smith', 'Seth Smith'))
+    self.assertEqual('half-sibling', self._Term('Seth Smith', 'Cain Smith'))
+    self.assertEqual('uncle', self._Term('Abel Smith', 'Enoch Smith'))
+    self.assertEqual('niece', self._Term('Enos Smith', 'Cain Smith'))
+    self.assertEqual('first cousin', self._Term('Enoch Smith', 'Enos Smith'))
+    self.assertEqual('first cousin once removed',
+                     self._Term('Irad Smith', 'Enos Smith'))
+
+    kinship = self.family.Relationship('Enoch Smith', 'EnosSmith')
+    self.assertEqual(0.125, kinship.coefficient)
+    self.assertEqual(['AdamSmith', 'EveSmith'],
+                     [p.ID() for p in kinship.common_ancestors])
+    self.assertEqual("Enoch Smith is Enos Smith's first cousin.", str(kinship))
+    self.assertEqual(0.25,
+                     self.family.Relationship('Cain Smith',
+                                              'Seth Smith').coefficient)
+
+  def testRelationshipByMarriage(self):
+    self._MakeRelatives()
+    kinship = self.family.Relationship('Ada Lee', 'Cain Smith')
+    self.assertEqual('wife', kinship.term)
+    self.assertEqual(0, kinship.coefficient)
+    self.assertEqual('husband', self._Term('Cain Smith', 'Ada Lee'))
+    self.assertEqual('daughter-in-law', self._Term('Ada Lee', 'Adam Smith'))
+    self.assertEqual('father-in-law', self._Term('Adam Smith', 'Ada Lee'))
+    self.assertEqual('father-in-law', self._Term('Bob Lee', 'Cain Smith'))
+    self.assertEqual('brother-in-law', self._Term('Abel Smith', 'Ada Lee'))
+    self.assertIsNone(self.family.Relationship('Bob Lee', 'Abel Smith'))
+
+  def testRelationshipByRemarriage(self):
+    self._MakeRelatives()
+    # Enoch Smith's mother is his father's first wife, Ada Lee, and Seth
+    # Smith's mother isn't Adam Smith's wife.
+    self.family.Person('Cain Smith', wife='Zillah Lee')
+    self.family.Person('Zillah Lee', gender='F')
+    self.assertEqual('mother', self._Term('Ada Lee', 'Enoch Smith'))
+    self.assertEqual('stepmother', self._Term('Zillah Lee', 'Enoch Smith'))
+    self.assertEqual('stepson', self._Term('Enoch Smith', 'Zillah Lee'))
+    self.assertEqual('stepchild', self._Term('Seth Smith', 'Eve Smith'))
+    self.assertEqual('stepmother', self._Term('Eve Smith', 'Seth Smith'))
+    self.assertEqual('step-grandmother',
+                     self._Term('Zillah Lee', 'Irad Smith'))
+    self.assertEqual('step-grandchild', self._Term('Irad Smith', 'Zillah Lee'))
+    self.assertEqual(0, self.family.Relationship('Zillah Lee',
+                                                 'Enoch Smith').coefficient)
+    # Blood relatives of a spouse that aren't their descendants are in-laws.
+    self.assertEqual('daughter-in-law', self._Term('Zillah Lee', 'Eve Smith'))
+
+  def testRelationshipSeesNewRelatives(self):
+    self._MakeRelatives()
+    self.assertIsNone(self.family.Relationship('Bob Lee', 'Enos Smith'))
+    self.family.Person('Abel Smith', wife='Ann Lee')
+    self.family.Person('Enos Smith', mother='Ann Lee')
+    self.family.Person('Ann Lee', father='Bob Lee')
+    self.assertEqual('granddaughter', self._Term('Enos Smith', 'Bob Lee'))
+    self.assertEqual('sister', self._Term('Ann Lee', 'Ada Lee'))
+    self.assertEqual('sister-in-law', self._Term('Ann Lee', 'Cain Smith'))
+
+  def testRelationshipInDeepFamily(self):
+    for i in range(1, 5000):
+      self.family.Person(f'P{i}', father=f'P{i - 1}')
+    self.assertEqual('great-' * 4997 + 'grandfather',
+                     self._Term('P0', 'P4999'))
+
+  def testKinshipTerms(self):
+    self.assertEqual('third cousin twice removed',
+                     ft._GetKinshipTerm(6, 4, False, 'M'))
+    self.assertEqual('12th cousin 3 times removed',
+                     ft._GetKinshipTerm(13, 16, False, None))
+    self.assertEqual('great-great-aunt', ft._GetKinshipTerm(1, 4, False, 'F'))
+    self.assertEqual('half-nephew/niece', ft._GetKinshipTerm(2, 1, True, None))
+
+  def _SaveAndLoad(self, family):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'family.bin')
+      family.Save(path)
+      return ft.Family.Load(path)
+
+  def testSaveAndLoad(self):
+    self.family = ft.Family(rankdir='LR')
+    self._MakeRelatives()
+    self.family.Person('Adam Smith', annotation='亚当', birth='1900',
+                       death='1980')
+    self.family.Person('Eve Smith', death='?')
+    loaded = self._SaveAndLoad(self.family)
+
+    self.assertEqual(self.family.ToDot(), loaded.ToDot())
+    self.assertEqual([p.ID() for p in self.family.people],
+                     [p.ID() for p in loaded.people])
+    adam = loaded.PersonByName('Adam Smith')
+    self.assertEqual('亚当', adam.annotation)
+    self.assertEqual(['CainSmith', 'AbelSmith', 'SethSmith'],
+                     [p.ID() for p in adam.Children()])
+    self.assertIn(loaded.PersonByName('Eve Smith'), adam.Wives())
+    self.assertEqual('first cousin',
+                     loaded.Relationship('Enoch Smith', 'Enos Smith').term)
+
+    # The loaded family can grow like the original.
+    for family in (self.family, loaded):
+      family.Person('Jabal Smith', father='Enos Smith', mother='Zillah')
+      family.Person('Noah Smith', wife='Naamah')
+      family.Person('Adam Smith', father='Noah Smith')
+    self.assertEqual(self.family.ToDot(), loaded.ToDot())
+
+  def testSaveAndLoadConflicts(self):
+    self.family.Person('Adam Smith', father='Bob Smith')
+    self.family.Person('Carl Smith', father='Adam Smith', wife='Bob Smith')
+    self.assertEqual(1, len(self.family.GenerationConflicts()))
+    loaded = self._SaveAndLoad(self.family)
+    self.assertEqual([str(c) for c in self.family.GenerationConflicts()],
+                     [str(c) for c in loaded.GenerationConflicts()])
+
+  def testSaveAndLoadEmptyFamily(self):
+    self.assertEqual(0, self._SaveAndLoad(self.family).Size())
+
+  def testLoadRejectsOtherFiles(self):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'family.dot')
+      self.family.Person('Adam Smith')
+      with open(path, 'w') as fp:
+        self.family.WriteDot(fp)
+      with self.assertRaises(ValueError):
+        ft.Family.Load(path)
+
   def testDisplayName(self):
     h = self.family.Person('王 大明', wife='李幺妹')
     w = self.family.Person('李 幺妹', husband='王大明')
@@ -205,5 +791,84 @@ class FamilyTreeTest(unittest.TestCase):
     self.assertEqual('李 幺妹', w.Name())
     self.assertEqual(2, self.family.Size())
 
+  def testConcurrentReaders(self):
+    for i in range(50):
+      self.family.Person(f'Son {i}', father=f'Father {i // 5}',
+                         mother=f'Mother {i // 5}')
+    expected = ft.Family()
+    expected.AddMany({'name': f'Son {i}', 'father': f'Father {i // 5}',
+                      'mother': f'Mother {i // 5}'} for i in range(50))
+    expected_dot = expected.ToDot()
+
+    # Nothing is sorted yet, so the threads race to update the caches.
+    dots = []
+    def Render():
+      for _ in range(5):
+        dots.append(self.family.ToDot())
+        self.family.PersonByName('Son 7').Generation()
+    threads = [threading.Thread(target=Render) for _ in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual([expected_dot] * 40, dots)
+
+  def testReadersSeeWholeEdits(self):
+    edits = [{'name': f'Child {i}', 'father': f'Parent {i}',
+              'wife': f'Wife {i}'} for i in range(20)]
+    # The DOT after each number of edits.
+    expected = set()
+    for i in range(len(edits) + 1):
+      family = ft.Family()
+      family.AddMany(edits[:i])
+      expected.add(family.ToDot())
+
+    def Edit():
+      for edit in edits:
+        with self.family.Writing():
+          attribs = dict(edit)
+          # Each edit takes several steps, which readers mustn't see apart.
+          person = self.family.Person(attribs.pop('name'))
+          for name, value in attribs.items():
+            person.Update(**{name: value})
+    dots = []
+    def Render():
+      for _ in range(20):
+        with self.family.Reading():
+          dots.append(self.family.ToDot())
+    threads = [threading.Thread(target=Edit)]
+    threads.extend(threading.Thread(target=Render) for _ in range(4))
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(80, len(dots))
+    self.assertLessEqual(set(dots), expected)
+    self.assertIn(self.family.ToDot(), expected)
+
+  def testReadWriteLockNesting(self):
+    with self.family.Writing():
+      with self.family.Writing():
+        with self.family.Reading():
+          self.family.Person('Ann')
+    with self.family.Reading():
+      with self.family.Reading():
+        self.assertEqual(1, self.family.Size())
+      with self.assertRaises(RuntimeError):
+        with self.family.Writing():
+          pass
+
+  def testWriterExcludesReaders(self):
+    read = threading.Event()
+    def Read():
+      with self.family.Reading():
+        read.set()
+    with self.family.Writing():
+      reader = threading.Thread(target=Read)
+      reader.start()
+      self.assertFalse(read.wait(0.1))
+    reader.join()
+    self.assertTrue(read.is_set())
+
 if __name__ == '__main__':
   unittest.main()
\ No newline at end of file
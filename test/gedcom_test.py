@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import sys
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import gedcom
+
+_GEDCOM = """0 HEAD
+1 CHAR UTF-8
+0 @F1@ FAM
+1 HUSB @I1@
+1 WIFE @I2@
+1 CHIL @I3@
+1 CHIL @I4@
+0 @I1@ INDI
+1 NAME John /Smith/
+1 SEX M
+1 BIRT
+2 DATE 1900
+1 DEAT
+2 DATE 1970
+0 @I2@ INDI
+1 NAME Ada /Smith/
+1 SEX F
+1 DEAT Y
+0 @I3@ INDI
+1 NAME Tom /Smith/
+1 NICK Tommy
+1 SEX M
+1 BIRT
+2 DATE 12 MAR 1930
+0 @I4@ INDI
+1 NAME John /Smith/
+1 SEX M
+0 TRLR
+"""
+
+class GedcomTest(unittest.TestCase):
+
+  def testRead(self):
+    result = gedcom.Read(io.StringIO(_GEDCOM))
+    self.assertEqual(4, result.individuals)
+    self.assertEqual(1, result.families)
+    self.assertGreater(result.records_per_second, 0)
+
+    family = result.family
+    self.assertEqual(4, family.Size())
+    john = family.PersonByName('John Smith')
+    ada = family.PersonByName('Ada Smith')
+    tom = family.PersonByName('Tom Smith')
+    self.assertEqual('M', john.Gender())
+    self.assertEqual('1900', john.Birth())
+    self.assertEqual('1970', john.Death())
+    self.assertEqual('F', ada.Gender())
+    self.assertIsNone(ada.Death())
+    self.assertTrue(ada.Deceased())
+    self.assertEqual('12 MAR 1930', tom.Birth())
+    self.assertFalse(tom.Deceased())
+    self.assertEqual([ada], list(john.Wives()))
+    self.assertEqual(john, tom.Father())
+    self.assertEqual(ada, tom.Mother())
+
+  def testSameNameGetsDistinctIds(self):
+    family = gedcom.Read(io.StringIO(_GEDCOM)).family
+    john, junior = family.people[0], family.people[3]
+    self.assertEqual('JohnSmith', john.ID())
+    self.assertEqual('JohnSmith_I4', junior.ID())
+    self.assertEqual('John Smith', junior.Name())
+    self.assertEqual([family.people[2], junior], list(john.Children()))
+
+  def testReadIntoExistingFamily(self):
+    family = ft.Family()
+    family.Person('Ada Smith', father='Bob Jones')
+    gedcom.Read(io.StringIO(_GEDCOM), family)
+    self.assertEqual(6, family.Size())
+    self.assertEqual('AdaSmith_I2', family.people[3].ID())
+    # The imported Ada is not the Ada who was already in the family.
+    self.assertEqual([family.people[3]], list(family.people[2].Wives()))
+    self.assertEqual(0, len(family.people[0].Husbands()))
+
+  def testReadTwice(self):
+    family = gedcom.Read(io.StringIO(_GEDCOM)).family
+    gedcom.Read(io.StringIO(_GEDCOM), family)
+    self.assertEqual(8, family.Size())
+    self.assertEqual(8, len(family.id_to_person))
+    self.assertEqual(['JohnSmith_I1', 'AdaSmith_I2', 'TomSmith_I3',
+                      'JohnSmith_I4_2'],
+                     [p.ID() for p in family.people[4:]])
+    dot = family.ToDot()
+    self.assertEqual(1, dot.count('\tJohnSmith_I4 ['))
+    self.assertEqual(1, dot.count('\tJohnSmith_I4_2 ['))
+
+  def testImportedFamilyRenders(self):
+    family = gedcom.Read(io.StringIO(_GEDCOM)).family
+    dot = family.ToDot()
+    self.assertIn('m_JohnSmith_AdaSmith -> p_TomSmith', dot)
+    self.assertIn('label="Tom Smith (Tommy)', dot)
+
+if __name__ == '__main__':
+  unittest.main()
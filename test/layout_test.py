@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+import xml.etree.ElementTree as ET
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import layout
+
+_SVG = '{http://www.w3.org/2000/svg}'
+
+class LayoutTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('Adam Smith', wife=('Eve Smith', 'Lilith'),
+                       birth='1900')
+    self.family.Person('Cain Smith', father='Adam Smith', mother='Eve Smith',
+                       wife='Ada Lee')
+    self.family.Person('Abel Smith', father='Adam Smith', mother='Eve Smith',
+                       death='?')
+    self.family.Person('Seth Smith', father='Adam Smith', mother='Lilith',
+                       annotation='塞特')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+    self.family.Person('Tom <Jones>', wife='Ann Jones')
+
+  def _AssertNoOverlaps(self, result):
+    for row in result.rows:
+      for left, right in zip(row, row[1:]):
+        self.assertLessEqual(left.x + left.width / 2,
+                             right.x - right.width / 2)
+
+  def testRowsFollowGenerations(self):
+    result = layout.Layout(self.family)
+    for i, gen in enumerate(self.family.Sort()):
+      self.assertEqual(gen, [n.person for n in result.rows[i] if n.person])
+    adam = result.Position(self.family.PersonByName('Adam Smith'))
+    cain = result.Position(self.family.PersonByName('Cain Smith'))
+    enoch = result.Position(self.family.PersonByName('Enoch Smith'))
+    self.assertLess(adam[1], cain[1])
+    self.assertLess(cain[1], enoch[1])
+    self._AssertNoOverlaps(result)
+
+  def testMarriagesAndChildren(self):
+    result = layout.Layout(self.family)
+    adam = self.family.PersonByName('Adam Smith')
+    eve = self.family.PersonByName('Eve Smith')
+    lilith = self.family.PersonByName('Lilith')
+    # Each wife has her own diamond, between the husband and her.
+    first = result.marriages[(adam, eve)]
+    second = result.marriages[(adam, lilith)]
+    self.assertLess(result.Position(adam)[0], first.x)
+    self.assertLess(first.x, result.Position(eve)[0])
+    self.assertLess(second.x, result.Position(lilith)[0])
+
+    # Cain and Abel are centered under Adam and Eve's diamond, and Seth is
+    # under Adam and Lilith's.
+    children = result.children[first]
+    self.assertEqual(['CainSmith', 'AbelSmith'],
+                     [c.person.ID() for c in children])
+    self.assertEqual(first.x, (children[0].x + children[-1].x) / 2)
+    self.assertEqual(['SethSmith'],
+                     [c.person.ID() for c in result.children[second]])
+
+  def testSingleParent(self):
+    self.family.Person('Irad Smith', father='Enoch Smith')
+    result = layout.Layout(self.family)
+    enoch = self.family.PersonByName('Enoch Smith')
+    irad = self.family.PersonByName('Irad Smith')
+    self.assertEqual([result.nodes[irad]], result.children[result.nodes[enoch]])
+    self.assertEqual(result.Position(enoch)[0], result.Position(irad)[0])
+
+  def testParentsMoveOverChildren(self):
+    # Bob's only child is pushed right by Adam's grandchildren, so Bob
+    # follows.
+    self.family.Person('Bob Lee', wife='Amy Lee')
+    self.family.Person('Cy Lee', father='Bob Lee', mother='Amy Lee')
+    result = layout.Layout(self.family)
+    bob = self.family.PersonByName('Bob Lee')
+    amy = self.family.PersonByName('Amy Lee')
+    cy = result.Position(self.family.PersonByName('Cy Lee'))
+    self.assertEqual(cy[0], result.marriages[(bob, amy)].x)
+    self._AssertNoOverlaps(result)
+
+  def testSvg(self):
+    svg = ET.fromstring(layout.Layout(self.family).ToSvg())
+    ids = [g.get('id') for g in svg.iter(_SVG + 'g') if g.get('id')]
+    self.assertEqual(sorted(p.ID() for p in self.family.people), sorted(ids))
+    texts = [t.text for t in svg.iter(_SVG + 'text')]
+    self.assertIn('Tom <Jones>', texts)
+    self.assertIn('Seth Smith (塞特)', texts)
+    self.assertIn('1900-', texts)
+
+  def testView(self):
+    view = self.family.Descendants('Cain Smith')
+    result = layout.Layout(view)
+    self.assertEqual(sorted(p.ID() for p in view.people),
+                     sorted(n.person.ID() for n in result.nodes.values()))
+    ET.fromstring(result.ToSvg())
+
+  def testEmptyFamily(self):
+    result = layout.Layout(ft.Family())
+    ET.fromstring(result.ToSvg())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import random
+import sys
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import lifespans
+
+class LifespansTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('Adam Smith', birth='1900', death='12 MAR 1970')
+    self.family.Person('Eve Smith', birth='ABT 1905', death='?')
+    self.family.Person('Cain Smith', birth='1930-01-02')  # Still alive.
+    self.family.Person('Abel Smith', birth='?', death='1950')
+    self.family.Person('Seth Smith', birth='1935', death='1936')
+
+  def Ids(self, people):
+    return [p.ID() for p in people]
+
+  def testGetLifespan(self):
+    def Lifespan(id):
+      return lifespans.GetLifespan(self.family.id_to_person[id])
+    self.assertEqual((1900, 1970), Lifespan('AdamSmith'))
+    self.assertIsNone(Lifespan('EveSmith'))  # Died at an unknown date.
+    self.assertEqual((1930, lifespans._END_OF_TIME), Lifespan('CainSmith'))
+    self.assertIsNone(Lifespan('AbelSmith'))  # Born at an unknown date.
+    self.assertEqual((1935, 1936), Lifespan('SethSmith'))
+
+  def testAliveIn(self):
+    self.assertEqual([], self.family.AliveIn(1899))
+    self.assertEqual(['AdamSmith'], self.Ids(self.family.AliveIn(1900)))
+    self.assertEqual(['AdamSmith', 'CainSmith', 'SethSmith'],
+                     self.Ids(self.family.AliveIn(1936)))
+    self.assertEqual(['AdamSmith', 'CainSmith'],
+                     self.Ids(self.family.AliveIn(1970)))
+    self.assertEqual(['CainSmith'], self.Ids(self.family.AliveIn(2024)))
+    self.assertEqual(['CainSmith'], self.Ids(self.family.AliveIn(99999)))
+    self.assertEqual([], self.family.AliveIn(-1))
+
+  def testAliveBetween(self):
+    self.assertEqual(['AdamSmith', 'CainSmith', 'SethSmith'],
+                     self.Ids(self.family.AliveBetween(1920, 1935)))
+    self.assertEqual(['AdamSmith'],
+                     self.Ids(self.family.AliveBetween(0, 1929)))
+    self.assertEqual(['CainSmith'],
+                     self.Ids(self.family.AliveBetween(1971, 3000)))
+    self.assertEqual([], self.family.AliveBetween(1950, 1940))
+
+  def testIndexFollowsChanges(self):
+    self.assertEqual(['AdamSmith'], self.Ids(self.family.AliveIn(1910)))
+    self.family.Person('Eve Smith', death='1960')
+    self.family.Person('Cain Smith', death='1940')
+    self.family.Person('Enoch Smith', birth='1908')
+    self.family.Person('Adam Smith', birth='?')
+    self.assertEqual(['EveSmith', 'EnochSmith'],
+                     self.Ids(self.family.AliveIn(1910)))
+    self.assertEqual(['EveSmith', 'CainSmith', 'EnochSmith'],
+                     self.Ids(self.family.AliveIn(1940)))
+    self.assertEqual(['EveSmith', 'EnochSmith'],
+                     self.Ids(self.family.AliveIn(1941)))
+    # The death of a spouse.
+    self.family.Person('Enoch Smith', wife='Ada Lee')
+    self.family.Person('Ada Lee', spouse_death='1939')
+    self.assertEqual(['EveSmith', 'CainSmith'],
+                     self.Ids(self.family.AliveIn(1940)))
+
+  def testMatchesScan(self):
+    family = ft.Family()
+    rng = random.Random(0)
+    for i in range(300):
+      birth = rng.choice(['?', None, str(rng.randint(1800, 2000))])
+      death = rng.choice(['?', None, str(rng.randint(1800, 2050))])
+      family.Person(f'Person {i}', birth=birth, death=death)
+      if i == 100:
+        family.AliveIn(1900)  # The rest are added to the index.
+
+    def Scan(first, last):
+      people = []
+      for p in family.people:
+        lifespan = lifespans.GetLifespan(p)
+        if lifespan and lifespan[0] <= last and lifespan[1] >= first:
+          people.append(p)
+      return people
+
+    for _ in range(100):
+      first = rng.randint(1750, 2100)
+      last = first + rng.choice([0, 0, 1, 20, 100])
+      self.assertEqual(Scan(first, last), family.AliveBetween(first, last))
+      self.assertEqual(Scan(first, first), family.AliveIn(first))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import merge
+
+class MergeTest(unittest.TestCase):
+
+  def testNormalizeName(self):
+    self.assertEqual('jose garcia', ft._NormalizeName('  José  García. '))
+    self.assertEqual('zhang san', ft._NormalizeName('Zhang-San'))
+    self.assertEqual('张三', ft._NormalizeName('张三'))
+
+  def testSoundex(self):
+    self.assertEqual('r163', merge._Soundex('robert'))
+    self.assertEqual('r163', merge._Soundex('rupert'))
+    self.assertEqual('a261', merge._Soundex('ashcraft'))
+    self.assertEqual('l000', merge._Soundex('lee'))
+    self.assertEqual('张三', merge._Soundex('张三'))
+
+  def testMergesTheSamePeople(self):
+    family = ft.Family()
+    family.Person('John Smith', birth='1900', wife='Mary Smith')
+    family.Person('Ann Smith', father='John Smith', mother='Mary Smith')
+
+    other = ft.Family()
+    other.Person('Jon Smith', birth='1900', death='1960', wife='Mary Smith')
+    other.Person('Ann Smith', father='Jon Smith', mother='Mary Smith',
+                 birth='1925', husband='Tom Brown')
+    other.Person('Tim Brown', father='Tom Brown', mother='Ann Smith')
+
+    result = family.Merge(other)
+    self.assertEqual(
+        [('AnnSmith', 'AnnSmith'), ('JohnSmith', 'JonSmith'),
+         ('MarySmith', 'MarySmith')],
+        sorted((p.ID(), q.ID()) for p, q, _ in result.matches))
+    self.assertEqual(['TomBrown', 'TimBrown'],
+                     [p.ID() for p in result.added])
+    self.assertEqual([], result.conflicts)
+    self.assertEqual(5, family.Size())
+
+    john = family.id_to_person['JohnSmith']
+    self.assertEqual('John Smith', john.Name())  # The family's name wins.
+    self.assertEqual('1960', john.Death())
+    ann = family.id_to_person['AnnSmith']
+    self.assertEqual('1925', ann.Birth())
+    self.assertEqual(['TomBrown'], [h.ID() for h in ann.Husbands()])
+    tim = family.id_to_person['TimBrown']
+    self.assertIs(ann, tim.Mother())
+    self.assertEqual(['JohnSmith', 'MarySmith', 'TomBrown', 'AnnSmith',
+                      'TimBrown'],
+                     [p.ID() for gen in family.Sort() for p in gen])
+
+  def testKeepsDifferentPeopleApart(self):
+    family = ft.Family()
+    family.Person('John Smith', birth='1900')
+    family.Person('Jane Doe', gender='F')
+
+    other = ft.Family()
+    other.Person('John Smith', birth='1950')  # Too far apart.
+    other.Person('Jane Doe', gender='M')
+    other.Person('Jake Smith')  # A different name.
+
+    result = family.Merge(other)
+    self.assertEqual([], result.matches)
+    self.assertEqual(['JohnSmith_2', 'JaneDoe_2', 'JakeSmith'],
+                     [p.ID() for p in result.added])
+    self.assertEqual('John Smith', family.id_to_person['JohnSmith_2'].Name())
+    self.assertEqual('1950', family.id_to_person['JohnSmith_2'].Birth())
+
+  def testEachPersonIsMatchedOnce(self):
+    family = ft.Family()
+    family.Person('Ann Lee', birth='1900')
+
+    other = ft.Family()
+    # Two people with the same name, as imported from GEDCOM.
+    other._AddPerson('Ann Lee', 'AnnLee1')
+    other._AddPerson('Ann Lee', 'AnnLee2').Update(birth='1900')
+
+    result = family.Merge(other)
+    # The one with the same birth year is the better match.
+    self.assertEqual([('AnnLee', 'AnnLee2')],
+                     [(p.ID(), q.ID()) for p, q, _ in result.matches])
+    self.assertEqual(['AnnLee1'], [p.ID() for p in result.added])
+
+  def testThreshold(self):
+    family = ft.Family()
+    family.Person('Jon Smith')
+    other = ft.Family()
+    other.Person('John Smith')
+    # Similar names alone aren't enough by default.
+    self.assertEqual([], merge.FindMatches(family, other))
+    self.assertEqual(1, len(merge.FindMatches(family, other, threshold=0.9)))
+
+  def testReportsConflictingParents(self):
+    family = ft.Family()
+    family.Person('Ann Smith', birth='1925', father='John Smith')
+
+    other = ft.Family()
+    other.Person('Ann Smith', birth='1925', father='Bob Jones')
+
+    result = family.Merge(other)
+    self.assertEqual(['AnnSmith has father JohnSmith, not BobJones'],
+                     result.conflicts)
+    self.assertEqual('JohnSmith', family.id_to_person['AnnSmith'].Father().ID())
+    self.assertEqual('Matched 1 people, added 1, 1 conflicting relationships '
+                     'left out.', str(result))
+
+  def testKeepsChildrenWithoutParentAttributes(self):
+    family = ft.Family()
+    family.Person('John Smith', birth='1900', gender='M')
+    family.Person('Ann Smith', birth='1925', father='Bob Jones')
+
+    other = ft.Family()
+    john = other.Person('John Smith', birth='1900')
+    for name in ('Tom Smith', 'Ann Smith'):
+      john.AddChild(other.Person(name, birth='1925'))
+    self.assertIsNone(other.id_to_person['TomSmith'].Father())
+
+    result = family.Merge(other)
+    john = family.id_to_person['JohnSmith']
+    self.assertEqual(['TomSmith'], [c.ID() for c in john.Children()])
+    self.assertIs(john, family.id_to_person['TomSmith'].Father())
+    self.assertEqual(['AnnSmith has father BobJones, not JohnSmith'],
+                     result.conflicts)
+
+  def testKeepsSpouseDeath(self):
+    family = ft.Family()
+    family.Person('John Smith', birth='1900', wife='Mary Smith')
+
+    other = ft.Family()
+    other.Person('John Smith', birth='1900', spouse_death='Y',
+                 wife='Mary Smith')
+
+    family.Merge(other)
+    self.assertEqual('Y', family.id_to_person['JohnSmith'].spouse_death)
+    self.assertTrue(family.id_to_person['MarySmith'].Deceased())
+    # As for spouse_death set with Person(), later wives are deceased too.
+    self.assertTrue(family.Person('John Smith', wife='Jane Doe')
+                    .Wives()[-1].Deceased())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import render
+
+class RenderTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    self.family.Person('Cain Smith', father='Adam Smith')
+    self.family.Person('Abel Smith', father='Adam Smith')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def _FakeDot(self, body):
+    """Writes a Python script that stands in for graphviz."""
+
+    path = os.path.join(self.directory.name, 'fake_dot')
+    with open(path, 'w') as fp:
+      fp.write(f'#!{sys.executable}\nimport sys, time\n{body}\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+  def testWritesDotOnly(self):
+    jobs = render.Render(self.family, self.directory.name, format=None)
+    self.assertEqual(1, len(jobs))
+    self.assertTrue(jobs[0].ok)
+    self.assertIsNone(jobs[0].output_path)
+    with open(jobs[0].dot_path, encoding='utf-8') as fp:
+      self.assertEqual(self.family.ToDot(), fp.read())
+
+  def testWritesPagesInParallel(self):
+    jobs = render.Render(self.family, self.directory.name, max_people=2,
+                         format=None, workers=2)
+    pages = self.family.Paginate(2)
+    self.assertEqual(len(pages), len(jobs))
+    for page, job in zip(pages, jobs):
+      self.assertEqual(f'page_{page.number:03d}', job.name)
+      with open(job.dot_path, encoding='utf-8') as fp:
+        self.assertEqual(page.ToDot(), fp.read())
+
+  def testWritesInProcessWhileThreadsRun(self):
+    # Forking now could copy a lock held by the other thread.
+    done = threading.Event()
+    thread = threading.Thread(target=done.wait)
+    thread.start()
+    try:
+      self.assertIsNone(render._GetProcessPool(2, []))
+      jobs = render.Render(self.family, self.directory.name, max_people=2,
+                           format=None, workers=2)
+    finally:
+      done.set()
+      thread.join()
+    for page, job in zip(self.family.Paginate(2), jobs):
+      with open(job.dot_path, encoding='utf-8') as fp:
+        self.assertEqual(page.ToDot(), fp.read())
+
+  @unittest.skipIf(os.name != 'posix', 'needs an executable script')
+  def testRunsGraphviz(self):
+    # Copies the input to the output, like `dot -Tdot` would (roughly).
+    dot = self._FakeDot(
+        'open(sys.argv[4], "w").write(open(sys.argv[2]).read())')
+    jobs = render.Render(self.family, self.directory.name, max_people=2,
+                         format='dot2', dot=dot, workers=2)
+    for job in jobs:
+      self.assertTrue(job.ok, job.error)
+      self.assertTrue(job.output_path.endswith('.dot2'))
+      with open(job.output_path, encoding='utf-8') as fp:
+        self.assertTrue(fp.read().startswith('digraph G {'))
+      self.assertGreater(job.render_seconds, 0)
+
+  @unittest.skipIf(os.name != 'posix', 'needs an executable script')
+  def testReportsGraphvizFailures(self):
+    dot = self._FakeDot('sys.exit("bad input")')
+    job, = render.Render(self.family, self.directory.name, dot=dot)
+    self.assertEqual('exit status 1: bad input', job.error)
+    self.assertIn('FAILED', str(job))
+
+    dot = self._FakeDot('time.sleep(10)')
+    job, = render.Render(self.family, self.directory.name, dot=dot,
+                         timeout=0.2)
+    self.assertEqual('timed out after 0.2s', job.error)
+
+    job, = render.Render(self.family, self.directory.name,
+                         dot=os.path.join(self.directory.name, 'no_dot'))
+    self.assertTrue(job.error.endswith('not found'))
+
+if __name__ == '__main__':
+  unittest.main()
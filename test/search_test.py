@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import search
+
+class SearchTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('John Smith', wife='Mary Smith')
+    self.family.Person('Johnny Smithers')
+    self.family.Person('José García')
+    self.family.Person('张三丰', father='张三')
+
+  def Search(self, query, **kwargs):
+    return [p.ID() for p in self.family.Search(query, **kwargs)]
+
+  def testIsOneEditApart(self):
+    self.assertTrue(search._IsOneEditApart('john', 'jon'))
+    self.assertTrue(search._IsOneEditApart('john', 'johan'))
+    self.assertTrue(search._IsOneEditApart('john', 'joan'))
+    self.assertTrue(search._IsOneEditApart('john', 'jhon'))
+    self.assertTrue(search._IsOneEditApart('john', 'ojhn'))
+    self.assertFalse(search._IsOneEditApart('john', 'john'))
+    self.assertFalse(search._IsOneEditApart('john', 'jo'))
+    self.assertFalse(search._IsOneEditApart('john', 'hojn'))
+    self.assertFalse(search._IsOneEditApart('john', 'jane'))
+
+  def testExactMatchesComeFirst(self):
+    self.assertEqual(['JohnSmith', 'MarySmith', 'JohnnySmithers'],
+                     self.Search('smith'))
+    self.assertEqual(['JohnSmith'], self.Search('smith', limit=1))
+
+  def testPrefixes(self):
+    self.assertEqual(['JohnSmith', 'JohnnySmithers'], self.Search('jo sm'))
+    self.assertEqual(['JohnnySmithers'], self.Search('smithe', fuzzy=False))
+    # Smith is one typo away, which ranks below a prefix.
+    self.assertEqual(['JohnnySmithers', 'JohnSmith', 'MarySmith'],
+                     self.Search('smithe'))
+    self.assertEqual([], self.Search('ohn'))
+
+  def testTypos(self):
+    self.assertEqual(['JohnSmith'], self.Search('Jhon Smiht'))
+    self.assertEqual([], self.Search('Jhon Smiht', fuzzy=False))
+    # Too short to guess.
+    self.assertEqual([], self.Search('Jhn'))
+
+  def testAccentsAndCase(self):
+    self.assertEqual(['JoséGarcía'], self.Search('jose GARCIA'))
+    self.assertEqual(['JoséGarcía'], self.Search('García'))
+    self.assertTrue(ft._IsAscii('John Smith'))
+    self.assertFalse(ft._IsAscii('José'))
+
+  def testChineseCharacters(self):
+    self.assertEqual(['张三', '张三丰'], self.Search('张三'))
+    self.assertEqual(['张三丰'], self.Search('丰'))
+    self.assertEqual(['张三丰'], self.Search('三丰'))
+
+  def testIndexFollowsChanges(self):
+    self.assertEqual([], self.Search('ada'))
+    self.family.Person('Ada Lovelace', father='John Smith')
+    self.assertEqual(['AdaLovelace'], self.Search('ada'))
+    self.family.Person('Ada Lovelace').Update(name='Ada King')
+    self.assertEqual([], self.Search('lovelace'))
+    self.assertEqual(['AdaLovelace'], self.Search('ada king'))
+    self.assertEqual(['JohnnySmithers'], self.Search('johnny'))
+
+  def testManyPrefixMatches(self):
+    letters = 'abcdefg'
+    for a in letters:
+      for b in letters:
+        for c in letters:
+          self.family.Person(f'Annabelle Smitha{a}{b}{c}')
+    # More words start with smith than a prefix matches, so the longest are
+    # left out, rather than the last in alphabetical order.
+    self.assertGreater(len(letters)**3, search._MAX_PREFIX_WORDS)
+    self.assertEqual(['JohnSmith', 'MarySmith', 'JohnnySmithers'],
+                     self.Search('smith', limit=3, fuzzy=False))
+    self.assertEqual(['JohnnySmithers'], self.Search('smith johnny'))
+
+  def testManyCandidates(self):
+    letters = 'abcdefghijk'
+    for a in letters:
+      for b in letters:
+        for c in letters:
+          self.family.Person(f'Johnson {a}{b}{c}')
+    self.family.Person('John Doe')
+    # More people start with john than are ranked, so the exact matches are
+    # ranked first, even when added last.
+    self.assertGreater(len(letters)**3, search._MAX_CANDIDATES)
+    self.assertEqual(['JohnDoe', 'JohnSmith', 'Johnsonaaa'],
+                     self.Search('john', limit=3))
+    self.assertEqual(['JohnDoe'], self.Search('john doe', limit=1))
+    self.assertEqual(['Johnsonaaa', 'Johnsonaab'],
+                     self.Search('johnson', limit=2))
+    self.assertEqual(5, len(self.Search('j', limit=5)))
+    self.family.Person('John Doe').Update(name='Jack Doe')
+    self.family.Person('Johnson aaa').Update(name='Jack Aaa')
+    self.assertEqual(['Johnsonaab'], self.Search('johnson', limit=1))
+    self.assertEqual(['JohnDoe'], self.Search('jack doe'))
+
+  def testEmptyQuery(self):
+    self.assertEqual([], self.Search(''))
+    self.assertEqual([], self.Search('?!'))
+    self.assertEqual([], ft.Family().Search('john'))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import os
+import stat
+import sys
+import tempfile
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+from source import service
+
+def _Run(coroutine):
+  """Runs `coroutine` in a new event loop, like asyncio.run() in 3.7+."""
+
+  loop = asyncio.new_event_loop()
+  asyncio.set_event_loop(loop)  # For the subprocess child watcher.
+  try:
+    return loop.run_until_complete(coroutine)
+  finally:
+    asyncio.set_event_loop(None)
+    loop.close()
+
+class ServiceTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('Adam Smith', wife='Eve Smith')
+    self.family.Person('Cain Smith', father='Adam Smith')
+    self.family.Person('Abel Smith', father='Adam Smith')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def _FakeDot(self, body):
+    """Writes a Python script that stands in for graphviz."""
+
+    path = os.path.join(self.directory.name, 'fake_dot')
+    with open(path, 'w') as fp:
+      fp.write(f'#!{sys.executable}\nimport sys, time\n{body}\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+  def _Service(self, **kwargs):
+    render_service = service.RenderService(self.family, **kwargs)
+    self.addCleanup(render_service.Close)
+    return render_service
+
+  def testRendersDot(self):
+    render_service = self._Service()
+    dot = _Run(render_service.Render())
+    self.assertEqual(self.family.ToDot(), dot.decode('utf-8'))
+    dot = _Run(render_service.Render(root='Cain Smith'))
+    self.assertEqual(self.family.Descendants('Cain Smith').ToDot(),
+                     dot.decode('utf-8'))
+    dot = _Run(render_service.Render(depth=1))
+    self.assertEqual(self.family.Overview(max_depth=1).ToDot(),
+                     dot.decode('utf-8'))
+
+  def testSetsRankdir(self):
+    render_service = self._Service()
+    dot = _Run(render_service.Render(rankdir='LR')).decode('utf-8')
+    self.assertIn('rankdir="LR";', dot)
+    self.assertIsNone(self.family.rankdir)
+
+    # The family's rankdir is the default, and changing it doesn't change
+    # the version.
+    _Run(render_service.Render())
+    self.family.rankdir = 'TB'
+    dot = _Run(render_service.Render()).decode('utf-8')
+    self.assertIn('rankdir="TB";', dot)
+    self.assertEqual(self.family.ToDot(), dot)
+
+  def testCachesUntilTheFamilyChanges(self):
+    render_service = self._Service()
+    first = _Run(render_service.Render())
+    self.assertIs(first, _Run(render_service.Render()))
+    self.family.Person('Irad Smith', father='Enoch Smith')
+    second = _Run(render_service.Render())
+    self.assertIn(b'Irad', second)
+    metrics = render_service.Metrics()
+    self.assertEqual((3, 1, 2), (metrics.requests, metrics.hits,
+                                 metrics.renders))
+    self.assertAlmostEqual(1 / 3, metrics.hit_rate)
+
+  @unittest.skipIf(os.name != 'posix', 'needs an executable script')
+  def testCoalescesIdenticalRequests(self):
+    dot = self._FakeDot('time.sleep(0.2)\n'
+                        'sys.stdout.write(sys.stdin.read().upper())')
+    render_service = self._Service(dot=dot)
+
+    async def Requests():
+      return await asyncio.gather(
+          *(render_service.Render(format='fake') for _ in range(5)),
+          render_service.Render(format='fake', rankdir='LR'))
+
+    outputs = _Run(Requests())
+    self.assertTrue(outputs[0].startswith(b'DIGRAPH G {'))
+    self.assertEqual(1, len({id(output) for output in outputs[:5]}))
+    metrics = render_service.Metrics()
+    self.assertEqual((6, 0, 4, 2), (metrics.requests, metrics.hits,
+                                    metrics.coalesced, metrics.renders))
+
+  def testEvictsLeastRecentlyUsed(self):
+    size = len(_Run(self._Service().Render()))
+    render_service = self._Service(max_cache_bytes=2 * size + 10)
+    for root in ('Adam Smith', None, 'Cain Smith', None):
+      _Run(render_service.Render(root=root))
+    # Adam Smith's descendants were evicted for Cain Smith's.
+    _Run(render_service.Render(root='Adam Smith'))
+    metrics = render_service.Metrics()
+    self.assertEqual((5, 1, 4), (metrics.requests, metrics.hits,
+                                 metrics.renders))
+    self.assertEqual(2, metrics.evictions)
+    self.assertEqual(2, metrics.cache_entries)
+    self.assertLessEqual(metrics.cache_bytes, 2 * size + 10)
+
+  @unittest.skipIf(os.name != 'posix', 'needs an executable script')
+  def testReportsErrors(self):
+    render_service = self._Service(dot=self._FakeDot('sys.exit("bad input")'))
+    with self.assertRaises(ValueError):
+      _Run(render_service.Render(root='Seth Smith'))
+    with self.assertRaisesRegex(service.RenderError,
+                                '^exit status 1: bad input$'):
+      _Run(render_service.Render(format='svg'))
+    metrics = render_service.Metrics()
+    self.assertEqual((2, 0), (metrics.errors, metrics.cache_entries))
+
+    render_service = self._Service(dot=self._FakeDot('time.sleep(10)'),
+                                   timeout=0.2)
+    with self.assertRaisesRegex(service.RenderError, 'timed out after 0.2s'):
+      _Run(render_service.Render(format='svg'))
+
+if __name__ == '__main__':
+  unittest.main()
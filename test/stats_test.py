@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import os
+import sys
+import unittest
+
+# Add the repo root to the beginning of the Python module path.
+# Even if the user has installed family_tree locally, the version
+# next to the test file will be used.
+sys.path = [os.path.join(os.path.dirname(__file__), '..')] + sys.path
+
+from source import family_tree as ft
+
+try:
+  import numpy as np
+  from source import stats
+except ImportError:  # NumPy is optional.
+  np = None
+
+@unittest.skipIf(np is None, 'needs NumPy')
+class StatsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.family = ft.Family()
+    self.family.Person('Adam Smith', wife=('Eve Smith', 'Lilith'),
+                       birth='1900', death='1970')
+    self.family.Person('Cain Smith', father='Adam Smith', mother='Eve Smith',
+                       wife='Ada Lee', birth='ABT 1930', death='12 MAR 2001')
+    self.family.Person('Abel Smith', father='Adam Smith', mother='Eve Smith',
+                       death='?')
+    self.family.Person('Seth Smith', father='Adam Smith', mother='Lilith',
+                       birth='1935', death='1999')
+    self.family.Person('Enoch Smith', father='Cain Smith')
+
+  def testToArrays(self):
+    arrays = self.family.ToArrays()
+    ids = [p.ID() for p in arrays.people]
+    self.assertEqual(['AdamSmith', 'EveSmith', 'Lilith', 'CainSmith',
+                      'AdaLee', 'AbelSmith', 'SethSmith', 'EnochSmith'], ids)
+    self.assertEqual([0, 0, 0, 1, 1, 1, 1, 2], arrays.generation.tolist())
+    self.assertEqual(1930, arrays.birth_year[3])
+    self.assertEqual(2001, arrays.death_year[3])
+    self.assertTrue(np.isnan(arrays.death_year[5]))
+    self.assertTrue(arrays.deceased[5])
+    self.assertFalse(arrays.deceased[7])
+    self.assertEqual([stats.MALE, stats.FEMALE, stats.FEMALE],
+                     arrays.gender[:3].tolist())
+    self.assertEqual([-1, -1, -1, 0, -1, 0, 0, 3], arrays.father.tolist())
+    self.assertEqual([-1, -1, -1, 1, -1, 1, 2, 4], arrays.mother.tolist())
+    self.assertEqual([3, 2, 1, 1, 1, 0, 0, 0], arrays.num_children.tolist())
+    self.assertEqual([0, 0, 3], arrays.husband.tolist())
+    self.assertEqual([1, 2, 4], arrays.wife.tolist())
+
+  def testAggregates(self):
+    arrays = self.family.ToArrays()
+    self.assertEqual([3, 4, 1], arrays.GenerationSizes().tolist())
+    self.assertEqual([2, 1, 1], arrays.ChildrenPerCouple().tolist())
+    lifespans = arrays.MeanLifespanByGeneration()
+    self.assertEqual([70, 67.5], lifespans[:2].tolist())
+    self.assertTrue(np.isnan(lifespans[2]))
+    self.assertEqual([2, 1], arrays.MeanChildrenByGeneration()[:2].tolist())
+
+  def testStats(self):
+    summary = self.family.Stats()
+    self.assertEqual(8, summary.people)
+    self.assertEqual(3, summary.couples)
+    self.assertAlmostEqual(4 / 3, summary.mean_children_per_couple)
+    self.assertIn('8 people, 3 couples', str(summary))
+
+  def testEmptyFamily(self):
+    summary = ft.Family().Stats()
+    self.assertEqual(0, summary.people)
+    self.assertEqual([], summary.generation_sizes.tolist())
+    self.assertTrue(math.isnan(summary.mean_children_per_couple))
+
+if __name__ == '__main__':
+  unittest.main()